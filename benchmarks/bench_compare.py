@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+最低价比对性能测试
+对比原逐物料布尔筛选循环与 bijia.compare_prices 的耗时，并校验两者输出一致。
+
+用法：python benchmarks/bench_compare.py --items 2000 --vendors 15
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bijia import compare_prices, build_vendor_stats  # noqa: E402
+from tests.legacy import legacy_compare, legacy_vendor_stats, make_quotes  # noqa: E402
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='最低价比对性能测试')
+    parser.add_argument('--items', type=int, default=2000, help='物料数量')
+    parser.add_argument('--vendors', type=int, default=15, help='供应商数量')
+    parser.add_argument('--skip-legacy', action='store_true', help='不运行原循环（大数据量时使用）')
+    args = parser.parse_args()
+
+    data = make_quotes(args.items, args.vendors)
+    rows = sum(len(df) for df in data.values())
+    print(f"物料：{args.items}，供应商：{args.vendors}，报价行数：{rows}")
+
+    result, elapsed = timed(compare_prices, data)
+    print(f"compare_prices：{elapsed:.3f}s")
+    stats, stats_elapsed = timed(build_vendor_stats, result)
+    print(f"build_vendor_stats：{stats_elapsed:.3f}s")
+
+    if not args.skip_legacy:
+        expected, legacy_elapsed = timed(legacy_compare, data)
+        print(f"原逐物料循环：{legacy_elapsed:.3f}s（加速 {legacy_elapsed / elapsed:.1f}x）")
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+        expected_stats, legacy_stats_elapsed = timed(legacy_vendor_stats, expected)
+        print(f"原逐行统计：{legacy_stats_elapsed:.3f}s（加速 {legacy_stats_elapsed / stats_elapsed:.1f}x）")
+        assert list(stats) == list(expected_stats)
+        for vendor, items in stats.items():
+            pd.testing.assert_frame_equal(items.reset_index(drop=True), expected_stats[vendor], check_dtype=False)
+        print("输出一致")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+历史价格库性能测试
+用模拟报价单多次比价并记入 bijia.history.PriceHistory，测试记录耗时，
+再随机抽取物料和供应商，测试价格走势、调价幅度和中标率查询的平均耗时。
+
+用法：python benchmarks/bench_history.py --items 20000 --vendors 10 --tenders 12
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bijia import QuoteComparison  # noqa: E402
+from bijia.history import PriceHistory  # noqa: E402
+from tests.legacy import make_quotes  # noqa: E402
+
+DAY = 24 * 3600
+
+
+def timed(func, args_list):
+    """逐个参数调用 func，返回平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    return (time.perf_counter() - start) / len(args_list) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='历史价格库性能测试')
+    parser.add_argument('--items', type=int, default=20000, help='物料数量')
+    parser.add_argument('--vendors', type=int, default=10, help='供应商数量')
+    parser.add_argument('--tenders', type=int, default=12, help='比价次数')
+    parser.add_argument('--queries', type=int, default=200, help='每种查询的次数')
+    parser.add_argument('--db', help='数据库文件路径（默认使用临时文件）')
+    args = parser.parse_args()
+
+    directory = None
+    if args.db is None:
+        directory = tempfile.TemporaryDirectory()
+        args.db = os.path.join(directory.name, 'history.db')
+    history = PriceHistory(args.db)
+
+    start_time = time.time() - args.tenders * 30 * DAY
+    elapsed = rows = 0
+    for tender in range(args.tenders):
+        comparison = QuoteComparison.from_frames(make_quotes(args.items, args.vendors, seed=tender))
+        start = time.perf_counter()
+        rows += history.record(f'bench-{tender}', comparison, recorded_at=start_time + tender * 30 * DAY)
+        elapsed += time.perf_counter() - start
+    print(f"记录 {args.tenders} 次比价，报价 {rows} 条：{elapsed:.2f}s（{rows / elapsed:,.0f} 条/秒）")
+    print(f"数据库：{os.path.getsize(args.db) / 1024 / 1024:.1f} MB，{history.stats()}")
+
+    rng = np.random.default_rng(0)
+    items = [f'物料{i}' for i in rng.integers(args.items, size=args.queries)]
+    vendors = [f'供应商{v}' for v in rng.integers(args.vendors, size=args.queries)]
+    since = start_time + args.tenders * 15 * DAY
+    print(f"价格走势（全部供应商）：{timed(history.trend, [(item,) for item in items]):.2f} ms")
+    print(f"价格走势（单个供应商）：{timed(history.trend, list(zip(items, vendors))):.2f} ms")
+    print(f"调价幅度：{timed(history.deltas, [(item,) for item in items]):.2f} ms")
+    print(f"中标率（全部物料）：{timed(history.win_rates, [(None, since)] * args.queries):.2f} ms")
+    print(f"中标率（单个物料）：{timed(history.win_rates, [(item,) for item in items]):.2f} ms")
+
+    history.close()
+    if directory is not None:
+        directory.cleanup()
+
+
+if __name__ == '__main__':
+    main()
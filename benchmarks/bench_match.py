@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+物料模糊匹配性能测试
+生成写法各异（空格、括号、中英文单位、多余后缀）的模拟报价单，测试 bijia.matching.align_items 的吞吐量，
+并按已知的真实物料统计合并结果：错误合并（不同物料归入同一组）和未合并（同一物料分成多组）。
+可选与两两比较全部名称的朴素做法对比耗时（按抽样规模外推）。
+
+用法：python benchmarks/bench_match.py --items 20000 --vendors 10
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bijia.matching import DEFAULT_THRESHOLD, align_items, match_key, name_grams  # noqa: E402
+from bijia.normalize import normalize_item_name  # noqa: E402
+
+PRODUCTS = ['复印纸', '圆珠笔', '笔记本', '文件夹', '订书钉', '胶带', '洗手液', '垃圾袋', '纸杯', '抽纸',
+            '大米', '食用油', '矿泉水', '白砂糖', '酱油', '洗衣粉', '拖把', '电池', '插线板', '鼠标']
+COLORS = ['白色', '黑色', '红色', '蓝色', '绿色', '灰色', '透明', '黄色']
+UNITS = [('g', '克'), ('kg', '千克'), ('ml', '毫升'), ('cm', '厘米')]
+
+
+def make_catalog(n_items):
+    """生成互不相同的物料：(品名, 颜色, 规格数字, 单位序号)"""
+    catalog = []
+    size = 1
+    while len(catalog) < n_items:
+        for product in PRODUCTS:
+            for color in COLORS:
+                catalog.append((product, color, size, size % len(UNITS)))
+        size += 1
+    return catalog[:n_items]
+
+
+def spell(item, rng):
+    """同一物料的一种写法"""
+    product, color, size, unit = item
+    unit = UNITS[unit][int(rng.integers(2))]
+    color = [color, f'（{color}）', f'({color})'][int(rng.integers(3))]
+    sep = [' ', '', '  '][int(rng.integers(3))]
+    # 部分写法带有多余的后缀，规整后仍不相同，需要按三元组相似度匹配
+    suffix = '装' if rng.random() < 0.15 else ''
+    return f'{product}{color}{sep}{size}{unit}{suffix}'
+
+
+def make_quotes(n_items, n_vendors, seed=0):
+    """生成模拟报价单，返回 ({供应商: 报价表}, {供应商: {物料列: 真实物料序号}})"""
+    rng = np.random.default_rng(seed)
+    catalog = make_catalog(n_items)
+    data, truth = {}, {}
+    for v in range(n_vendors):
+        picked = np.sort(rng.choice(n_items, size=int(n_items * 0.9), replace=False))
+        names = [spell(catalog[i], rng) for i in picked]
+        keys = [normalize_item_name(name) for name in names]
+        price = np.round(rng.uniform(1, 100, size=len(picked)), 1)
+        vendor = f'供应商{v}'
+        data[vendor] = pd.DataFrame({
+            '序号': [str(i + 1) for i in picked],
+            '物料': keys,
+            '原始物料名称': names,
+            '价格': price,
+            '分项小计': price,
+        })
+        truth[vendor] = dict(zip(keys, picked))
+    return data, truth
+
+
+def evaluate(data, aligned, truth):
+    """统计匹配后的物料组数、错误合并的组数和未合并的物料数"""
+    groups = {}  # 组名 -> 真实物料集合
+    items = {}  # 真实物料 -> 组名集合
+    for vendor, frame in aligned.items():
+        for key, group in zip(data[vendor]['物料'], frame['物料'].astype(str)):
+            item = truth[vendor][key]
+            groups.setdefault(group, set()).add(item)
+            items.setdefault(item, set()).add(group)
+    wrong = sum(1 for members in groups.values() if len(members) > 1)
+    split = sum(1 for members in items.values() if len(members) > 1)
+    return len(groups), wrong, split
+
+
+def naive_seconds(keys, threshold, sample):
+    """两两比较 sample 个名称的耗时，按 n² 外推到全部名称"""
+    grams = [name_grams(match_key(key)) for key in keys[:sample]]
+    start = time.perf_counter()
+    for i in range(len(grams)):
+        for j in range(i):
+            shared = len(grams[i] & grams[j])
+            _ = shared / (len(grams[i]) + len(grams[j]) - shared) >= threshold
+    elapsed = time.perf_counter() - start
+    return elapsed * (len(keys) / len(grams)) ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description='物料模糊匹配性能测试')
+    parser.add_argument('--items', type=int, default=20000, help='物料数量')
+    parser.add_argument('--vendors', type=int, default=10, help='供应商数量')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='相似度阈值')
+    parser.add_argument('--naive-sample', type=int, default=2000, help='朴素两两比较的抽样名称数（0 表示不比较）')
+    args = parser.parse_args()
+
+    data, truth = make_quotes(args.items, args.vendors)
+    rows = sum(len(df) for df in data.values())
+    distinct = len({key for keys in truth.values() for key in keys})
+    print(f"物料：{args.items}，供应商：{args.vendors}，报价行数：{rows}，不同写法：{distinct}")
+
+    start = time.perf_counter()
+    aligned, index = align_items(data, args.threshold)
+    elapsed = time.perf_counter() - start
+    print(f"align_items：{elapsed:.3f}s（{rows / elapsed:,.0f} 行/秒），物料组：{len(index)}")
+
+    groups, wrong, split = evaluate(data, aligned, truth)
+    print(f"错误合并的组：{wrong}，未合并的物料：{split}（真实物料 {args.items}，匹配后 {groups} 组）")
+
+    if args.naive_sample:
+        keys = sorted({key for keys in truth.values() for key in keys})
+        estimate = naive_seconds(keys, args.threshold, min(args.naive_sample, len(keys)))
+        print(f"朴素两两比较（{len(keys)} 个写法，按抽样外推）：约 {estimate:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+物料名称标准化性能测试
+对比原逐行 apply 的标准化函数与 bijia.normalize.normalize_item_names（预编译正则 +
+按不同名称缓存）处理多份报价单的耗时，并校验两者生成的物料键完全一致。
+每轮计时前清空缓存，不同供应商之间相同的物料名称只在首次出现时计算。
+
+用法：python benchmarks/bench_normalize.py --items 20000 --vendors 15
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bijia.normalize import normalize_item_name, normalize_item_names  # noqa: E402
+
+# 覆盖各类特殊字符的物料名称
+SAMPLES = [
+    '大米（东北 5kg）', '  牛奶/盒  ', 'A4 打印纸-70g', '食用油_5L', '鸡蛋\t30枚', '水果  苹果',
+    '①号 面粉', 'Ｗｉｆｉ 路由器', '面积m²', 'ÇA VA – Énergie', 'İstanbul 咖啡', '', ' - ', '~!@#',
+    '橙汁　1L', 'ﬁber 纤维', 'Ⅻ 型号', '矿泉水 550ml×24',
+]
+
+
+def legacy_normalize_item_name(name):
+    """原 process_dataframe 中的逐行标准化函数"""
+    name = str(name).strip()
+    # 去除特殊字符
+    name = ''.join(e for e in name if e.isalnum() or e in ' -')
+    # 去除多余空格
+    name = ' '.join(name.split())
+    # 转换为小写
+    name = name.lower()
+    return name
+
+
+def make_files(n_items, n_vendors, seed=0):
+    """生成各供应商报价单的物料名称列：共用同一物料目录，名称写法略有差异，含数字和空值"""
+    rng = np.random.default_rng(seed)
+    catalog = [
+        f'物料{i}' if i % 3 else f'{SAMPLES[i % len(SAMPLES)]} 规格{i}'
+        for i in range(n_items)
+    ]
+    files = []
+    for v in range(n_vendors):
+        picked = np.sort(rng.choice(n_items, size=int(n_items * 0.9), replace=False))
+        names = [catalog[i] if (i + v) % 7 else f' {catalog[i]}（{v}号）' for i in picked]
+        for i in rng.choice(len(names), size=len(names) // 20, replace=False):
+            names[i] = rng.choice([np.nan, None, 12.5, 3])
+        files.append(pd.Series(names + SAMPLES, dtype=object, name='品名'))
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--vendors', type=int, default=15)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    files = make_files(args.items, args.vendors)
+
+    def best_of(func):
+        timings = []
+        for _ in range(args.repeat):
+            normalize_item_name.cache_clear()
+            start = time.perf_counter()
+            result = [func(names) for names in files]
+            timings.append(time.perf_counter() - start)
+        return min(timings), result
+
+    legacy_time, expected = best_of(lambda names: names.apply(legacy_normalize_item_name))
+    new_time, actual = best_of(normalize_item_names)
+
+    for a, b in zip(actual, expected):
+        pd.testing.assert_series_equal(a, b)
+    print(f'{args.vendors} 份报价单 × {args.items} 个物料')
+    print(f'逐行 apply：{legacy_time:.3f}s')
+    print(f'新实现：    {new_time:.3f}s')
+    print(f'加速：      {legacy_time / new_time:.1f}x（结果一致）')
+
+
+if __name__ == '__main__':
+    main()
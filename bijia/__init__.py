@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+"""
+供应商比价核心分析模块
+桌面版、Web版共用的解析 → 标准化 → 比对 → 统计流程。
+"""
+
+from .aliases import ColumnResolver, load_aliases
+from .catalog import ItemCatalog
+from .compare import (compact_quote_frame, compare_prices, intern_quote_frames, serial_order,
+                      sort_by_serial)
+from .history import PriceHistory
+from .incremental import QuoteComparison
+from .ingest import parse_source, parse_sources
+from .matching import ItemIndex, align_items
+from .models import Analysis, ParsedQuote
+from .normalize import extract_vendor_name_from_content, process_dataframe
+from .parse import parse_file, read_quote
+from .pipeline import analyze_files, analyze_quotes, analyze_sources, compare_sources
+from .stats import build_vendor_stats, vendor_totals
+
+__all__ = [
+    'Analysis',
+    'ColumnResolver',
+    'ItemCatalog',
+    'ItemIndex',
+    'ParsedQuote',
+    'PriceHistory',
+    'QuoteComparison',
+    'align_items',
+    'analyze_files',
+    'analyze_quotes',
+    'analyze_sources',
+    'build_vendor_stats',
+    'compact_quote_frame',
+    'compare_prices',
+    'compare_sources',
+    'extract_vendor_name_from_content',
+    'intern_quote_frames',
+    'load_aliases',
+    'parse_file',
+    'parse_source',
+    'parse_sources',
+    'process_dataframe',
+    'read_quote',
+    'serial_order',
+    'sort_by_serial',
+    'vendor_totals',
+]
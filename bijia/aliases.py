@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+"""
+列名别名解析
+导入时根据别名配置一次性构建“标准化别名 → 列类型”哈希表和数量关键词正则，
+一次遍历表头即可确定序号、物料、价格、分项小计、数量各列。
+数量关键词（quantity_keywords）编译为一个正则，列名识别、列画像和比对时查找数量列都使用它。
+
+默认别名见 column_aliases.json；环境变量 COLUMN_ALIASES_FILE 可指向额外的
+配置文件，其中的别名追加在默认别名之后，新的报价单模板无需修改代码。
+"""
+
+import json
+import os
+import re
+from functools import lru_cache
+
+# 列类型，按此顺序解析
+ROLES = ('serial', 'item', 'price', 'subtotal', 'quantity')
+DEFAULT_ALIASES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'column_aliases.json')
+
+
+@lru_cache(maxsize=4096)
+def _normalize(text):
+    return ''.join(e for e in text if e.isalnum() or e == '_').lower()
+
+
+def normalize_column_name(col):
+    """标准化列名：去除空格、特殊字符，转换为小写"""
+    return _normalize(str(col))
+
+
+def load_aliases(path=None):
+    """读取别名配置：默认配置，再追加 path（或 COLUMN_ALIASES_FILE）中的别名"""
+    with open(DEFAULT_ALIASES_FILE, encoding='utf-8') as f:
+        aliases = json.load(f)
+    path = path or os.environ.get('COLUMN_ALIASES_FILE')
+    if path:
+        with open(path, encoding='utf-8') as f:
+            extra = json.load(f)
+        for key, options in extra.items():
+            merged = aliases.setdefault(key, [])
+            merged.extend(option for option in options if option not in merged)
+    return aliases
+
+
+class ColumnResolver:
+    """列名解析器"""
+
+    def __init__(self, aliases):
+        self.aliases = aliases
+        # 标准化别名 → [(列类型, 优先级)]，优先级为别名在列表中的位置
+        self._alias_roles = {}
+        for role in ROLES:
+            for rank, option in enumerate(aliases.get(role, [])):
+                self._alias_roles.setdefault(normalize_column_name(option), []).append((role, rank))
+        # 表头识别：标准化后的单元格以物料/价格别名开头
+        self._prefix = {
+            role: self._compile([normalize_column_name(option) for option in aliases.get(role, [])], prefix=True)
+            for role in ('item', 'price')
+        }
+        self._quantity_keywords = self._compile(
+            [normalize_column_name(keyword) for keyword in aliases.get('quantity_keywords', [])])
+
+    @staticmethod
+    def _compile(options, prefix=False):
+        options = sorted({option for option in options if option}, key=len, reverse=True)
+        if not options:
+            return re.compile(r'(?!)')
+        return re.compile(('^' if prefix else '') + '(?:' + '|'.join(map(re.escape, options)) + ')')
+
+    def resolve_positions(self, columns):
+        """一次遍历列名，返回 {列类型: 列位置}
+
+        同一列类型匹配多个别名时取别名列表中靠前的；多个列标准化后相同时取靠后的列。
+        """
+        best = {}
+        for pos, col in enumerate(columns):
+            for role, rank in self._alias_roles.get(normalize_column_name(col), ()):
+                if role not in best or rank <= best[role][0]:
+                    best[role] = (rank, pos)
+        return {role: pos for role, (rank, pos) in best.items()}
+
+    def resolve(self, columns):
+        """返回 {列类型: 列名}"""
+        columns = list(columns)
+        return {role: columns[pos] for role, pos in self.resolve_positions(columns).items()}
+
+    def is_quantity_column(self, col):
+        """列名中是否包含数量相关关键词"""
+        return self._quantity_keywords.search(normalize_column_name(col)) is not None
+
+    def looks_like_header(self, cells):
+        """判断一行单元格是否为包含物料列和价格列的表头"""
+        names = [normalize_column_name(cell) for cell in cells if cell is not None]
+        return all(any(self._prefix[role].match(name) for name in names if name) for role in ('item', 'price'))
+
+
+# 导入时构建的默认解析器
+RESOLVER = ColumnResolver(load_aliases())
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+
+"""
+解析缓存与分析缓存
+ParseCache：按文件内容哈希缓存解析后的标准化数据，再次上传未修改的报价单时只需计算哈希。
+每条缓存为一个 .npz 文件，按列保存（数值列为原生数组，分类列为整数编码和字典，文本为定长 Unicode 数组，
+其余少见的混合类型值写入 JSON 元数据），读取时不允许反序列化对象（allow_pickle=False），
+缓存文件即使被替换也不会执行其中的代码。缓存目录只允许当前用户访问，目录属于其他用户时拒绝使用。
+缓存目录超过大小上限时按最近使用时间淘汰。
+AnalysisCache：按一组报价单的内容哈希缓存完整的分析结果，相同的一组文件再次提交时直接返回。
+"""
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .aliases import RESOLVER
+from .log import logger
+from .models import Analysis, ParsedQuote
+
+# 解析器版本，解析或标准化逻辑变化时递增，使旧缓存失效
+PARSER_VERSION = 3
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def hash_source(source):
+    """计算报价单内容的哈希，source 为文件路径或 bytes"""
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    else:
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def private_dir(directory):
+    """创建只允许当前用户访问的目录（0700）；目录已存在但属于其他用户时抛出 PermissionError"""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if hasattr(os, 'getuid'):  # Windows 下由用户目录的权限保护
+        stat = os.stat(directory)
+        if stat.st_uid != os.getuid():
+            raise PermissionError(f'目录 {directory} 不属于当前用户，拒绝使用')
+        if stat.st_mode & 0o077:
+            os.chmod(directory, 0o700)
+    return directory
+
+
+def _encode_values(values):
+    """对象数组的保存形式：全部为文本（允许空值）时返回 (定长 Unicode 数组, 空值掩码)，
+    否则返回 (None, 值列表)，值列表写入 JSON 元数据；无法写入 JSON 时抛出 TypeError"""
+    values = np.asarray(values, dtype=object)
+    missing = pd.isna(values)
+    if pd.api.types.infer_dtype(values, skipna=True) in ('string', 'empty'):
+        return np.where(missing, '', values).astype(str), missing
+    listed = [None if is_missing else value for value, is_missing in zip(values.tolist(), missing)]
+    json.dumps(listed)
+    return None, listed
+
+
+def _decode_values(text, missing):
+    values = text.astype(object)
+    values[missing] = None
+    return values
+
+
+def engine_fingerprint():
+    """解析器版本和列名别名配置的指纹（别名不同，解析结果可能不同）"""
+    text = json.dumps(RESOLVER.aliases, sort_keys=True, ensure_ascii=False)
+    return f"{PARSER_VERSION}:{hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]}"
+
+
+class ParseCache:
+    """报价单解析结果的磁盘缓存（多进程可共享同一目录）
+
+    缓存键由文件内容哈希、文件名、文件类型、解析器版本和列名别名配置组成；
+    文件名参与缓存键，因为无法从内容提取供应商名称时使用文件名作为供应商名称。
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._salt = engine_fingerprint()
+        private_dir(directory)
+
+    def key(self, content_hash, filename, kind=None):
+        """缓存键"""
+        text = f'{self._salt}:{content_hash}:{kind or ""}:{filename}'
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.npz')
+
+    def get(self, key):
+        """读取缓存的解析结果，不存在时返回 None"""
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data['__meta__']))
+                categorical = set(meta['categorical'])
+                columns = {}
+                for i in range(len(meta['columns'])):
+                    values = self._load_values(data, meta, f'c{i}')
+                    if i in categorical:
+                        values = pd.Categorical.from_codes(values, pd.Index(self._load_values(data, meta, f'k{i}')))
+                    columns[i] = values
+                frame = pd.DataFrame(columns)
+                frame.columns = meta['columns']
+            os.utime(path)  # 更新最近使用时间
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("读取解析缓存失败，将重新解析：%s", e)
+            self._remove(path)
+            return None
+        return ParsedQuote(meta['filename'], meta['vendor'], frame)
+
+    @staticmethod
+    def _load_values(data, meta, name):
+        """读取一个数组（文本数组还原空值，JSON 元数据中的值还原为对象数组）"""
+        if name in meta['json']:
+            values = np.empty(len(meta['json'][name]), dtype=object)
+            values[:] = meta['json'][name]
+            return values
+        if name in meta['text']:
+            return _decode_values(data[name], data[f'{name}_na'])
+        return data[name]
+
+    def _store_values(self, arrays, meta, name, values):
+        values = np.asarray(values)
+        if values.dtype != object:
+            arrays[name] = values
+            return
+        text, extra = _encode_values(values)
+        if text is None:
+            meta['json'][name] = extra
+        else:
+            arrays[name], arrays[f'{name}_na'] = text, extra
+            meta['text'].append(name)
+
+    def put(self, key, quote):
+        """写入解析结果（先写临时文件再替换）；含有无法保存的值时不缓存"""
+        frame = quote.frame
+        meta = {'filename': quote.filename, 'vendor': quote.vendor, 'columns': list(frame.columns),
+                'categorical': [], 'text': [], 'json': {}}
+        arrays = {}
+        try:
+            for i, col in enumerate(frame.columns):
+                column = frame.iloc[:, i]
+                if isinstance(column.dtype, pd.CategoricalDtype):
+                    meta['categorical'].append(i)
+                    arrays[f'c{i}'] = column.cat.codes.to_numpy()
+                    self._store_values(arrays, meta, f'k{i}', column.cat.categories.to_numpy())
+                else:
+                    self._store_values(arrays, meta, f'c{i}', column.to_numpy())
+            arrays['__meta__'] = np.array(json.dumps(meta, ensure_ascii=False))
+        except (TypeError, ValueError) as e:
+            logger.debug("解析结果含有无法缓存的值，不写入解析缓存：%s", e)
+            return
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(buffer.getbuffer())
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning("写入解析缓存失败：%s", e)
+            return
+        self._evict()
+
+    def _evict(self):
+        """缓存目录超过大小上限时，删除最久未使用的缓存"""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.npz'):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+            logger.debug("解析缓存淘汰后大小：%s 字节", total)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _copy_result(result):
+    """复制缓存的分析结果中的 Analysis（比价模型不可变，不复制）"""
+    if isinstance(result, Analysis):
+        return result.copy()
+    comparison, analysis = result
+    return comparison, analysis.copy()
+
+
+class AnalysisCache:
+    """完整分析结果的内存缓存（线程安全）
+
+    缓存键由按上传顺序排列的 (内容哈希, 文件名, 文件类型) 和引擎配置组成：
+    最低价相同时的中选供应商和报价列顺序取决于上传顺序，换个顺序上传的同一组文件分开缓存。
+    max_entries 为保存的条数，ttl 为有效期（秒，None 表示不过期）。
+    缓存的结果为 Analysis 或 (比价模型, Analysis)：put 和 get 都复制其中的 Analysis，
+    调用方修改结果表不会影响缓存和其他请求；比价模型不可变（更新时返回新模型），直接共用。
+    """
+
+    def __init__(self, max_entries=32, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # 缓存键 -> (分析结果, 保存时间)
+        self._lock = threading.Lock()
+        self._salt = engine_fingerprint()
+
+    def key(self, hashed_sources, namespace=None):
+        """缓存键，hashed_sources 为按上传顺序排列的 (内容哈希, 文件名, 文件类型)；namespace 用于区分缓存的内容"""
+        parts = [f'{content_hash}:{kind or ""}:{filename}' for content_hash, filename, kind in hashed_sources]
+        salt = f'{self._salt}:{namespace}' if namespace else self._salt
+        text = '\n'.join([salt, *parts])
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """读取缓存的分析结果（副本），不存在或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.time() - entry[1] > self.ttl:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return _copy_result(entry[0])
+
+    def put(self, key, analysis):
+        """保存分析结果，超过条数上限时淘汰最久未使用的结果"""
+        analysis = _copy_result(analysis)
+        with self._lock:
+            self._entries[key] = (analysis, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """命中、未命中、淘汰次数和当前条数"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+            }
+
+
+def default_cache_dir():
+    """默认缓存目录：当前用户的缓存目录（XDG_CACHE_HOME、LOCALAPPDATA 或 ~/.cache）下的 bijia/parse-cache"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'bijia', 'parse-cache')
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+"""
+物料主数据
+本地 SQLite 数据库保存物料（稳定的物料ID和标准名称）及其别名，打开时载入内存中的哈希索引。
+报价单解析后，每个不同的原始物料名称先按原样（去掉首尾空格）查一次字典；
+未命中时再按物料列（标准化后的物料名称，解析时已算好并随解析缓存保存）查标准化后的别名。
+已登记物料的各种写法统一改为标准名称后再比价；未登记的物料列保持原样，首次出现时加入待审核队列，
+审核时登记为新物料或已有物料的别名，之后的分析即可直接识别。
+主数据只在解析之后应用，解析缓存不受主数据修改的影响。
+多进程部署时各进程共用同一数据库文件，其他进程修改后在下次查询时自动重新载入。
+"""
+
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from .compare import compact_quote_frame
+from .log import logger
+from .normalize import normalize_item_name
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    alias TEXT PRIMARY KEY,
+    item_id INTEGER NOT NULL REFERENCES items(id)
+);
+CREATE INDEX IF NOT EXISTS aliases_item ON aliases(item_id);
+CREATE TABLE IF NOT EXISTS review_queue (
+    alias TEXT PRIMARY KEY,
+    example TEXT NOT NULL,
+    vendor TEXT,
+    first_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS review_queue_seen ON review_queue(first_seen DESC);
+"""
+
+
+class ItemCatalog:
+    """物料主数据（线程安全）
+
+    path 为 SQLite 数据库文件路径。物料的标准名称和别名按原样（去掉首尾空格）登记，
+    标准名称本身也是它的别名；比价时物料列统一为标准名称按 normalize_item_name 标准化后的值。
+    待审核队列中的名称为物料列（标准化后的物料名称），附首次出现时的原始物料名称作为示例。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+        self._revision = 0
+        self._load()
+
+    def _load(self):
+        """载入内存索引（调用方持有锁或在初始化时调用）"""
+        self._names = dict(self._conn.execute('SELECT id, name FROM items'))  # 物料ID -> 标准名称
+        self._keys = {item_id: normalize_item_name(name) for item_id, name in self._names.items()}  # 物料ID -> 物料列
+        self._aliases = dict(self._conn.execute('SELECT alias, item_id FROM aliases ORDER BY rowid'))  # 别名 -> 物料ID
+        self._normalized = {}  # 标准化后的别名 -> 物料ID（标准化后相同时取先登记的）
+        for alias, item_id in self._aliases.items():
+            self._normalized.setdefault(normalize_item_name(alias), item_id)
+        self._queued = {row[0] for row in self._conn.execute('SELECT alias FROM review_queue')}
+        self._data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        self._revision += 1
+        logger.debug("载入物料主数据：%s 个物料，%s 个别名", len(self._names), len(self._aliases))
+
+    def _refresh(self):
+        """其他连接（进程）修改了数据库时重新载入（调用方持有锁）"""
+        if self._conn.execute('PRAGMA data_version').fetchone()[0] != self._data_version:
+            self._load()
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._names)
+
+    @property
+    def revision(self):
+        """内存索引的版本，主数据每次变化后递增（用于区分缓存的分析结果）"""
+        with self._lock:
+            self._refresh()
+            return self._revision
+
+    def resolve_quote(self, quote):
+        """将报价单中已登记物料的物料列改为标准名称，未登记的物料列加入待审核队列，返回新的报价单
+
+        每个不同的 (原始物料名称, 物料列) 先按原始物料名称查找，未命中时再按物料列查找。
+        """
+        frame = compact_quote_frame(quote.frame)
+        raw, key = frame['原始物料名称'].cat, frame['物料'].cat
+        raw_codes, key_codes = raw.codes.to_numpy(np.int64), key.codes.to_numpy(np.int64)
+        valid = key_codes >= 0
+        pairs, first, inverse = np.unique(raw_codes[valid] * (len(key.categories) + 1) + key_codes[valid],
+                                          return_index=True, return_inverse=True)
+        pair_raw, pair_key = raw_codes[valid][first], key_codes[valid][first]
+        with self._lock:
+            self._refresh()
+            aliases, normalized, keys = self._aliases, self._normalized, self._keys
+            ids = np.array([aliases.get(str(raw.categories[r]).strip(), -1) if r >= 0 else -1 for r in pair_raw],
+                           dtype=np.int64)
+            missed = np.flatnonzero(ids < 0)
+            ids[missed] = [normalized.get(key.categories[k], -1) for k in pair_key[missed]]
+            canonical = np.array([keys[item_id] if item_id >= 0 else key.categories[k]
+                                  for item_id, k in zip(ids, pair_key)], dtype=object)
+            unknown = ids < 0
+            pending = [k for k in np.unique(pair_key[unknown]) if key.categories[k] not in self._queued]
+
+        if pending:
+            # 未登记的物料列，以首次出现的原始物料名称作为示例
+            used, used_first = np.unique(key_codes, return_index=True)
+            examples = frame['原始物料名称'].to_numpy()[used_first[np.searchsorted(used, pending)]]
+            self.enqueue(key.categories[pending], examples, quote.vendor)
+
+        if (canonical != np.asarray(key.categories, dtype=object)[pair_key]).any():
+            values = np.full(len(frame), None, dtype=object)
+            values[valid] = canonical[inverse]
+            frame = frame.assign(物料=pd.Categorical(values))
+        return quote._replace(frame=frame)
+
+    def enqueue(self, aliases, examples, vendor=None):
+        """将未登记的名称加入待审核队列（已在队列中的名称不变）"""
+        now = time.time()
+        rows = [(str(alias), str(example), vendor, now) for alias, example in zip(aliases, examples)]
+        with self._lock, self._conn:
+            added = self._conn.executemany(
+                'INSERT INTO review_queue (alias, example, vendor, first_seen) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(alias) DO NOTHING', rows).rowcount
+            self._queued.update(row[0] for row in rows)
+        logger.info("物料主数据：%s 个未登记的物料名称加入待审核队列", added)
+
+    def add_item(self, name, aliases=()):
+        """登记新物料，返回物料ID；标准名称或别名已登记时抛出 ValueError"""
+        name = str(name).strip()
+        keys = list(dict.fromkeys([name, *(str(alias).strip() for alias in aliases)]))
+        with self._lock:
+            self._refresh()
+            self._check_free(keys)
+            if normalize_item_name(name) in self._keys.values():
+                raise ValueError(f'物料 {name} 已存在')
+            try:
+                with self._conn:
+                    item_id = self._conn.execute('INSERT INTO items (name, created_at) VALUES (?, ?)',
+                                                 (name, time.time())).lastrowid
+                    self._insert_aliases(keys, item_id)
+            except sqlite3.IntegrityError:
+                raise ValueError(f'物料 {name} 已存在')
+            self._names[item_id] = name
+            self._keys[item_id] = normalize_item_name(name)
+            self._index_aliases(keys, item_id)
+        return item_id
+
+    def add_alias(self, alias, item_id):
+        """为已有物料登记别名；物料不存在时抛出 KeyError，别名已登记时抛出 ValueError"""
+        key = str(alias).strip()
+        with self._lock:
+            self._refresh()
+            if item_id not in self._names:
+                raise KeyError(item_id)
+            self._check_free([key])
+            with self._conn:
+                self._insert_aliases([key], item_id)
+            self._index_aliases([key], item_id)
+
+    def _check_free(self, keys):
+        for key in keys:
+            if key in self._aliases:
+                raise ValueError(f'{key} 已登记为物料 {self._names[self._aliases[key]]} 的别名')
+
+    def _insert_aliases(self, keys, item_id):
+        """登记别名，并将标准化后与之相同的名称移出待审核队列（调用方持有锁并在事务中调用）"""
+        self._conn.executemany('INSERT INTO aliases (alias, item_id) VALUES (?, ?)', [(key, item_id) for key in keys])
+        self._conn.executemany('DELETE FROM review_queue WHERE alias = ?',
+                               [(name,) for name in {normalize_item_name(key) for key in keys}])
+
+    def _index_aliases(self, keys, item_id):
+        """将新登记的别名加入内存索引（调用方持有锁）"""
+        for key in keys:
+            self._aliases[key] = item_id
+            self._normalized.setdefault(normalize_item_name(key), item_id)
+            self._queued.discard(normalize_item_name(key))
+        self._revision += 1
+
+    def approve(self, alias, item_id=None):
+        """审核待审核队列中的名称：item_id 为 None 时登记为新物料，否则登记为该物料的别名，返回物料ID"""
+        if item_id is None:
+            return self.add_item(alias)
+        self.add_alias(alias, item_id)
+        return item_id
+
+    def dismiss(self, alias):
+        """从待审核队列中移除名称（不登记），名称不在队列中时返回 False"""
+        with self._lock, self._conn:
+            self._queued.discard(alias)
+            return self._conn.execute('DELETE FROM review_queue WHERE alias = ?', (alias,)).rowcount > 0
+
+    def review_queue(self, limit=100, offset=0):
+        """待审核的名称（最近加入的在前），返回 (总数, 列表)"""
+        with self._lock:
+            total = self._conn.execute('SELECT COUNT(*) FROM review_queue').fetchone()[0]
+            rows = self._conn.execute(
+                'SELECT alias, example, vendor, first_seen FROM review_queue '
+                'ORDER BY first_seen DESC, alias LIMIT ? OFFSET ?', (limit, offset)).fetchall()
+        columns = ['alias', 'example', 'vendor', 'first_seen']
+        return total, [dict(zip(columns, row)) for row in rows]
+
+    def item(self, item_id):
+        """物料的标准名称和别名，不存在时返回 None"""
+        with self._lock:
+            self._refresh()
+            name = self._names.get(item_id)
+            if name is None:
+                return None
+            aliases = [row[0] for row in self._conn.execute(
+                'SELECT alias FROM aliases WHERE item_id = ? ORDER BY alias', (item_id,))]
+        return {'id': item_id, 'name': name, 'aliases': aliases}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
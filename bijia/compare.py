@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+
+"""
+最低价比对引擎
+将所有供应商的报价合并为一张表，通过 groupby/idxmin 一次性找出每个物料的
+最低价、中选供应商、序号、分项小计和数量，并通过一次 pivot 生成各供应商报价列。
+完整比价（compare_prices）和增量比价（incremental.py）共用 compare_items、assemble_result，
+最低价、同价和数量的规则只在这里实现一次。
+报价在解析后即转为紧凑报价表：文本列为分类（字典编码），比对时各供应商的字典合并为
+共享字典，合并、分组和透视都按整数编码进行。
+"""
+
+import numpy as np
+import pandas as pd
+
+from .aliases import RESOLVER
+
+# 查找数量列时跳过的列
+QUANTITY_SKIP_COLUMNS = ['序号', '价格', '分项小计']
+# 紧凑报价表中按分类（字典编码）保存的文本列
+CATEGORY_COLUMNS = ['物料', '原始物料名称', '序号']
+# 每个物料的比对状态（以物料编码为索引；序号、物料名称为字典编码，供应商为供应商编号）
+ITEM_COLUMNS = ['序号', '物料名称', '最低价', '供应商', '数量', '分项小计', '次低价', '次低供应商', '首次供应商', '首次行']
+# 比对状态中的次低价报价（次低供应商为供应商编号，只有一个供应商报价时为 -1）
+RUNNER_UP_COLUMNS = ['次低价', '次低供应商']
+# 最低价分析结果中各供应商报价列之前的列
+RESULT_COLUMNS = ['序号', '物料名称', '最低价', '供应商', '数量', '分项小计']
+
+
+def is_quantity_candidate(col):
+    """判断列名是否包含数量相关关键词（关键词见别名配置的 quantity_keywords）"""
+    return col not in QUANTITY_SKIP_COLUMNS and RESOLVER.is_quantity_column(col)
+
+
+def compact_quote_frame(df):
+    """转换为紧凑报价表，已是紧凑报价表时原样返回
+
+    物料、原始物料名称、序号转为分类；价格、分项小计保留为数值数组；每行作为最低价时的数量
+    在此时算好（行数量，并记录是否有'数量'列），之后丢弃原始的数量候选列和备注等无关列。
+    """
+    if '行数量' in df.columns:
+        return df
+    return pd.DataFrame({
+        '物料': pd.Categorical(df['物料'].to_numpy()),
+        '原始物料名称': pd.Categorical(df.get('原始物料名称', df['物料']).to_numpy()),
+        '序号': pd.Categorical(df['序号'].to_numpy()),
+        '价格': pd.to_numeric(df['价格']).to_numpy(),
+        '分项小计': pd.to_numeric(df['分项小计'], errors='coerce').to_numpy(),
+        '行数量': row_quantities(df).to_numpy(dtype=float),
+        '有数量列': np.full(len(df), '数量' in df.columns),
+    })
+
+
+def _first_float(df, positions):
+    """按列顺序取每行第一个能转换为数字的值（等价于逐列尝试 float()）"""
+    values = pd.Series(np.nan, index=df.index)
+    found = pd.Series(False, index=df.index)
+    for pos in positions:
+        raw = df.iloc[:, pos]
+        numeric = pd.to_numeric(raw, errors='coerce').astype(float)
+        # 空值在 float() 下得到 nan，同样视为成功转换
+        ok = numeric.notna() | raw.isna()
+        take = ok & ~found
+        values[take] = numeric[take]
+        found |= ok
+    return values, found
+
+
+def row_quantities(df):
+    """计算每一行作为最低价时对应的数量"""
+    price = df['价格'].astype(float)
+    subtotal = pd.to_numeric(df['分项小计'], errors='coerce').astype(float)
+
+    # 首先检查是否有'数量'列
+    if '数量' in df.columns:
+        quantity = pd.to_numeric(df['数量'], errors='coerce').astype(float)
+    else:
+        quantity = pd.Series(1.0, index=df.index)
+
+    # 如果没有找到，检查列名包含数量关键词的列
+    keyword_positions = [i for i, col in enumerate(df.columns) if is_quantity_candidate(col)]
+    if keyword_positions:
+        scanned, found = _first_float(df, keyword_positions)
+        take = (quantity == 1) & found
+        quantity = quantity.where(~take, scanned)
+
+    # 如果仍然找不到，通过分项小计和价格计算
+    take = (quantity == 1) & (subtotal > 0) & (price > 0)
+    quantity = quantity.where(~take, subtotal / price)
+
+    # 确保数量不为0或负数
+    quantity = quantity.where(~(quantity <= 0), 1.0)
+    return quantity
+
+
+def _shared_codes(columns):
+    """将各供应商的分类列合并为共享字典，返回 (共享字典, 各列在共享字典中的整数编码)"""
+    columns = [pd.Categorical(column) for column in columns]
+    categories = [column.categories for column in columns]
+    if all(column_categories is categories[0] for column_categories in categories):
+        # 已共用同一字典（见 intern_quote_frames）
+        return categories[0], [column.codes for column in columns]
+    # 空字典不参与合并（否则会影响共享字典的类型）
+    non_empty = [column_categories for column_categories in categories if len(column_categories)] or categories[:1]
+    shared = non_empty[0].append(non_empty[1:]).unique()
+    codes = []
+    for column, column_categories in zip(columns, categories):
+        mapping = np.append(shared.get_indexer(column_categories), -1)  # 编码 -1（空值）仍映射为 -1
+        codes.append(mapping[column.codes])
+    return shared, codes
+
+
+def intern_quote_frames(frames):
+    """转换为紧凑报价表，并让各供应商的分类列共用同一字典
+
+    各供应商分别解析时，相同的物料名称、序号在每张表中各有一份；合并字典后只保留一份，
+    原表释放后内存随供应商数量的增长大幅减少，比对时也可直接按整数编码合并。
+    """
+    frames = [compact_quote_frame(df) for df in frames]
+    if not frames:
+        return frames
+    columns = {}
+    for name in CATEGORY_COLUMNS:
+        shared, codes = _shared_codes([df[name] for df in frames])
+        dtype = pd.CategoricalDtype(shared)
+        columns[name] = [pd.Categorical.from_codes(column_codes, dtype=dtype) for column_codes in codes]
+    return [df.assign(**{name: columns[name][i] for name in CATEGORY_COLUMNS}) for i, df in enumerate(frames)]
+
+
+def coded_quote_frame(df):
+    """将已合并字典的紧凑报价表中的分类列替换为整数编码"""
+    return df.assign(**{name: df[name].cat.codes.to_numpy() for name in CATEGORY_COLUMNS})
+
+
+def stack_coded_quotes(frames, vendor_ids):
+    """按供应商顺序合并报价表（分类列为整数编码），每个供应商每个物料只保留第一条报价
+
+    vendor_ids 为各表的供应商编号，写入'供应商序'列。
+    """
+    quotes = pd.DataFrame({
+        '供应商序': np.concatenate([np.full(len(df), vendor_id) for df, vendor_id in zip(frames, vendor_ids)]),
+        **{name: np.concatenate([df[name].to_numpy() for df in frames]) for name in CATEGORY_COLUMNS},
+        '价格': pd.concat([df['价格'] for df in frames], ignore_index=True).to_numpy(),
+        '分项小计': pd.concat([df['分项小计'] for df in frames], ignore_index=True).to_numpy(),
+        '行数量': np.concatenate([df['行数量'].to_numpy() for df in frames]),
+        '有数量列': np.concatenate([df['有数量列'].to_numpy() for df in frames]),
+    })
+    return quotes.drop_duplicates(subset=['供应商序', '物料'], keep='first').reset_index(drop=True)
+
+
+def _winner_quantities(quotes):
+    """计算中选报价的数量
+
+    逐物料循环中数量变量在供应商之间不会重置：当后面的供应商刷新最低价但没有
+    '数量'列时，会沿用前一个最低价供应商的数量（只要它不等于1）。这里按刷新
+    顺序逐轮向量化地重放这一规则，保证结果与原循环完全一致。
+    """
+    grouped = quotes.groupby('物料', sort=False)['价格']
+    previous_min = grouped.cummin().groupby(quotes['物料'], sort=False).shift()
+    records = quotes[previous_min.isna() | (quotes['价格'] < previous_min)]
+    rank = records.groupby('物料', sort=False).cumcount()
+
+    quantity = records[rank == 0].set_index('物料')['行数量']
+    for k in range(1, int(rank.max()) + 1 if len(rank) else 0):
+        step = records[rank == k].set_index('物料')
+        current = quantity.reindex(step.index)
+        refresh = step['有数量列'] | (current == 1)
+        quantity.loc[step.index] = step['行数量'].where(refresh, current)
+    return quantity
+
+
+def best_quotes(quotes):
+    """找出每个物料的最低价报价（最低价相同时取靠前的供应商）
+
+    quotes 为 stack_coded_quotes 生成的长表。返回以物料编码为索引、按物料首次出现顺序排列的
+    最低价报价（附中选数量'数量'列）。
+    """
+    winner_rows = quotes.groupby('物料', sort=False)['价格'].idxmin().to_numpy()
+    winners = quotes.loc[winner_rows].set_index('物料')
+    winners['数量'] = _winner_quantities(quotes).reindex(winners.index).to_numpy()
+    return winners
+
+
+def index_quote_frame(df):
+    """每个物料只保留第一条报价，以物料编码为索引（df 为 coded_quote_frame 的结果）"""
+    df = df.drop_duplicates(subset=['物料'], keep='first').reset_index(drop=True)
+    df.index = pd.Index(df['物料'].to_numpy())
+    return df
+
+
+def compare_items(vendors, frames, affected=None):
+    """比对物料，返回 (比对状态, 报价向量)
+
+    vendors 为按比价顺序排列的 (供应商编号, 供应商名称)，编号随比价顺序递增；
+    frames 为 {供应商编号: index_quote_frame 的结果}；affected 为要比对的物料编码，None 表示全部物料。
+    比对状态以物料编码为索引，列见 ITEM_COLUMNS；报价向量的列为供应商编号。
+    """
+    vendor_ids = [vendor_id for vendor_id, _ in vendors]
+    parts = []
+    for vendor_id in vendor_ids:
+        frame = frames[vendor_id]
+        if affected is not None:
+            positions = frame.index.get_indexer(affected)
+            frame = frame.iloc[np.sort(positions[positions >= 0])]
+        parts.append(frame)
+    quotes = stack_coded_quotes(parts, vendor_ids)
+    if quotes.empty:
+        return pd.DataFrame(columns=ITEM_COLUMNS), pd.DataFrame(columns=vendor_ids)
+
+    winners = best_quotes(quotes)
+
+    # 物料首次出现的位置（供应商、行），序号相同的物料按此排序
+    codes = winners.index
+    first_vendor = np.full(len(codes), -1)
+    first_row = np.zeros(len(codes), dtype=np.int64)
+    for vendor_id in vendor_ids:
+        positions = frames[vendor_id].index.get_indexer(codes)
+        take = (first_vendor < 0) & (positions >= 0)
+        first_vendor[take] = vendor_id
+        first_row[take] = positions[take]
+
+    prices = quotes.pivot(index='物料', columns='供应商序', values='价格').reindex(index=codes, columns=vendor_ids)
+    runner_price, runner_vendor = _runner_up(prices, winners['供应商序'].to_numpy())
+    items = pd.DataFrame({
+        '序号': winners['序号'].to_numpy(),
+        '物料名称': winners['原始物料名称'].to_numpy(),
+        '最低价': winners['价格'].to_numpy(),
+        '供应商': winners['供应商序'].to_numpy(),
+        '数量': winners['数量'].to_numpy(),
+        '分项小计': winners['分项小计'].to_numpy(),
+        '次低价': runner_price,
+        '次低供应商': runner_vendor,
+        '首次供应商': first_vendor,
+        '首次行': first_row,
+    }, index=codes)
+    return items, prices
+
+
+def _runner_up(prices, winner_vendors):
+    """由报价向量得到每个物料的次低价和次低供应商（去掉中选报价后的最低价，同价时取靠前的供应商）"""
+    matrix = prices.to_numpy(dtype=float, copy=True)
+    rows = np.arange(len(matrix))
+    matrix[rows, prices.columns.get_indexer(winner_vendors)] = np.inf
+    matrix[np.isnan(matrix)] = np.inf
+    positions = matrix.argmin(axis=1)
+    price = matrix[rows, positions]
+    found = np.isfinite(price)
+    vendor = np.where(found, prices.columns.to_numpy(dtype=np.int64)[positions], -1)
+    return np.where(found, price, np.nan), vendor
+
+
+def serial_keys(serial):
+    """对应序号的自然排序键 (是否文本, 数值, 文本排名)：数字序号在前按数值排序，其余按字符串排序"""
+    is_text, numeric, text = _serial_parts(serial)
+    return is_text, numeric, pd.factorize(text, sort=True)[0]
+
+
+def _serial_parts(serial):
+    """(是否文本, 数值, 文本)，数字序号的文本为空字符串，文本序号的数值为0"""
+    serial = pd.Series(serial).reset_index(drop=True)
+    numeric = pd.to_numeric(serial, errors='coerce')
+    is_text = numeric.isna().to_numpy()
+    return is_text, numeric.fillna(0).to_numpy(), serial.astype(str).where(is_text, '').to_numpy()
+
+
+def row_sort_keys(serial, first_vendor, first_row):
+    """结果行的排序键（结构化数组，按字段依次比较，顺序与 serial_order(serial, (first_vendor, first_row)) 一致）
+
+    各行的键可以单独比较，增量更新时用 np.searchsorted 将新的行插入到已排序的结果中，无需重新排序。
+    """
+    is_text, numeric, text = _serial_parts(serial)
+    text = text.astype(str) if len(text) else np.array([], dtype='U1')
+    keys = np.empty(len(is_text), dtype=row_key_dtype(text.dtype.itemsize // 4))
+    keys['is_text'], keys['numeric'], keys['text'] = is_text, numeric, text
+    keys['vendor'], keys['row'] = first_vendor, first_row
+    return keys
+
+
+def row_key_dtype(text_width):
+    """结果行排序键的类型，text_width 为文本序号的最大长度"""
+    return np.dtype([('is_text', '?'), ('numeric', 'f8'), ('text', f'U{max(text_width, 1)}'),
+                     ('vendor', 'i8'), ('row', 'i8')])
+
+
+def serial_order(serial, ties=()):
+    """按对应序号排序后的行顺序（稳定排序）
+
+    序号相同时依次按 ties 中的数组排序，仍相同时保持原顺序。
+    分析时只排序这一次，结果表、中标明细和导出都沿用这个顺序。
+    """
+    is_text, numeric, text = serial_keys(serial)
+    # lexsort 以最后一个键为主键
+    return np.lexsort((*reversed(ties), text, numeric, is_text))
+
+
+def sort_by_serial(analysis_result):
+    """按对应序号排序：数字序号在前按数值排序，其余按字符串排序"""
+    order = serial_order(analysis_result['序号'])
+    return analysis_result.iloc[order].reset_index(drop=True)
+
+
+def decode_codes(dictionary, codes):
+    """将整数编码还原为字典中的值（编码 -1 还原为空值）"""
+    values = pd.Categorical.from_codes(np.asarray(codes, dtype=np.int64), dtype=pd.CategoricalDtype(dictionary))
+    return np.asarray(values, dtype=object)
+
+
+def result_rows(vendors, dictionaries, items, prices):
+    """由比对状态生成最低价分析结果的行（未排序），返回 (结果行, 排序键)
+
+    结果行的列为 RESULT_COLUMNS 和各供应商的'报价_<供应商>'列，排序键见 row_sort_keys。
+    """
+    serial = pd.Series(decode_codes(dictionaries['序号'], items['序号'])).infer_objects()
+    names = pd.Series([name for _, name in vendors], index=[vendor_id for vendor_id, _ in vendors], dtype=object)
+    rows = pd.DataFrame({
+        '序号': serial.to_numpy(),
+        '物料名称': decode_codes(dictionaries['原始物料名称'], items['物料名称']),
+        '最低价': items['最低价'].to_numpy(),
+        '供应商': names.reindex(items['供应商'].to_numpy()).to_numpy(),
+        '数量': items['数量'].to_numpy(),
+        '分项小计': items['分项小计'].to_numpy(),
+    })
+    for vendor_id, vendor in vendors:
+        rows[f'报价_{vendor}'] = prices[vendor_id].to_numpy()
+    keys = row_sort_keys(serial, items['首次供应商'].to_numpy(), items['首次行'].to_numpy())
+    return rows, keys
+
+
+def assemble_result(vendors, dictionaries, items, prices):
+    """由比对状态生成按对应序号排序的最低价分析结果
+
+    序号相同时按物料首次出现的顺序（供应商顺序、行号）。返回 (结果表, 按结果行排列的比对状态, 各行的排序键)。
+    """
+    if items.empty:
+        return pd.DataFrame(), items, row_sort_keys([], [], [])
+    rows, keys = result_rows(vendors, dictionaries, items, prices)
+    order = serial_order(rows['序号'], (keys['vendor'], keys['row']))
+    return rows.iloc[order].reset_index(drop=True), items.iloc[order], keys[order]
+
+
+def compare_prices(data):
+    """分析各供应商报价，返回最低价分析结果（按对应序号排序）
+
+    与增量比价（见 incremental.py）共用 compare_items、assemble_result。
+    """
+    if not data:
+        return pd.DataFrame()
+    frames = intern_quote_frames(data.values())
+    dictionaries = {name: frames[0][name].cat.categories for name in CATEGORY_COLUMNS}
+    vendors = list(enumerate(data.keys()))
+    coded = {vendor_id: index_quote_frame(coded_quote_frame(df)) for (vendor_id, _), df in zip(vendors, frames)}
+    items, prices = compare_items(vendors, coded)
+    return assemble_result(vendors, dictionaries, items, prices)[0]
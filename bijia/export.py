@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+"""
+机器可读的导出格式
+最低价分析表（含各供应商报价列）和供应商中标明细表，按块生成 CSV、NDJSON、Parquet，
+供ERP导入和BI任务使用。Parquet 需要安装 pyarrow（可选依赖）。
+"""
+
+from typing import Callable, NamedTuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - 未安装 pyarrow 时不提供 Parquet 导出
+    pa = pq = None
+
+# 每块的行数
+CHUNK_ROWS = 10000
+
+AWARD_COLUMNS = ['供应商', '对应序号', '中标品名', '单项报价', '数量', '分项小计']
+
+
+class ExportFormat(NamedTuple):
+    """导出格式：MIME类型和按块生成内容的函数"""
+    mimetype: str
+    iter_chunks: Callable
+
+
+def award_table(vendor_stats):
+    """供应商中标明细表（每个供应商内按序号排序）"""
+    if not vendor_stats:
+        return pd.DataFrame(columns=AWARD_COLUMNS)
+    # 保留各行在结果表中的行号作为索引（序号排名），分页查询按序号排序时使用
+    table = pd.concat([items.assign(供应商=vendor) for vendor, items in vendor_stats.items()])
+    return table.rename(columns={'序号': '对应序号', '物料名称': '中标品名'})[AWARD_COLUMNS]
+
+
+# 可导出的表：prices 为最低价分析表（含各供应商报价列），awards 为供应商中标明细表
+EXPORT_TABLES = {
+    'prices': lambda analysis: analysis.analysis_result,
+    'awards': lambda analysis: award_table(analysis.vendor_stats),
+}
+
+
+def export_table(analysis, table):
+    """取出要导出的表，表名不存在时返回 None"""
+    build = EXPORT_TABLES.get(table)
+    return build(analysis) if build is not None else None
+
+
+def _chunks(frame, chunk_rows):
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def iter_csv(frame, chunk_rows=CHUNK_ROWS):
+    """按块生成CSV（UTF-8）"""
+    yield frame.iloc[:0].to_csv(index=False).encode('utf-8')
+    for chunk in _chunks(frame, chunk_rows):
+        yield chunk.to_csv(index=False, header=False).encode('utf-8')
+
+
+def iter_ndjson(frame, chunk_rows=CHUNK_ROWS):
+    """按块生成NDJSON（每行一个JSON对象，NaN 为 null）"""
+    for chunk in _chunks(frame, chunk_rows):
+        text = chunk.to_json(orient='records', lines=True, force_ascii=False)
+        yield (text if text.endswith('\n') else text + '\n').encode('utf-8')
+
+
+class _ParquetSink:
+    """只追加的输出流，ParquetWriter 每写完一个行组即可取出已生成的内容"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_parquet(frame, chunk_rows=CHUNK_ROWS):
+    """按行组生成Parquet"""
+    if pa is None:
+        raise RuntimeError('导出Parquet需要安装 pyarrow')
+    # 序号等列可能混合数字和文本，统一按文本写出
+    frame = frame.apply(lambda col: col.astype(str).where(col.notna(), None) if col.dtype == object else col)
+    schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    sink = _ParquetSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for chunk in _chunks(frame, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+EXPORT_FORMATS = {
+    'csv': ExportFormat('text/csv; charset=utf-8', iter_csv),
+    'ndjson': ExportFormat('application/x-ndjson; charset=utf-8', iter_ndjson),
+    'parquet': ExportFormat('application/vnd.apache.parquet', iter_parquet),
+}
+
+
+def parquet_available():
+    """是否可以导出Parquet"""
+    return pa is not None
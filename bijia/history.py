@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+
+"""
+历史价格库
+每次比价的全部报价（物料、供应商、价格、是否中标）追加保存到本地 SQLite 数据库，
+用于查看物料价格走势、供应商中标率和调价幅度，无需重新上传历史报价单。
+物料按物料列（标准化后的物料名称，启用模糊匹配或物料主数据时为合并后的名称）识别，供应商按名称识别，
+二者在库中编码为整数ID。报价表以 (物料, 供应商, 时间) 为主键聚簇存储（WITHOUT ROWID），
+按物料或物料+供应商查询只读取相邻的几页；供应商中标率按每次比价预先汇总，不扫描报价表。
+报价记录只追加不修改。增删、替换供应商得到的新分析结果与原比价属于同一次招标（记录同一个 root_id），
+记录后同一次招标的其他结果（包括由同一结果分出的其他修改）都标记为已被取代，查询时只计入最新的一个。
+每次比价按内容哈希（见 QuoteComparison.content_key）识别，重新提交同一组报价单（包括命中分析结果缓存时）不重复记录。
+"""
+
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from .log import logger
+from .normalize import normalize_item_name
+
+# 默认返回最近多少次比价
+DEFAULT_TENDERS = 12
+MAX_TENDERS = 500
+
+_SCHEMA = """
+PRAGMA journal_mode = WAL;
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    analysis_id TEXT NOT NULL UNIQUE,
+    content_key TEXT NOT NULL UNIQUE,
+    recorded_at REAL NOT NULL,
+    previous_id INTEGER REFERENCES runs(id),
+    root_id INTEGER REFERENCES runs(id),
+    superseded INTEGER NOT NULL DEFAULT 0,
+    items INTEGER NOT NULL,
+    vendors INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_recorded ON runs(recorded_at);
+CREATE INDEX IF NOT EXISTS runs_root ON runs(root_id);
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vendors (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS prices (
+    item_id INTEGER NOT NULL,
+    vendor_id INTEGER NOT NULL,
+    recorded_at REAL NOT NULL,
+    run_id INTEGER NOT NULL,
+    price REAL NOT NULL,
+    won INTEGER NOT NULL,
+    PRIMARY KEY (item_id, vendor_id, recorded_at, run_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS run_vendors (
+    vendor_id INTEGER NOT NULL,
+    run_id INTEGER NOT NULL,
+    recorded_at REAL NOT NULL,
+    quoted INTEGER NOT NULL,
+    won INTEGER NOT NULL,
+    won_total REAL NOT NULL,
+    PRIMARY KEY (vendor_id, run_id)
+) WITHOUT ROWID;
+"""
+
+# 每条 SQL 语句中 IN (...) 的参数个数上限（旧版 SQLite 最多 999 个参数）
+_CHUNK = 500
+
+# 最近 N 次比价中某物料（某供应商）的报价
+_RECENT = """
+WITH recent AS (
+    SELECT DISTINCT p.recorded_at, p.run_id FROM prices p JOIN runs r ON r.id = p.run_id
+    WHERE p.item_id = ? {vendor} AND r.superseded = 0
+    ORDER BY p.recorded_at DESC, p.run_id DESC LIMIT ?
+)
+SELECT p.recorded_at, p.run_id, p.vendor_id, p.price, p.won FROM prices p
+JOIN recent USING (recorded_at, run_id)
+WHERE p.item_id = ? {vendor}
+"""
+
+
+class PriceHistory:
+    """历史价格库（线程安全）
+
+    path 为 SQLite 数据库文件路径，多个进程可共用同一数据库文件。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def record(self, analysis_id, comparison, previous=None, recorded_at=None):
+        """记录一次比价（comparison 为 incremental.QuoteComparison），返回记录的报价条数
+
+        previous 为增删、替换供应商前的比价模型，新的比价与它属于同一次招标，并取代该招标已记录的其他结果。
+        内容与已记录的比价相同时不重复记录（返回0）；它与 previous 属于同一次招标时重新作为该招标的最新结果。
+        """
+        content_key = comparison.content_key()
+        with self._lock:
+            existing = self._run(content_key)
+            previous_run = None if previous is None else self._run(previous.content_key())
+            if existing is not None:
+                if previous_run is not None and existing[1] == previous_run[1]:
+                    with self._conn:
+                        self._supersede(existing[1], existing[0])
+                logger.info("历史价格库：分析 %s 与已记录的比价相同，不重复记录", analysis_id)
+                return 0
+
+        recorded_at = time.time() if recorded_at is None else recorded_at
+        result = comparison.analysis_result
+        keys = comparison.dictionaries['物料'].take(comparison.row_items).to_numpy()
+        names = result['物料名称'].to_numpy() if len(result) else keys
+        vendors = [name for _, name in comparison.vendors]
+
+        # 报价向量展开为 (物料序号, 供应商序号, 价格)，未报价的不记录
+        values = (result.reindex(columns=[f'报价_{vendor}' for vendor in vendors]).to_numpy(dtype=np.float64)
+                  if len(result) else np.empty((0, len(vendors))))
+        item_pos, vendor_pos = np.nonzero(~np.isnan(values))
+        winners = pd.Index(vendors).get_indexer(result['供应商'].to_numpy()) if len(result) else np.array([], dtype=int)
+        won = vendor_pos == winners[item_pos]
+
+        previous_id, root_id = previous_run or (None, None)
+        with self._lock, self._conn:
+            try:
+                run_id = self._conn.execute(
+                    'INSERT INTO runs (analysis_id, content_key, recorded_at, previous_id, root_id, items, vendors) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (analysis_id, content_key, recorded_at, previous_id, root_id, len(result), len(vendors))).lastrowid
+            except sqlite3.IntegrityError:
+                # 其他线程（进程）刚记录了同一内容的比价
+                logger.info("历史价格库：分析 %s 与已记录的比价相同，不重复记录", analysis_id)
+                return 0
+            if root_id is None:
+                root_id = run_id
+                self._conn.execute('UPDATE runs SET root_id = id WHERE id = ?', (run_id,))
+            self._supersede(root_id, run_id)
+            item_ids = self._upsert('items', 'key', keys, names)
+            history_ids = self._upsert('vendors', 'name', vendors)
+            item_ids = np.array([item_ids[key] for key in keys], dtype=np.int64)
+            history_ids = [history_ids[vendor] for vendor in vendors]
+
+            self._conn.executemany(
+                'INSERT INTO prices (item_id, vendor_id, recorded_at, run_id, price, won) VALUES (?, ?, ?, ?, ?, ?)',
+                zip(item_ids[item_pos].tolist(), [history_ids[i] for i in vendor_pos.tolist()],
+                    [recorded_at] * len(item_pos), [run_id] * len(item_pos), values[item_pos, vendor_pos].tolist(),
+                    won.astype(int).tolist()))
+
+            # 每个供应商的报价数、中标数和中标金额
+            quoted = np.bincount(vendor_pos, minlength=len(vendors))
+            awarded = winners >= 0
+            won_count = np.bincount(winners[awarded], minlength=len(vendors))
+            subtotals = result['分项小计'].to_numpy(dtype=np.float64)[awarded] if len(result) else np.empty(0)
+            won_total = np.bincount(winners[awarded], weights=np.nan_to_num(subtotals), minlength=len(vendors))
+            self._conn.executemany(
+                'INSERT INTO run_vendors (vendor_id, run_id, recorded_at, quoted, won, won_total) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(history_id, run_id, recorded_at, int(quoted[i]), int(won_count[i]), float(won_total[i]))
+                 for i, history_id in enumerate(history_ids)])
+        logger.info("历史价格库：记录分析 %s，报价 %s 条", analysis_id, len(item_pos))
+        return len(item_pos)
+
+    def _run(self, content_key):
+        """内容哈希对应的 (比价ID, 招标ID)，未记录时返回 None（调用方持有锁）"""
+        return self._conn.execute('SELECT id, root_id FROM runs WHERE content_key = ?', (content_key,)).fetchone()
+
+    def _supersede(self, root_id, run_id):
+        """招标 root_id 只保留 run_id 计入查询，其余结果标记为已被取代（调用方持有锁并在事务中调用）"""
+        self._conn.execute('UPDATE runs SET superseded = (id != ?) WHERE root_id = ?', (run_id, root_id))
+
+    def _upsert(self, table, column, values, names=None):
+        """登记物料或供应商（物料更新为最近一次的名称），返回 {值: ID}（调用方持有锁并在事务中调用）"""
+        values = [str(value) for value in values]
+        if names is None:
+            self._conn.executemany(f'INSERT OR IGNORE INTO {table} ({column}) VALUES (?)', [(v,) for v in values])
+        else:
+            self._conn.executemany(
+                f'INSERT INTO {table} ({column}, name) VALUES (?, ?) ON CONFLICT({column}) DO UPDATE SET name = excluded.name',
+                zip(values, (str(name) for name in names)))
+        ids = {}
+        for start in range(0, len(values), _CHUNK):
+            chunk = values[start:start + _CHUNK]
+            ids.update(self._conn.execute(
+                f'SELECT {column}, id FROM {table} WHERE {column} IN ({",".join("?" * len(chunk))})', chunk))
+        return ids
+
+    def _item_id(self, item):
+        """物料名称对应的物料ID（按物料列的规则标准化），不存在时返回 None（调用方持有锁）"""
+        row = self._conn.execute('SELECT id FROM items WHERE key = ?',
+                                 (normalize_item_name(str(item).strip()),)).fetchone()
+        return row[0] if row else None
+
+    def _vendor_id(self, vendor):
+        row = self._conn.execute('SELECT id FROM vendors WHERE name = ?', (vendor,)).fetchone()
+        return row[0] if row else None
+
+    def _recent(self, item, vendor, tenders, window=''):
+        """最近 tenders 次比价中物料（供应商）的报价，物料或供应商不存在时返回 None（调用方持有锁）"""
+        item_id = self._item_id(item)
+        vendor_id = None if vendor is None else self._vendor_id(vendor)
+        if item_id is None or (vendor is not None and vendor_id is None):
+            return None
+        condition = '' if vendor_id is None else 'AND p.vendor_id = ?'
+        params = [item_id] + ([vendor_id] if vendor_id is not None else [])
+        sql = _RECENT.format(vendor=condition)
+        if window:
+            sql = f'SELECT *, {window} FROM ({sql})'
+        sql = (f'SELECT q.*, r.analysis_id, v.name FROM ({sql}) q JOIN runs r ON r.id = q.run_id '
+               f'JOIN vendors v ON v.id = q.vendor_id ORDER BY q.recorded_at, q.run_id, v.name')
+        return self._conn.execute(sql, params + [tenders] + params).fetchall()
+
+    def trend(self, item, vendor=None, tenders=DEFAULT_TENDERS):
+        """物料在最近 tenders 次比价中的报价（按时间排序），物料或供应商不存在时返回 None"""
+        with self._lock:
+            rows = self._recent(item, vendor, tenders)
+        if rows is None:
+            return None
+        return [{'recorded_at': recorded_at, 'analysis_id': analysis_id, 'vendor': name, 'price': price, 'won': bool(won)}
+                for recorded_at, _, _, price, won, analysis_id, name in rows]
+
+    def deltas(self, item, vendor=None, tenders=DEFAULT_TENDERS):
+        """物料在最近 tenders 次比价中各供应商相邻两次报价的变化（按时间排序），物料或供应商不存在时返回 None"""
+        window = ('LAG(price) OVER (PARTITION BY vendor_id ORDER BY recorded_at, run_id) AS previous, '
+                  'LAG(run_id) OVER (PARTITION BY vendor_id ORDER BY recorded_at, run_id) AS previous_run')
+        with self._lock:
+            rows = self._recent(item, vendor, tenders + 1, window)
+            previous_ids = dict(self._conn.execute(
+                f'SELECT id, analysis_id FROM runs WHERE id IN ({",".join("?" * len(rows))})',
+                [row[6] for row in rows])) if rows else {}
+        if rows is None:
+            return None
+        changes = []
+        for recorded_at, _, _, price, _, previous, previous_run, analysis_id, name in rows:
+            if previous is None:
+                continue
+            changes.append({
+                'recorded_at': recorded_at,
+                'analysis_id': analysis_id,
+                'previous_analysis_id': previous_ids.get(previous_run),
+                'vendor': name,
+                'previous_price': previous,
+                'price': price,
+                'delta': price - previous,
+                'percent': (price - previous) / previous * 100 if previous else None,
+            })
+        return changes
+
+    def win_rates(self, item=None, since=None):
+        """各供应商的报价次数、中标次数和中标率（按中标次数排序）
+
+        item 为物料名称时只统计该物料（物料不存在时返回 None），否则统计全部物料；since 为起始时间戳。
+        """
+        since = 0 if since is None else since
+        with self._lock:
+            if item is None:
+                rows = self._conn.execute(
+                    'SELECT v.name, SUM(s.quoted), SUM(s.won), SUM(s.won_total), COUNT(*) FROM run_vendors s '
+                    'JOIN runs r ON r.id = s.run_id JOIN vendors v ON v.id = s.vendor_id '
+                    'WHERE r.superseded = 0 AND s.recorded_at >= ? GROUP BY s.vendor_id', (since,)).fetchall()
+            else:
+                item_id = self._item_id(item)
+                if item_id is None:
+                    return None
+                rows = self._conn.execute(
+                    'SELECT v.name, COUNT(*), SUM(p.won), NULL, COUNT(*) FROM prices p '
+                    'JOIN runs r ON r.id = p.run_id JOIN vendors v ON v.id = p.vendor_id '
+                    'WHERE p.item_id = ? AND p.recorded_at >= ? AND r.superseded = 0 GROUP BY p.vendor_id',
+                    (item_id, since)).fetchall()
+        rates = [{'vendor': name, 'tenders': tenders, 'quoted': quoted, 'won': won,
+                  'win_rate': won / quoted if quoted else 0.0, 'won_total': won_total}
+                 for name, quoted, won, won_total, tenders in rows]
+        rates.sort(key=lambda rate: (-rate['won'], -rate['win_rate'], rate['vendor']))
+        return rates
+
+    def items(self, prefix='', limit=50):
+        """按物料列前缀查找已记录的物料：[{'item': 物料列, 'name': 最近一次的物料名称}]"""
+        prefix = normalize_item_name(str(prefix).strip()) if prefix else ''
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT key, name FROM items WHERE key >= ? AND key < ? ORDER BY key LIMIT ?',
+                (prefix, prefix + '\U0010ffff', limit)).fetchall()
+        return [{'item': key, 'name': name} for key, name in rows]
+
+    def stats(self):
+        """已记录的比价次数、物料数、供应商数和报价条数"""
+        with self._lock:
+            runs, current = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(1 - superseded), 0) FROM runs').fetchone()
+            items = self._conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+            vendors = self._conn.execute('SELECT COUNT(*) FROM vendors').fetchone()[0]
+            quotes = self._conn.execute('SELECT COALESCE(SUM(quoted), 0) FROM run_vendors').fetchone()[0]
+        return {'runs': runs, 'current_runs': current, 'items': items, 'vendors': vendors, 'quotes': quotes}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+
+"""
+增量比价
+保存按对应序号排序的分析结果、各行的物料编码、排序键和次低价报价，以及各供应商的中标明细表。
+某个供应商的报价单新增、替换或删除时，只重新比对该供应商新旧报价单中的物料
+（与 compare_prices 共用 compare.compare_items，规则完全一致），
+再将这些物料的新结果行按排序键插入到其余已排序的行之间（np.searchsorted），
+只重建中标物料有变化的供应商的中标明细，其余供应商的明细只按插入、删除的行平移行号。
+次低价只随该物料的报价变化，与最低价一起随受影响的物料重新比对。
+模型不可变：每次更新返回新的模型，旧模型及其分析结果仍然有效。
+开启物料模糊匹配（见 matching.py）时，物料组可能随任一供应商的变化而改变，更新时重新匹配并比对全部物料，
+这种情况下的更新不是增量的，耗时与完整比价相同。
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from .compare import (CATEGORY_COLUMNS, RESULT_COLUMNS, RUNNER_UP_COLUMNS, assemble_result, coded_quote_frame,
+                      compact_quote_frame, compare_items, decode_codes, index_quote_frame, intern_quote_frames,
+                      row_key_dtype)
+from .matching import align_items
+from .models import Analysis
+from .progress import NO_PROGRESS
+from .stats import award_frame, build_vendor_stats
+
+
+class QuoteComparison:
+    """可增量更新的比价模型
+
+    vendors 为按比价顺序排列的 (供应商编号, 供应商名称)，编号在模型的整个生命周期内不变、随比价顺序递增；
+    frames 为各供应商的报价表（分类列为整数编码，以物料编码为索引），编码到只追加的共享字典 dictionaries；
+    analysis_result 为按对应序号排序的分析结果，row_items、row_serials、row_keys 为其各行的物料编码、
+    序号编码和排序键（见 compare.row_sort_keys）；runners_up 为各行的次低价和次低供应商编号（列见
+    compare.RUNNER_UP_COLUMNS）；vendor_stats 为各供应商的中标明细表（索引为结果表中的行号）。
+    开启模糊匹配时 item_index 为物料组索引（见 matching.ItemIndex），
+    sources 为模糊匹配前的各供应商报价表（供应商名称 -> 紧凑报价表），更新时据此重新匹配并比对全部物料（非增量）。
+    """
+
+    def __init__(self, vendors, frames, dictionaries, analysis_result, row_items, row_serials, row_keys,
+                 runners_up, vendor_stats, changed_items=0, item_index=None, sources=None):
+        self.vendors = vendors
+        self.frames = frames
+        self.dictionaries = dictionaries
+        self.analysis_result = analysis_result
+        self.row_items = row_items
+        self.row_serials = row_serials
+        self.row_keys = row_keys
+        self.runners_up = runners_up
+        self.vendor_stats = vendor_stats
+        self.changed_items = changed_items  # 最近一次更新重新比对的物料数量
+        self.item_index = item_index
+        self.sources = sources
+        self._content_key = None
+
+    @classmethod
+    def from_frames(cls, data, progress=NO_PROGRESS, match_threshold=None):
+        """由 {供应商名称: 报价表} 建立模型（全部物料比对一次），match_threshold 为模糊匹配的相似度阈值"""
+        frames = intern_quote_frames(data.values())
+        if not frames:
+            raise ValueError('至少需要一份报价单')
+        item_index = sources = None
+        if match_threshold:
+            progress.stage('match')
+            sources = dict(zip(data.keys(), frames))
+            aligned, item_index = align_items(sources, match_threshold)
+            frames = list(aligned.values())
+        dictionaries = {name: frames[0][name].cat.categories for name in CATEGORY_COLUMNS}
+        vendors = list(enumerate(data.keys()))
+        coded = {vendor_id: index_quote_frame(coded_quote_frame(frame)) for (vendor_id, _), frame in zip(vendors, frames)}
+        progress.stage('compare')
+        items, prices = compare_items(vendors, coded)
+        analysis_result, rows, row_keys = assemble_result(vendors, dictionaries, items, prices)
+        progress.stage('stats')
+        return cls(vendors, coded, dictionaries, analysis_result, rows.index.to_numpy(), rows['序号'].to_numpy(),
+                   row_keys, _runners_up(rows), build_vendor_stats(analysis_result), len(items), item_index, sources)
+
+    @property
+    def vendor_names(self):
+        return [name for _, name in self.vendors]
+
+    def analysis(self, errors=None):
+        """当前的分析结果"""
+        return Analysis(self.analysis_result, self.vendor_stats, list(errors or []))
+
+    def runner_up(self):
+        """各结果行的次低价和次低供应商（与 analysis_result 的行对应，只有一个供应商报价时为空值）"""
+        names = pd.Series(self.vendor_names, index=[vendor_id for vendor_id, _ in self.vendors], dtype=object)
+        return pd.DataFrame({
+            '次低价': self.runners_up['次低价'].to_numpy(),
+            '次低供应商': names.reindex(self.runners_up['次低供应商'].to_numpy()).to_numpy(),
+        })
+
+    def add(self, vendor, frame):
+        """新增供应商的报价单（排在最后），返回新的模型"""
+        if vendor in self.vendor_names:
+            raise ValueError(f'供应商 {vendor} 已存在')
+        if self.item_index is not None:
+            return self._rematch({**self.sources, vendor: frame})
+        vendor_id = max(vendor_id for vendor_id, _ in self.vendors) + 1
+        coded, dictionaries = self._encode(frame)
+        vendors = self.vendors + [(vendor_id, vendor)]
+        frames = {**self.frames, vendor_id: coded}
+        return self._update(vendors, frames, dictionaries, coded.index)
+
+    def replace(self, vendor, frame):
+        """替换供应商的报价单（保留原有的比价顺序和供应商名称），返回新的模型"""
+        vendor_id = self._vendor_id(vendor)
+        if self.item_index is not None:
+            return self._rematch({**self.sources, vendor: frame})
+        coded, dictionaries = self._encode(frame)
+        frames = {**self.frames, vendor_id: coded}
+        affected = self.frames[vendor_id].index.union(coded.index)
+        return self._update(self.vendors, frames, dictionaries, affected)
+
+    def remove(self, vendor):
+        """删除供应商的报价单，返回新的模型"""
+        vendor_id = self._vendor_id(vendor)
+        if len(self.vendors) == 1:
+            raise ValueError('不能删除最后一个供应商')
+        if self.item_index is not None:
+            return self._rematch({name: frame for name, frame in self.sources.items() if name != vendor})
+        vendors = [entry for entry in self.vendors if entry[0] != vendor_id]
+        frames = {key: frame for key, frame in self.frames.items() if key != vendor_id}
+        return self._update(vendors, frames, self.dictionaries, self.frames[vendor_id].index)
+
+    def _rematch(self, data):
+        """重新模糊匹配并比对全部物料（物料组可能整体变化，无法只比对受影响的物料）"""
+        return QuoteComparison.from_frames(data, match_threshold=self.item_index.threshold)
+
+    def _vendor_id(self, vendor):
+        for vendor_id, name in self.vendors:
+            if name == vendor:
+                return vendor_id
+        raise KeyError(vendor)
+
+    def _encode(self, frame):
+        """将报价表的分类列编码到共享字典（字典只追加，已有编码保持不变）"""
+        frame = compact_quote_frame(frame)
+        dictionaries = dict(self.dictionaries)
+        columns = {}
+        for name in CATEGORY_COLUMNS:
+            column = pd.Categorical(frame[name])
+            known = dictionaries[name]
+            mapping = known.get_indexer(column.categories)
+            missing = mapping < 0
+            if missing.any():
+                mapping[missing] = np.arange(len(known), len(known) + int(missing.sum()))
+                dictionaries[name] = known.append(column.categories[missing])
+            columns[name] = np.append(mapping, -1)[column.codes]
+        return index_quote_frame(frame.assign(**columns)), dictionaries
+
+    def _update(self, vendors, frames, dictionaries, affected):
+        """重新比对受影响的物料，将其结果行插入已排序的结果，并更新受影响供应商的中标明细"""
+        affected = pd.Index(affected).unique()
+        items, prices = compare_items(vendors, frames, affected)
+        columns = RESULT_COLUMNS + [f'报价_{vendor}' for _, vendor in vendors]
+
+        # 受影响物料的新结果行（已按排序键排好）
+        rows, ordered, keys = assemble_result(vendors, dictionaries, items, prices)
+
+        # 其余的行保持原有顺序，新行按排序键插入
+        stale = np.isin(self.row_items, affected.to_numpy())
+        kept = np.flatnonzero(~stale)
+        kept_keys = self.row_keys[kept]
+        dtype = row_key_dtype(max(kept_keys.dtype['text'].itemsize, keys.dtype['text'].itemsize) // 4)
+        kept_keys, keys = kept_keys.astype(dtype), keys.astype(dtype)
+        inserted = np.searchsorted(kept_keys, keys) + np.arange(len(keys))
+        total = len(kept) + len(keys)
+        is_new = np.zeros(total, dtype=bool)
+        is_new[inserted] = True
+        moved = np.flatnonzero(~is_new)  # 保留的各行在新结果中的行号
+
+        source = np.empty(total, dtype=np.int64)
+        source[moved] = np.arange(len(kept))
+        source[inserted] = len(kept) + np.arange(len(keys))
+        row_keys = np.concatenate([kept_keys, keys])[source]
+        row_items = np.concatenate([self.row_items[kept], ordered.index.to_numpy()])[source]
+        row_serials = np.concatenate([self.row_serials[kept], ordered['序号'].to_numpy()])[source]
+        runners_up = pd.concat([self.runners_up.iloc[kept], _runners_up(ordered)], ignore_index=True).iloc[source]
+        runners_up = runners_up.reset_index(drop=True)
+        if total == 0:
+            analysis_result = pd.DataFrame()
+        else:
+            parts = [part.reindex(columns=columns) for part in (self.analysis_result.iloc[kept], rows) if len(part)]
+            analysis_result = pd.concat(parts, ignore_index=True).iloc[source].reset_index(drop=True)
+            # 序号列的类型取决于全部序号（与完整比对时的推断一致）
+            analysis_result['序号'] = pd.Series(decode_codes(dictionaries['序号'], row_serials)).infer_objects()
+
+        vendor_stats = _patch_vendor_stats(self.vendor_stats, stale, moved, analysis_result, inserted)
+        return QuoteComparison(vendors, frames, dictionaries, analysis_result, row_items, row_serials, row_keys,
+                               runners_up, vendor_stats, len(affected))
+
+    def content_key(self):
+        """比价内容的哈希（物料、供应商和分析结果相同时相同），用于识别重复提交的同一次比价"""
+        if self._content_key is None:
+            digest = hashlib.sha256('\n'.join(map(str, self.analysis_result.columns)).encode('utf-8'))
+            if len(self.analysis_result):
+                keys = pd.Series(self.dictionaries['物料'].take(self.row_items))
+                digest.update(pd.util.hash_pandas_object(keys, index=False).to_numpy().tobytes())
+                digest.update(pd.util.hash_pandas_object(self.analysis_result, index=False).to_numpy().tobytes())
+            self._content_key = digest.hexdigest()
+        return self._content_key
+
+    def memory_usage(self):
+        """模型占用的内存（字节，粗略估计）"""
+        size = sum(int(frame.memory_usage(index=True).sum()) for frame in self.frames.values())
+        size += int(self.analysis_result.memory_usage(index=True).sum())
+        size += self.row_items.nbytes + self.row_serials.nbytes + self.row_keys.nbytes
+        size += int(self.runners_up.memory_usage(index=True).sum())
+        size += sum(int(dictionary.memory_usage(deep=True)) for dictionary in self.dictionaries.values())
+        if self.sources is not None:
+            size += sum(int(frame.memory_usage(index=True).sum()) for frame in self.sources.values())
+        return size
+
+
+def _runners_up(items):
+    """比对状态中的次低价报价（行号从0开始，与结果行对应）"""
+    return items[RUNNER_UP_COLUMNS].astype({'次低价': float, '次低供应商': np.int64}).reset_index(drop=True)
+
+
+def _patch_vendor_stats(vendor_stats, stale, moved, analysis_result, inserted):
+    """更新中标明细：去掉重新比对的行、加入新的中标行，其余行按新的行号重新编号
+
+    stale 为旧结果中重新比对的行，moved 为其余各行在新结果中的行号，inserted 为新的结果行的行号。
+    中标物料有变化的供应商重新合并明细，其余供应商只替换索引；供应商按首次中标的顺序排列。
+    """
+    kept_position = np.cumsum(~stale) - 1  # 旧行号 -> 在保留行中的序号
+    awards = award_frame(analysis_result.iloc[inserted]).set_axis(inserted) if len(inserted) else None
+    new_awards = dict(tuple(awards.groupby('供应商', sort=False))) if awards is not None else {}
+    serial = analysis_result['序号'] if len(analysis_result) else None
+
+    patched = {}
+    for vendor, items in vendor_stats.items():
+        old_rows = items.index.to_numpy()
+        keep = ~stale[old_rows]
+        if keep.all() and vendor not in new_awards:
+            items = items.set_axis(moved[kept_position[old_rows]])
+        else:
+            items = items[keep].set_axis(moved[kept_position[old_rows[keep]]])
+            if vendor in new_awards:
+                awarded = new_awards.pop(vendor).drop(columns='供应商')
+                items = pd.concat([items, awarded]).sort_index() if len(items) else awarded
+            if not len(items):
+                continue
+        if items['序号'].dtype != serial.dtype:
+            # 序号列的类型随全部序号改变时，明细表的序号列与结果表保持一致
+            items = items.assign(序号=serial.to_numpy()[items.index.to_numpy()])
+        patched[vendor] = items
+    for vendor, items in new_awards.items():
+        patched[vendor] = items.drop(columns='供应商')
+    return dict(sorted(patched.items(), key=lambda entry: entry[1].index[0]))
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""
+多文件并行解析
+openpyxl 解析Excel是CPU密集型操作，多份报价单在进程池中并行解析，
+子进程只回传精简后的标准化数据。
+"""
+
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from .cache import hash_source
+from .compare import compact_quote_frame
+from .log import configure_logging, get_request_id, logger, reset_request_id, set_request_id
+from .parse import read_quote
+from .progress import FILE_CACHED, FILE_FAILED, FILE_PARSED, NO_PROGRESS
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def default_workers():
+    """默认的解析进程数（CPU核数）"""
+    return os.cpu_count() or 1
+
+
+def _get_pool(workers):
+    """获取（必要时创建）共享的解析进程池"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # 子进程沿用当前的日志配置（Windows下子进程不会继承日志处理器）
+            _pool = ProcessPoolExecutor(max_workers=workers, initializer=configure_logging,
+                                        initargs=(logger.getEffectiveLevel(),))
+            _pool_workers = workers
+        return _pool
+
+
+def _reset_pool():
+    """丢弃已损坏的进程池，下次使用时重新创建"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+
+
+def parse_source(source, filename, kind=None):
+    """解析单份报价单，source 为文件路径或文件内容（bytes）"""
+    try:
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        quote, error = read_quote(source, filename, kind)
+        if error:
+            return None, error
+        return quote._replace(frame=compact_quote_frame(quote.frame)), None
+    except Exception as e:
+        return None, f"处理文件 {filename} 时出错：{str(e)}"
+
+
+def _parse_source_task(request_id, args):
+    """进程池中执行的解析任务，沿用发起请求的日志关联ID"""
+    token = set_request_id(request_id)
+    try:
+        return parse_source(*args)
+    finally:
+        reset_request_id(token)
+
+
+def hash_sources(sources):
+    """计算各报价单的内容哈希，文件无法读取时为 None（交给解析时报错）"""
+    hashes = []
+    for source, _, _ in sources:
+        try:
+            hashes.append(hash_source(source))
+        except OSError:
+            hashes.append(None)
+    return hashes
+
+
+def parse_sources(sources, workers=None, cache=None, hashes=None, progress=NO_PROGRESS):
+    """解析多份报价单
+
+    sources 为 (source, filename, kind) 列表，返回与之顺序一致的 (quote, error) 列表。
+    workers 为解析进程数，默认使用CPU核数；小于等于1时在当前进程中依次解析。
+    cache 为可选的 ParseCache，内容未变的报价单直接使用缓存的解析结果；
+    hashes 为已计算好的内容哈希（与 sources 顺序一致）；
+    progress 在每份报价单处理完成时收到通知（见 progress.py）。
+    """
+    sources = list(sources)
+    results = [None] * len(sources)
+    keys = [None] * len(sources)
+    if cache is not None:
+        if hashes is None:
+            hashes = hash_sources(sources)
+        for i, ((_, filename, kind), content_hash) in enumerate(zip(sources, hashes)):
+            if content_hash is None:
+                continue
+            keys[i] = cache.key(content_hash, filename, kind)
+            quote = cache.get(keys[i])
+            if quote is not None:
+                logger.debug("使用解析缓存：%s", filename)
+                results[i] = (quote, None)
+                progress.file_done(i, FILE_CACHED)
+
+    pending = [i for i, result in enumerate(results) if result is None]
+
+    def done(j, result):
+        i = pending[j]
+        quote, error = result
+        results[i] = result
+        if keys[i] is not None and quote is not None:
+            cache.put(keys[i], quote)
+        progress.file_done(i, FILE_FAILED if error else FILE_PARSED, error)
+
+    _parse_all([sources[i] for i in pending], workers, done)
+    return results
+
+
+def _parse_all(sources, workers, on_done):
+    """解析全部报价单，每份解析完成（按完成顺序）时调用 on_done(序号, (quote, error))"""
+    if workers is None:
+        workers = default_workers()
+
+    finished = set()
+
+    def finish(i, result):
+        finished.add(i)
+        on_done(i, result)
+
+    if workers > 1 and len(sources) > 1:
+        try:
+            request_id = get_request_id()
+            pool = _get_pool(workers)
+            futures = {pool.submit(_parse_source_task, request_id, args): i for i, args in enumerate(sources)}
+            for future in as_completed(futures):
+                finish(futures[future], future.result())
+            return
+        except (BrokenProcessPool, NotImplementedError, OSError) as e:
+            # 运行环境不支持多进程（如部分Serverless平台）时退回到顺序解析
+            logger.warning("进程池不可用，改为顺序解析：%s", e)
+            _reset_pool()
+
+    for i, args in enumerate(sources):
+        if i not in finished:
+            finish(i, parse_source(*args))
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+"""
+后台分析任务
+上传请求只负责接收文件并提交任务，立即返回任务ID；本地线程池在后台执行解析和比对
+（解析本身仍在进程池中并行），前端轮询任务状态，可看到每份文件的处理进度和各阶段耗时。
+任务状态只保存在当前进程的内存中，不依赖外部消息队列；完成后的分析结果保存到 AnalysisStore。
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .log import get_request_id, logger, reset_request_id, set_request_id
+from .progress import Progress
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# 文件尚未处理完成
+FILE_PENDING = 'pending'
+
+
+class QueueFull(Exception):
+    """排队的任务过多"""
+
+
+class Job(Progress):
+    """一个后台分析任务（线程安全），同时作为分析流程的进度对象"""
+
+    def __init__(self, job_id, filenames):
+        self.id = job_id
+        self.status = QUEUED
+        self.files = [{'filename': filename, 'status': FILE_PENDING, 'error': None} for filename in filenames]
+        self.stages = []  # [阶段名称, 开始时间, 结束时间]
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.analysis_id = None
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        now = time.time()
+        with self._lock:
+            self._close_stage(now)
+            self.stages.append([name, now, None])
+
+    def file_done(self, index, status, error=None):
+        with self._lock:
+            if 0 <= index < len(self.files):
+                self.files[index].update(status=status, error=error)
+
+    def _close_stage(self, now):
+        if self.stages and self.stages[-1][2] is None:
+            self.stages[-1][2] = now
+
+    def start(self):
+        with self._lock:
+            self.status = RUNNING
+            self.started_at = time.time()
+
+    def finish(self, analysis_id=None, errors=None):
+        """任务结束：成功时记录分析ID，失败时记录错误信息"""
+        now = time.time()
+        with self._lock:
+            self._close_stage(now)
+            self.finished_at = now
+            self.analysis_id = analysis_id
+            self.errors = list(errors or [])
+            self.status = DONE if analysis_id and not self.errors else FAILED
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def snapshot(self):
+        """任务状态（可直接序列化为JSON）"""
+        now = time.time()
+        with self._lock:
+            end = self.finished_at or now
+            done = sum(1 for f in self.files if f['status'] != FILE_PENDING)
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'files': [dict(f) for f in self.files],
+                'files_done': done,
+                'files_total': len(self.files),
+                'stages': [
+                    {'name': name, 'seconds': round((stopped or now) - started, 3)}
+                    for name, started, stopped in self.stages
+                ],
+                'queued_seconds': round((self.started_at or end) - self.created_at, 3),
+                'elapsed_seconds': round(end - (self.started_at or end), 3),
+                'analysis_id': self.analysis_id,
+                'errors': list(self.errors),
+            }
+
+
+class JobQueue:
+    """本地后台任务队列
+
+    workers 为同时执行的任务数，max_pending 为未完成任务（排队中和执行中）的上限，
+    ttl 为已结束任务的状态保留时间（秒）。
+    """
+
+    def __init__(self, workers=2, max_pending=32, ttl=3600):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._jobs = OrderedDict()  # 任务ID -> Job
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bijia-job')
+
+    def submit(self, func, filenames):
+        """提交任务，func(job) 在后台线程中执行并返回 (分析ID, 错误信息列表)
+
+        排队的任务超过上限时抛出 QueueFull。
+        """
+        job = Job(uuid.uuid4().hex, filenames)
+        with self._lock:
+            self._purge(time.time())
+            pending = sum(1 for existing in self._jobs.values() if not existing.finished)
+            if pending >= self.max_pending:
+                raise QueueFull(f'排队的分析任务过多（{pending}），请稍后再试')
+            self._jobs[job.id] = job
+        # 后台线程沿用提交任务的请求的日志关联ID
+        self._executor.submit(self._run, job, func, get_request_id())
+        logger.info("提交分析任务：%s，报价单数量：%s", job.id, len(filenames))
+        return job
+
+    def get(self, job_id):
+        """读取任务，不存在或已过期时返回 None"""
+        with self._lock:
+            self._purge(time.time())
+            return self._jobs.get(job_id)
+
+    def _run(self, job, func, request_id):
+        token = set_request_id(request_id)
+        try:
+            job.start()
+            try:
+                analysis_id, errors = func(job)
+            except Exception as e:
+                logger.exception("分析任务失败：%s", job.id)
+                analysis_id, errors = None, [f'分析出错：{str(e)}']
+            job.finish(analysis_id, errors)
+            logger.info("分析任务结束：%s，状态：%s", job.id, job.status)
+        finally:
+            reset_request_id(token)
+
+    def _purge(self, now):
+        """删除结束超过有效期的任务"""
+        for job_id in [key for key, job in self._jobs.items()
+                       if job.finished and now - job.finished_at > self.ttl]:
+            del self._jobs[job_id]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
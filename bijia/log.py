@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+"""
+日志
+基于标准库 logging：按级别过滤，消息使用 %s 参数延迟格式化，
+每条日志带上当前请求的关联ID，便于在多请求并发时串联同一次分析的日志。
+"""
+
+import contextvars
+import logging
+import os
+import uuid
+
+logger = logging.getLogger('bijia')
+
+# 当前请求的关联ID
+_request_id = contextvars.ContextVar('request_id', default='-')
+
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s'
+
+
+class lazy:
+    """延迟计算的日志参数，只有日志真正输出时才调用 func（如 DataFrame 预览）"""
+
+    __slots__ = ('func',)
+
+    def __init__(self, func):
+        self.func = func
+
+    def __str__(self):
+        return str(self.func())
+
+
+class RequestIdFilter(logging.Filter):
+    """为日志记录添加 request_id 字段"""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+def new_request_id():
+    """生成新的请求关联ID"""
+    return uuid.uuid4().hex[:12]
+
+
+def get_request_id():
+    """当前请求的关联ID"""
+    return _request_id.get()
+
+
+def set_request_id(request_id):
+    """设置当前请求的关联ID，返回可用于 reset_request_id 的令牌"""
+    return _request_id.set(request_id or '-')
+
+
+def reset_request_id(token):
+    """恢复设置之前的关联ID"""
+    _request_id.reset(token)
+
+
+def configure_logging(level=None):
+    """配置日志输出，级别默认读取环境变量 LOG_LEVEL（默认 INFO）"""
+    level = level or os.environ.get('LOG_LEVEL', 'INFO')
+    root = logging.getLogger()
+    if not any(isinstance(f, RequestIdFilter) for h in root.handlers for f in h.filters):
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handler.addFilter(RequestIdFilter())
+        root.addHandler(handler)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
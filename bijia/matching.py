@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""
+物料模糊匹配
+各供应商的物料只有标准化名称（物料列）完全相同时才会一起比价，
+“A4纸 70g”与“A4 纸70克”这类写法不同的同一物料会各自成为一行，得不到比较。
+开启模糊匹配后，物料名称进一步规整（统一数字后常见单位的写法，去掉空格和符号），规整后相同的直接合并；
+其余名称拆成字符三元组，按三元组倒排索引查找候选物料组并计算相似度（Jaccard），无需两两比较全部物料。
+相似度不低于阈值 t 的两个名称至少共享名称A中任意 |A|-⌈t|A|⌉+1 个三元组中的一个，
+因此只需取出现次数最少的这几个三元组查找候选（前缀过滤），再逐个精确计算相似度。
+名称中的数字不同（如70g与80g）时不会合并，倒排索引也按名称中的数字分区，只在数字相同的物料组中查找。
+各供应商按比价顺序依次将物料归入已有的物料组或新建物料组，同一供应商的不同物料不会归入同一组；
+组内物料的物料列统一改为该组第一个物料的物料列，之后的比对流程不变。
+"""
+
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+from .compare import intern_quote_frames
+from .log import logger
+
+# 默认的相似度阈值（三元组 Jaccard 相似度）
+DEFAULT_THRESHOLD = 0.8
+# 字符n元组的长度
+GRAM_SIZE = 3
+
+# 常见单位的中文写法
+UNIT_ALIASES = {
+    '千克': 'kg', '公斤': 'kg', '毫升': 'ml', '毫米': 'mm', '厘米': 'cm',
+    '克': 'g', '升': 'l', '米': 'm',
+}
+# 只改写紧跟在数字后面的单位（“70克”→“70g”），“大米”“巧克力”等名称中的字不受影响
+_UNITS = re.compile(r'(?<=\d)\s*(' + '|'.join(sorted(UNIT_ALIASES, key=len, reverse=True)) + ')')
+_NON_WORD = re.compile(r'[\W_]+')
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+
+def match_key(name):
+    """用于模糊匹配的名称：统一数字后的单位写法，去掉空格和符号"""
+    name = _UNITS.sub(lambda m: UNIT_ALIASES[m.group(1)], str(name).lower())
+    return _NON_WORD.sub('', name)
+
+
+def name_grams(key, size=GRAM_SIZE):
+    """名称的字符n元组集合（短于n个字符的名称整体作为一个元组）"""
+    if len(key) <= size:
+        return {key}
+    return {key[i:i + size] for i in range(len(key) - size + 1)}
+
+
+class ItemIndex:
+    """物料组的三元组倒排索引（只追加）
+
+    每个物料组以第一个物料的物料列为组名，记录组内的 (供应商, 物料列) 和已归入的供应商。
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.keys = []  # 物料组 -> 组名
+        self.members = []  # 物料组 -> [(供应商, 物料列)]
+        self._grams = []  # 物料组 -> 三元组集合
+        self._vendors = []  # 物料组 -> 已归入的供应商
+        self._postings = {}  # (名称中的数字, 三元组) -> [物料组]
+        self._exact = {}  # 物料列 -> 物料组
+        self._match_keys = {}  # 规整后的名称 -> [物料组]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add_vendor(self, vendor, keys):
+        """将一个供应商的物料（物料列的唯一值）归入物料组，返回 {物料列: 组名}（只包含需要改写的物料）"""
+        mapping = {}
+        pending = []
+        # 先归入物料列完全相同的组，避免这些组被本供应商写法相近的其他物料占用
+        for key in keys:
+            group = self._exact.get(key)
+            if group is None or vendor in self._vendors[group]:
+                pending.append(key)
+            else:
+                self._join(group, vendor, key, mapping)
+        for key in pending:
+            mkey = match_key(key)
+            group = self._same_match_key(mkey, vendor)
+            if group is None:
+                grams = name_grams(mkey)
+                numbers = tuple(sorted(_NUMBER.findall(mkey)))
+                group = self._best(grams, numbers, vendor)
+                if group is None:
+                    group = self._new_group(key, mkey, grams, numbers)
+            self._join(group, vendor, key, mapping)
+        return mapping
+
+    def _join(self, group, vendor, key, mapping):
+        self._vendors[group].add(vendor)
+        self.members[group].append((vendor, key))
+        self._exact.setdefault(key, group)
+        if key != self.keys[group]:
+            mapping[key] = self.keys[group]
+
+    def _new_group(self, key, mkey, grams, numbers):
+        group = len(self.keys)
+        self.keys.append(key)
+        self.members.append([])
+        self._grams.append(grams)
+        self._vendors.append(set())
+        for gram in grams:
+            self._postings.setdefault((numbers, gram), []).append(group)
+        self._match_keys.setdefault(mkey, []).append(group)
+        return group
+
+    def _same_match_key(self, mkey, vendor):
+        """规整后名称相同（相似度为1）且尚未归入该供应商的第一个物料组"""
+        for group in self._match_keys.get(mkey, ()):
+            if vendor not in self._vendors[group]:
+                return group
+        return None
+
+    def _best(self, grams, numbers, vendor):
+        """相似度最高（相同时取先建立的组）且不低于阈值的物料组，没有时返回 None"""
+        # 前缀过滤：候选组必然包含出现次数最少的 prefix 个三元组之一
+        postings = sorted((self._postings.get((numbers, gram), ()) for gram in grams), key=len)
+        prefix = len(grams) - math.ceil(self.threshold * len(grams)) + 1
+        candidates = set()
+        for groups in postings[:max(prefix, 1)]:
+            candidates.update(groups)
+
+        best, best_score = None, 0.0
+        for group in candidates:
+            shared = len(grams & self._grams[group])
+            score = shared / (len(grams) + len(self._grams[group]) - shared)
+            if score < self.threshold or vendor in self._vendors[group]:
+                continue
+            if best is None or score > best_score or (score == best_score and group < best):
+                best, best_score = group, score
+        return best
+
+    def groups(self):
+        """合并了不同写法的物料组：[(组名, [(供应商, 物料列)])]"""
+        return [(key, list(members)) for key, members in zip(self.keys, self.members)
+                if any(member != key for _, member in members)]
+
+
+def _remap(column, mapping):
+    """按 {物料列: 组名} 改写分类列的编码，字典保持不变（组名本身就在字典中）"""
+    categories = column.cat.categories
+    code_map = np.arange(len(categories) + 1) - 1  # 多出的一项对应编码 -1（空值）
+    aliases = categories.get_indexer(list(mapping))
+    canonical = categories.get_indexer(list(mapping.values()))
+    code_map[aliases + 1] = canonical
+    codes = code_map[column.cat.codes.to_numpy().astype(np.int64) + 1]
+    return pd.Categorical.from_codes(codes, dtype=column.dtype)
+
+
+def align_items(data, threshold=DEFAULT_THRESHOLD):
+    """按模糊匹配结果改写各供应商报价表的物料列
+
+    data 为按比价顺序排列的 {供应商: 报价表}，先转换为共用同一字典的紧凑报价表（见 compare.intern_quote_frames）。
+    返回 (改写后的 {供应商: 报价表}, ItemIndex)，合并的物料组见 ItemIndex.groups()。
+    """
+    index = ItemIndex(threshold)
+    aligned = {}
+    for vendor, frame in zip(data, intern_quote_frames(data.values())):
+        column = frame['物料']
+        # 按物料在报价单中出现的顺序归组
+        codes = pd.unique(column.cat.codes.to_numpy())
+        mapping = index.add_vendor(vendor, column.cat.categories.take(codes[codes >= 0]))
+        aligned[vendor] = frame.assign(物料=_remap(column, mapping)) if mapping else frame
+    merged = sum(1 for key, members in index.groups() for _, member in members if member != key)
+    logger.info("模糊匹配：物料组数量：%s，归入其他写法的物料：%s", len(index), merged)
+    return aligned, index
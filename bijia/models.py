@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+"""分析流程中使用的结果对象"""
+
+from typing import Dict, List, NamedTuple, Optional
+
+import pandas as pd
+
+
+class ParsedQuote(NamedTuple):
+    """解析并标准化后的单份报价单"""
+    filename: str
+    vendor: str
+    frame: pd.DataFrame
+
+
+class Analysis(NamedTuple):
+    """比价分析结果，可直接解包为 (analysis_result, vendor_stats, errors)"""
+    analysis_result: Optional[pd.DataFrame]
+    vendor_stats: Optional[Dict[str, pd.DataFrame]]  # 供应商 -> 中标明细表（见 stats.py）
+    errors: List[str]
+
+    def copy(self):
+        """复制结果表和错误信息（缓存中的结果与调用方拿到的结果互不影响）"""
+        return Analysis(
+            None if self.analysis_result is None else self.analysis_result.copy(),
+            None if self.vendor_stats is None else {vendor: items.copy() for vendor, items in self.vendor_stats.items()},
+            list(self.errors),
+        )
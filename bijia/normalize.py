@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+
+"""
+报价单标准化
+从原始数据框中识别供应商名称以及物料、价格、序号、分项小计、数量等列，
+输出统一结构的报价数据（物料、原始物料名称、价格、序号、分项小计、数量）。
+"""
+
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .aliases import RESOLVER
+from .log import lazy, logger
+from .models import ParsedQuote
+from .profile import rank_quantity_columns
+
+# 物料名称中需要去除的字符：字母数字、空格和'-'以外的字符（\w 与 str.isalnum 一致，但包含'_'）
+_ITEM_NAME_STRIP = re.compile(r'[^\w \-]|_')
+
+
+@lru_cache(maxsize=65536)
+def normalize_item_name(name):
+    """标准化物料名称：去除特殊字符、合并多余空格、转换为小写
+
+    结果与逐字符过滤的写法一致：
+    ' '.join(''.join(e for e in name.strip() if e.isalnum() or e in ' -').split()).lower()
+    """
+    if name.isalnum():
+        # 常见的纯中文/字母数字名称无需过滤
+        return name.lower()
+    return ' '.join(_ITEM_NAME_STRIP.sub('', name).split()).lower()
+
+
+def normalize_item_names(names):
+    """标准化一列物料名称，每个不同的名称只计算一次（重复名称和各供应商间相同的名称走缓存）"""
+    codes, uniques = pd.factorize(names.astype(str))
+    normalized = np.array([normalize_item_name(name) for name in uniques], dtype=object)
+    return pd.Series(normalized[codes], index=names.index, name=names.name)
+
+
+def looks_like_header(cells):
+    """判断一行单元格是否为包含物料列和价格列的表头"""
+    return RESOLVER.looks_like_header(cells)
+
+
+def header_labels(cells):
+    """按pandas的规则生成列名：空单元格为 Unnamed: i，重复列名追加 .1、.2"""
+    labels = []
+    seen = {}
+    for pos, cell in enumerate(cells):
+        label = f'Unnamed: {pos}' if cell is None or (isinstance(cell, str) and not cell.strip()) else cell
+        count = seen.get(label, 0)
+        seen[label] = count + 1
+        labels.append(label if count == 0 else f'{label}.{count}')
+    return labels
+
+
+def map_header_roles(cells):
+    """根据表头确定序号、物料、价格、分项小计、数量列的位置（与 process_dataframe 按列名匹配的规则一致）"""
+    return RESOLVER.resolve_positions(header_labels(cells))
+
+
+def is_quantity_header(col):
+    """判断列名是否包含数量相关关键词"""
+    return RESOLVER.is_quantity_column(col)
+
+
+def extract_vendor_name_from_content(df):
+    """从文件内容中提取供应商名称"""
+    # 尝试从第一行或前几行提取供应商名称
+    for i in range(min(10, len(df))):
+        row = df.iloc[i]
+        for j, cell in enumerate(row):
+            cell_str = str(cell)
+            if '供应商' in cell_str or '供货' in cell_str:
+                # 提取供应商名称
+                # 例如："供货供应商：瓦房店市君创百货贸易商店" -> "瓦房店市君创百货贸易商店"
+                if '：' in cell_str:
+                    parts = cell_str.split('：')
+                    if len(parts) > 1:
+                        vendor_name = parts[1].strip()
+                        # 去除采购时间等无关信息
+                        if '采购时间' in vendor_name:
+                            vendor_name = vendor_name.split('采购时间')[0].strip()
+                        logger.debug("提取到供应商名称：%s", vendor_name)
+                        return vendor_name
+                elif ':' in cell_str:
+                    parts = cell_str.split(':')
+                    if len(parts) > 1:
+                        vendor_name = parts[1].strip()
+                        # 去除采购时间等无关信息
+                        if '采购时间' in vendor_name:
+                            vendor_name = vendor_name.split('采购时间')[0].strip()
+                        logger.debug("提取到供应商名称：%s", vendor_name)
+                        return vendor_name
+    
+    # 尝试另一种方式：直接检查第二行（根据用户提供的格式）
+    if len(df) >= 2:
+        row = df.iloc[1]
+        for j, cell in enumerate(row):
+            cell_str = str(cell)
+            # 第二行可能直接包含供应商名称
+            if cell_str and not cell_str.startswith('Unnamed'):
+                # 尝试从单元格中提取供应商名称
+                if '：' in cell_str:
+                    parts = cell_str.split('：')
+                    if len(parts) > 1:
+                        vendor_name = parts[1].strip()
+                        # 去除采购时间等无关信息
+                        if '采购时间' in vendor_name:
+                            vendor_name = vendor_name.split('采购时间')[0].strip()
+                        logger.debug("从第二行提取到供应商名称：%s", vendor_name)
+                        return vendor_name
+                elif ':' in cell_str:
+                    parts = cell_str.split(':')
+                    if len(parts) > 1:
+                        vendor_name = parts[1].strip()
+                        # 去除采购时间等无关信息
+                        if '采购时间' in vendor_name:
+                            vendor_name = vendor_name.split('采购时间')[0].strip()
+                        logger.debug("从第二行提取到供应商名称：%s", vendor_name)
+                        return vendor_name
+    
+    logger.debug("无法从文件内容中提取供应商名称")
+    return None
+
+
+def process_dataframe(df, filename, vendor_name, vendor_rows=None):
+    """处理数据框，查找必要的列
+
+    vendor_rows 为用于提取供应商名称的原始行（如表头上方的标题行），默认使用数据本身。
+    """
+    # 获取所有列名，用于调试
+    all_columns = list(df.columns)
+    
+    # 尝试从文件内容中提取供应商名称
+    content_vendor_name = extract_vendor_name_from_content(df if vendor_rows is None else vendor_rows)
+    if content_vendor_name:
+        vendor_name = content_vendor_name
+        # 进一步清理供应商名称，去除采购时间等无关信息
+        if '采购时间' in vendor_name:
+            vendor_name = vendor_name.split('采购时间')[0].strip()
+        # 去除任何非中文字符和数字以外的内容
+        vendor_name = ''.join([c for c in vendor_name if c.isalnum() or c in ' .-']).strip()
+        logger.debug("从文件内容中提取的供应商名称：%s", vendor_name)
+    else:
+        # 如果无法从内容中提取，使用文件名作为供应商名称
+        vendor_name = filename.split('.')[0]
+        logger.debug("从文件名中提取的供应商名称：%s", vendor_name)
+    
+    # 尝试处理没有明确列名的情况
+    # 情况1：如果列名是Unnamed，尝试跳过标题行，找到实际数据
+    if all('Unnamed' in str(col) for col in df.columns) or len(df.columns) == 1:
+        logger.debug("文件 %s 可能包含标题行，尝试找到实际数据...", filename)
+        
+        # 跳过标题行，找到实际数据的起始位置
+        data_start_row = 0
+        for i in range(len(df)):
+            row = df.iloc[i]
+            # 检查是否包含数字（可能是价格或数量）
+            has_number = False
+            for cell in row:
+                try:
+                    float(cell)
+                    has_number = True
+                    break
+                except Exception:
+                    pass
+            if has_number:
+                data_start_row = i
+                break
+        
+        logger.debug("实际数据起始行：%s", data_start_row)
+        
+        # 如果找到了数据起始行，使用该行作为列名
+        if data_start_row > 0:
+            new_columns = df.iloc[data_start_row].tolist()
+            df = df.iloc[data_start_row + 1:].reset_index(drop=True)
+            df.columns = new_columns
+            # 更新列名列表
+            all_columns = list(df.columns)
+            logger.debug("新的列名：%s", all_columns)
+    
+    # 一次遍历列名，按别名确定各列
+    roles = RESOLVER.resolve(df.columns)
+    serial_col = roles.get('serial')
+    item_col = roles.get('item')
+    price_col = roles.get('price')
+    subtotal_col = roles.get('subtotal')
+    
+    # 如果通过名称找不到序号列，尝试通过位置查找（假设第一列是序号列）
+    if not serial_col and len(df.columns) >= 1:
+        serial_col = df.columns[0]
+        logger.debug("通过位置选择序号列：%s", serial_col)
+    
+    # 如果通过名称找不到物料列，尝试通过位置查找（假设第二列是物料列）
+    if not item_col and len(df.columns) >= 2:
+        item_col = df.columns[1]
+        logger.debug("通过位置选择物料列：%s", item_col)
+    
+    # 如果通过名称找不到价格列，尝试通过位置查找（假设第三列是价格列）
+    if not price_col and len(df.columns) >= 3:
+        price_col = df.columns[2]
+        logger.debug("通过位置选择价格列：%s", price_col)
+    
+    # 检查是否找到必要的列
+    if not item_col or not price_col:
+        # 提供更详细的错误信息，包含文件的所有列名
+        return None, f"文件 {filename} 缺少必要的列：品名/名称 或 单项报价/价格。文件中的列名：{', '.join(all_columns)}"
+    
+    # 清理数据
+    try:
+        df = df.dropna(subset=[item_col, price_col])
+        # 标准化物料名称，去除特殊字符和空格，使不同格式的相同物料名称标准化
+        df['物料'] = normalize_item_names(df[item_col])  # 标准化物料名称
+        df['原始物料名称'] = df[item_col].astype(str).str.strip()  # 保存原始物料名称
+        df['价格'] = pd.to_numeric(df[price_col], errors='coerce')  # 重命名为'价格'，与后续代码保持一致
+        
+        # 过滤掉价格为0或空的行（视为弃权）
+        df = df[(df['价格'] > 0) & (df['价格'].notna())]
+        logger.debug("过滤后剩余物料数量：%s", len(df))
+        
+        # 处理序号
+        if serial_col:
+            df['序号'] = df[serial_col].astype(str).str.strip()
+        else:
+            # 如果没有序号列，生成默认序号
+            df['序号'] = range(1, len(df) + 1)
+        
+        # 处理分项小计
+        logger.debug("开始处理分项小计，当前列名：%s", lazy(lambda: list(df.columns)))
+        logger.debug("按列名识别的列：%s", roles)
+        logger.debug("当前数据前5行：%s", lazy(lambda: df.head().to_dict('records')))
+        
+        if subtotal_col:
+            logger.debug("找到分项小计列：%s", subtotal_col)
+            df['分项小计'] = pd.to_numeric(df[subtotal_col], errors='coerce')
+            logger.debug("分项小计列数据预览：%s", lazy(lambda: df['分项小计'].head().tolist()))
+        else:
+            # 如果没有分项小计列，尝试计算
+            logger.debug("未找到分项小计列，尝试计算")
+            
+            # 尝试识别数量列
+            quantity_col = None
+            
+            # 方法1：尝试通过列名识别
+            quantity_col = roles.get('quantity')
+            if quantity_col:
+                logger.debug("通过列名找到数量列：%s", quantity_col)
+            
+            # 方法1.1：直接检查所有列名，寻找包含数量相关关键词的列
+            if not quantity_col:
+                logger.debug("通过标准选项未找到数量列，尝试检查所有列名")
+                for col in df.columns:
+                    if RESOLVER.is_quantity_column(col):
+                        quantity_col = col
+                        logger.debug("通过关键词找到数量列：%s", col)
+                        break
+            
+            # 方法2：对无列名的列、第5列和价格列附近的列做画像，按得分选出数量列
+            if not quantity_col:
+                logger.debug("通过列名未找到数量列，尝试通过内容识别")
+                ranked = rank_quantity_columns(df, price_col, exclude=(serial_col, item_col))
+                logger.debug("数量列候选：%s", lazy(lambda: [(profile.column, round(score, 3)) for score, profile in ranked]))
+                if ranked:
+                    quantity_col = ranked[0][1].column
+                    logger.debug("通过内容识别找到数量列：%s", quantity_col)
+            
+            # 如果找到数量列，计算分项小计
+            if quantity_col:
+                try:
+                    logger.debug("使用 %s 列计算分项小计", quantity_col)
+                    logger.debug("价格列数据预览：%s", lazy(lambda: df['价格'].head().tolist()))
+                    logger.debug("数量列数据预览：%s", lazy(lambda: df[quantity_col].head().tolist()))
+                    
+                    # 转换数量列为数字
+                    numeric_quantity = pd.to_numeric(df[quantity_col], errors='coerce')
+                    logger.debug("转换后的数量数据预览：%s", lazy(lambda: numeric_quantity.head().tolist()))
+                    
+                    # 存储数量列，方便后续分析使用
+                    df['数量'] = numeric_quantity
+                    logger.debug("存储的数量列数据预览：%s", lazy(lambda: df['数量'].head().tolist()))
+                    
+                    # 计算分项小计
+                    df['分项小计'] = df['价格'] * numeric_quantity
+                    logger.debug("计算后的分项小计预览：%s", lazy(lambda: df['分项小计'].head().tolist()))
+                except Exception as e:
+                    logger.warning("计算分项小计时出错：%s", e, exc_info=True)
+                    df['分项小计'] = 0
+                    df['数量'] = 1  # 出错时默认数量为1
+            else:
+                # 尝试使用固定值1作为数量，确保分项小计不为0
+                logger.debug("未找到数量列，使用默认数量1计算分项小计")
+                try:
+                    df['数量'] = 1  # 存储默认数量
+                    df['分项小计'] = df['价格'] * 1
+                    logger.debug("使用默认数量1计算后的分项小计预览：%s", lazy(lambda: df['分项小计'].head().tolist()))
+                except Exception as e:
+                    logger.warning("使用默认数量计算分项小计时出错：%s", e, exc_info=True)
+                    df['分项小计'] = df['价格']
+                    df['数量'] = 1  # 出错时默认数量为1
+        
+        df = df.dropna(subset=['价格'])
+        
+        # 调试信息：打印处理后的数据
+        logger.debug("文件 %s 处理后的数据（前5行）：\n%s", filename, lazy(lambda: df[['序号', '物料', '价格', '分项小计']].head()))
+        logger.debug("供应商名称：%s", vendor_name)
+        
+        return ParsedQuote(filename, vendor_name, df), None
+    except Exception as e:
+        return None, f"处理文件 {filename} 数据时出错：{str(e)}"
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""报价单文件读取"""
+
+import csv
+import os
+
+import pandas as pd
+
+from .log import logger
+from .normalize import process_dataframe
+from .sniff import read_csv_head, sniff_header
+from .workbook import iter_candidate_sheets, load_sheet
+
+
+def read_quote(source, filename, kind=None):
+    """读取单份报价单并标准化
+
+    source 可以是文件路径或文件对象；kind 为 'csv' 或 'excel'，默认根据文件名判断。
+    """
+    # 提取供应商名称（默认用文件名作为供应商名称）
+    vendor_name = filename.split('.')[0]
+    if kind is None:
+        kind = 'csv' if filename.lower().endswith('.csv') else 'excel'
+
+    if kind == 'csv':
+        # 先嗅探表头，再只读取需要的列
+        try:
+            try:
+                sniff = sniff_header(read_csv_head(source))
+            except (UnicodeDecodeError, csv.Error):
+                sniff = None
+            if sniff is None:
+                df = pd.read_csv(source)
+                return process_dataframe(df, filename, vendor_name)
+            df = pd.read_csv(source, skiprows=sniff.header_row, usecols=sniff.usecols, dtype=sniff.dtype)
+        except Exception as e:
+            return None, f"读取CSV文件 {filename} 时出错：{str(e)}"
+        return process_dataframe(df, filename, vendor_name, sniff.vendor_rows())
+
+    # Excel文件只打开一次，优先加载包含表头的工作表，失败时再尝试其余工作表
+    try:
+        error = None
+        with pd.ExcelFile(source) as xl:
+            for sheet_name, sniff in iter_candidate_sheets(xl):
+                logger.debug("尝试读取工作表：%s", sheet_name)
+                df = load_sheet(xl, sheet_name, sniff)
+                vendor_rows = sniff.vendor_rows() if sniff else None
+                result, error = process_dataframe(df, filename, vendor_name, vendor_rows)
+                if not error:
+                    logger.debug("成功读取工作表：%s", sheet_name)
+                    return result, None
+
+        # 所有工作表都失败
+        return None, error or f"文件 {filename} 的所有工作表都缺少必要的列：品名/名称 或 单项报价/价格"
+    except Exception as e:
+        return None, f"读取Excel文件 {filename} 时出错：{str(e)}"
+
+
+def parse_file(file_path):
+    """解析报价单文件"""
+    try:
+        return read_quote(file_path, os.path.basename(file_path))
+    except Exception as e:
+        return None, f"解析文件 {file_path} 时出错：{str(e)}"
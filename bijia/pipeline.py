@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+"""比价分析流程：解析 → 标准化 → 比对 → 统计"""
+
+import os
+
+from .compare import compare_prices, intern_quote_frames
+from .incremental import QuoteComparison
+from .ingest import hash_sources, parse_sources
+from .log import logger
+from .matching import align_items
+from .models import Analysis
+from .progress import FILE_CACHED, NO_PROGRESS
+from .stats import build_vendor_stats
+
+
+def analyze_quotes(quotes, errors=None, progress=NO_PROGRESS, match_threshold=None):
+    """比对已解析的报价单，返回最低价分析结果和供应商中标统计
+
+    match_threshold 为物料模糊匹配的相似度阈值（见 matching.py），None 表示只按物料名称精确匹配。
+    """
+    errors = list(errors or [])
+    data = _quote_data(quotes)
+    if not data:
+        return Analysis(None, None, errors)
+    if match_threshold:
+        progress.stage('match')
+        data, _ = align_items(data, match_threshold)
+
+    # 合并所有报价，一次性找出每个物料的最低价并按对应序号排序
+    progress.stage('compare')
+    analysis_result = compare_prices(data)
+    # 统计每个供应商的中标情况
+    progress.stage('stats')
+    vendor_stats = build_vendor_stats(analysis_result)
+    return Analysis(analysis_result, vendor_stats, errors)
+
+
+def _quote_data(quotes):
+    """{供应商名称: 报价表}（各供应商共用同一文本字典）"""
+    data = {}
+    for quote in intern_quotes(quotes):
+        data[quote.vendor] = quote.frame
+        logger.info("成功解析文件：%s，供应商：%s，物料数量：%s", quote.filename, quote.vendor, len(quote.frame))
+
+    logger.info("解析完成，成功解析的文件数量：%s", len(data))
+    return data
+
+
+def intern_quotes(quotes):
+    """转换为紧凑报价表，各供应商共用同一文本字典（见 compare.intern_quote_frames）"""
+    quotes = list(quotes)
+    frames = intern_quote_frames([quote.frame for quote in quotes])
+    return [quote._replace(frame=frame) for quote, frame in zip(quotes, frames)]
+
+
+def _parse_and_compute(sources, workers, cache, memo, progress, compute, namespace=None, catalog=None):
+    """计算内容哈希并查找 memo，未命中时解析报价单（按物料主数据 catalog 统一物料名称），
+    交给 compute(quotes, parse_errors) 计算并写入 memo"""
+    progress.stage('hash')
+    hashes = hash_sources(sources) if cache is not None or memo is not None else None
+
+    key = None
+    if memo is not None and sources and None not in hashes:
+        key = memo.key(((content_hash, filename, kind) for content_hash, (_, filename, kind) in zip(hashes, sources)),
+                       namespace)
+        result = memo.get(key)
+        if result is not None:
+            logger.info("使用缓存的分析结果，报价单数量：%s", len(sources))
+            for i in range(len(sources)):
+                progress.file_done(i, FILE_CACHED)
+            return result
+
+    progress.stage('parse')
+    quotes = []
+    parse_errors = []
+    for quote, error in parse_sources(sources, workers, cache, hashes, progress):
+        if error:
+            parse_errors.append(error)
+        else:
+            quotes.append(quote)
+    if catalog is not None:
+        quotes = [catalog.resolve_quote(quote) for quote in quotes]
+    # 先合并文本字典，再释放各供应商各自的一份文本
+    quotes = intern_quotes(quotes)
+    result = compute(quotes, parse_errors)
+    if key is not None:
+        memo.put(key, result)
+    return result
+
+
+def _memo_namespace(name, match_threshold, catalog):
+    """memo 中的命名空间：不同的模糊匹配阈值、不同版本的物料主数据分开缓存"""
+    parts = [name, match_threshold and f'match={match_threshold}',
+             catalog is not None and f'catalog={id(catalog)}.{catalog.revision}']
+    return ':'.join(part for part in parts if part) or None
+
+
+def analyze_sources(sources, workers=None, cache=None, memo=None, errors=None, progress=NO_PROGRESS,
+                    match_threshold=None, catalog=None):
+    """解析并分析多份报价单
+
+    sources 为 (source, filename, kind) 列表；cache 为可选的 ParseCache，
+    memo 为可选的 AnalysisCache，同一组文件再次提交时直接返回缓存的分析结果。
+    errors 为调用方已收集的错误信息，放在结果的错误信息之前；
+    progress 接收各阶段和每份报价单的进度（见 progress.py）；match_threshold 见 analyze_quotes；
+    catalog 为可选的物料主数据（见 catalog.py）。
+    """
+    sources = list(sources)
+    errors = list(errors or [])
+
+    def compute(quotes, parse_errors):
+        return analyze_quotes(quotes, parse_errors, progress, match_threshold)
+
+    analysis = _parse_and_compute(sources, workers, cache, memo, progress, compute,
+                                  _memo_namespace(None, match_threshold, catalog), catalog)
+    return analysis._replace(errors=errors + analysis.errors)
+
+
+def compare_sources(sources, workers=None, cache=None, memo=None, errors=None, progress=NO_PROGRESS,
+                    match_threshold=None, catalog=None):
+    """解析多份报价单并建立可增量更新的比价模型（见 incremental.py）
+
+    参数同 analyze_sources（memo 中与 analyze_sources 的结果分开缓存；模型不可变，可以共用）。
+    返回 (比价模型, 分析结果)，没有成功解析的报价单时比价模型为 None。
+    """
+    sources = list(sources)
+    errors = list(errors or [])
+
+    def compute(quotes, parse_errors):
+        data = _quote_data(quotes)
+        if not data:
+            return None, Analysis(None, None, parse_errors)
+        comparison = QuoteComparison.from_frames(data, progress, match_threshold)
+        return comparison, comparison.analysis(parse_errors)
+
+    comparison, analysis = _parse_and_compute(sources, workers, cache, memo, progress, compute,
+                                              _memo_namespace('comparison', match_threshold, catalog), catalog)
+    return comparison, analysis._replace(errors=errors + analysis.errors)
+
+
+def analyze_files(file_paths, workers=None, cache=None, memo=None, match_threshold=None, catalog=None):
+    """解析报价单文件并分析价格（cache、memo、match_threshold、catalog 见 analyze_sources）"""
+    sources = [(file_path, os.path.basename(file_path), None) for file_path in file_paths]
+    return analyze_sources(sources, workers, cache, memo, match_threshold=match_threshold, catalog=catalog)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""
+列画像与数量列推断
+列名无法识别数量列时，对候选列的前若干行做一次向量化的 pd.to_numeric 转换，
+得到数字比例、整数比例和取值范围，再按打分排序选出数量列。
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .aliases import RESOLVER
+
+# 画像使用的行数
+SAMPLE_ROWS = 50
+# 数字比例超过该值才可能是数量列
+MIN_NUMERIC_RATIO = 0.5
+# 表头或首行包含这些关键词的列视为价格列
+PRICE_HINTS = ('price', '报价', '价格', '单价')
+# 标准化过程中生成的列，不参与推断
+STANDARD_COLUMNS = ('序号', '物料', '原始物料名称', '价格', '分项小计', '数量')
+# 常见报价单模板中数量列所在的位置（第5列）
+TEMPLATE_QUANTITY_POSITION = 4
+
+# 打分权重
+SCORE_WEIGHTS = {
+    'numeric_ratio': 1.0,   # 能转换为数字的比例
+    'integral_ratio': 0.5,  # 整数值的比例（数量通常为整数，单价通常带小数）
+    'large_value': 0.5,     # 存在大于1的值
+    'template': 0.5,        # 位于常见模板的数量列位置
+    'keyword': 0.5,         # 首行（第二行表头）包含数量关键词
+    'unnamed': 0.25,        # 无列名
+    'distance': 0.1,        # 与价格列的距离（每隔一列扣分）
+}
+
+
+class ColumnProfile(NamedTuple):
+    """候选列画像"""
+    position: int
+    column: object
+    numeric_ratio: float
+    integral_ratio: float
+    min_value: float
+    max_value: float
+    price_like: bool
+    quantity_like: bool
+
+
+def profile_columns(df, positions, sample_rows=SAMPLE_ROWS):
+    """对指定位置的列做画像，所有候选列一起通过一次 pd.to_numeric 转换"""
+    if not positions:
+        return []
+    sample = df.iloc[:sample_rows, positions]
+    raw = sample.to_numpy(dtype=object)
+    numeric = pd.to_numeric(pd.Series(raw.ravel()), errors='coerce').to_numpy(dtype=float).reshape(raw.shape)
+
+    has_value = ~np.isnan(numeric)
+    # 空值在 float() 下得到 nan，同样视为数字
+    convertible = has_value | pd.isna(raw)
+    rows = max(len(sample), 1)
+    numeric_ratio = convertible.sum(axis=0) / rows
+    value_count = has_value.sum(axis=0)
+    integral_count = (has_value & (numeric == np.round(numeric))).sum(axis=0)
+    integral_ratio = integral_count / np.maximum(value_count, 1)
+    empty = value_count == 0
+    min_value = np.where(empty, np.nan, np.where(has_value, numeric, np.inf).min(axis=0, initial=np.inf))
+    max_value = np.where(empty, np.nan, np.where(has_value, numeric, -np.inf).max(axis=0, initial=-np.inf))
+
+    first_row = raw[0] if len(raw) else [None] * len(positions)
+    profiles = []
+    for i, pos in enumerate(positions):
+        column = df.columns[pos]
+        header_text = f'{column} {first_row[i]}'.lower()
+        profiles.append(ColumnProfile(
+            position=pos,
+            column=column,
+            numeric_ratio=float(numeric_ratio[i]),
+            integral_ratio=float(integral_ratio[i]),
+            min_value=float(min_value[i]),
+            max_value=float(max_value[i]),
+            price_like=any(hint in header_text for hint in PRICE_HINTS),
+            quantity_like=not pd.isna(first_row[i]) and RESOLVER.is_quantity_column(first_row[i]),
+        ))
+    return profiles
+
+
+def score_quantity_profile(profile, price_position):
+    """数量列得分；不可能是数量列时返回 None"""
+    if profile.price_like or profile.numeric_ratio <= MIN_NUMERIC_RATIO:
+        return None
+    if not profile.max_value > 0:
+        return None
+    score = (
+        SCORE_WEIGHTS['numeric_ratio'] * profile.numeric_ratio
+        + SCORE_WEIGHTS['integral_ratio'] * profile.integral_ratio
+        + SCORE_WEIGHTS['large_value'] * (profile.max_value > 1)
+        + SCORE_WEIGHTS['template'] * (profile.position == TEMPLATE_QUANTITY_POSITION)
+        + SCORE_WEIGHTS['keyword'] * profile.quantity_like
+        + SCORE_WEIGHTS['unnamed'] * ('Unnamed' in str(profile.column))
+    )
+    if price_position is not None:
+        score -= SCORE_WEIGHTS['distance'] * abs(profile.position - price_position)
+    return score
+
+
+def rank_quantity_columns(df, price_col, exclude=()):
+    """按得分从高到低返回可能的数量列 [(得分, 画像)]
+
+    候选列为无列名的列、常见模板的数量列位置以及价格列前后两列；
+    价格列、exclude 中的列（序号、物料列）和标准化生成的列不参与。
+    """
+    columns = list(df.columns)
+    skip = {price_col, *exclude, *STANDARD_COLUMNS}
+    price_positions = [pos for pos, col in enumerate(columns) if col == price_col]
+    price_position = price_positions[0] if price_positions else None
+
+    candidates = set(pos for pos, col in enumerate(columns) if 'Unnamed' in str(col))
+    if len(columns) > TEMPLATE_QUANTITY_POSITION:
+        candidates.add(TEMPLATE_QUANTITY_POSITION)
+    if price_position is not None:
+        candidates.update(range(max(0, price_position - 2), min(len(columns), price_position + 3)))
+    positions = sorted(pos for pos in candidates if columns[pos] not in skip)
+
+    ranked = []
+    for profile in profile_columns(df, positions):
+        score = score_quantity_profile(profile, price_position)
+        if score is not None:
+            ranked.append((score, profile))
+    # 得分相同时取靠前的列，保证结果确定
+    ranked.sort(key=lambda item: (-item[0], item[1].position))
+    return ranked
+
+
+def infer_quantity_column(df, price_col, exclude=()):
+    """通过内容推断数量列，找不到时返回 None"""
+    ranked = rank_quantity_columns(df, price_col, exclude)
+    return ranked[0][1].column if ranked else None
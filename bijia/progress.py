@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+"""
+分析进度
+解析、比对流程在各阶段开始时、每份报价单处理完成时通知进度对象，
+默认不做任何事；后台任务（见 jobs.py）据此记录每份文件的状态和各阶段耗时。
+"""
+
+# 单份报价单的处理结果
+FILE_CACHED = 'cached'  # 使用了解析缓存或分析缓存
+FILE_PARSED = 'parsed'
+FILE_FAILED = 'failed'
+
+
+class Progress:
+    """进度回调（默认实现为空操作）"""
+
+    def stage(self, name):
+        """进入新的阶段：hash、parse、match（开启模糊匹配时）、compare、stats"""
+
+    def file_done(self, index, status, error=None):
+        """第 index 份报价单处理完成，status 为 FILE_CACHED、FILE_PARSED 或 FILE_FAILED"""
+
+
+NO_PROGRESS = Progress()
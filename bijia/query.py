@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+"""
+结果分页查询
+按供应商、物料名称筛选，按任意列排序，再取出一页数据，供前端按需加载。
+"""
+
+import json
+
+# 每页行数的默认值和上限
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 500
+
+# 序号列：最低价分析表已按序号自然排序，中标明细表以序号排名为索引（见 stats.build_vendor_stats），
+# 按序号排序时直接使用，不再比较序号本身
+SERIAL_COLUMNS = ('序号', '对应序号')
+
+# 各表用于筛选的供应商列和物料名称列
+FILTER_COLUMNS = {
+    'prices': {'vendor': '供应商', 'item': '物料名称'},
+    'awards': {'vendor': '供应商', 'item': '中标品名'},
+}
+
+
+def vendor_names(analysis_result):
+    """参与比价的供应商（按报价列的顺序）"""
+    return [str(col)[len('报价_'):] for col in analysis_result.columns if str(col).startswith('报价_')]
+
+
+def _positive_int(value, default):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+def query_table(frame, table, page=1, per_page=DEFAULT_PER_PAGE, sort=None, order='asc', vendor=None, item=None):
+    """筛选、排序并分页
+
+    vendor 为中选供应商（精确匹配），item 为物料名称关键词（不区分大小写）；
+    sort 为列名，未指定时保持原顺序（按对应序号）。返回可直接序列化为JSON的字典。
+    """
+    page = _positive_int(page, 1)
+    per_page = min(_positive_int(per_page, DEFAULT_PER_PAGE), MAX_PER_PAGE)
+    columns = FILTER_COLUMNS.get(table, {})
+
+    mask = None
+    if vendor and 'vendor' in columns:
+        mask = frame[columns['vendor']] == vendor
+    if item and 'item' in columns:
+        matched = frame[columns['item']].astype(str).str.contains(item, case=False, regex=False)
+        mask = matched if mask is None else mask & matched
+    if mask is not None:
+        frame = frame[mask]
+
+    if sort in SERIAL_COLUMNS:
+        if not frame.index.is_monotonic_increasing:
+            frame = frame.sort_index(kind='mergesort')
+        if order == 'desc':
+            frame = frame.iloc[::-1]
+    elif sort in frame.columns:
+        frame = frame.sort_values(sort, ascending=order != 'desc', kind='mergesort', na_position='last')
+
+    total = len(frame)
+    start = (page - 1) * per_page
+    rows = frame.iloc[start:start + per_page]
+    return {
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page,
+        'columns': [str(col) for col in frame.columns],
+        # NaN 转为 null
+        'rows': json.loads(rows.to_json(orient='records', force_ascii=False)),
+    }
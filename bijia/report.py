@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+"""
+比价分析报告
+Excel报告包含“最低价分析”表和每个供应商的中标明细表，各表数据逐行产生，交给流式写入。
+"""
+
+from .stats import AWARD_COLUMNS
+from .xlsx import Sheet, iter_xlsx
+
+REPORT_FILENAME = '供应商比价分析报告.xlsx'
+VENDOR_SHEET_COLUMNS = ['对应序号', '中标品名', '单项报价', '数量', '分项小计']
+
+
+def _vendor_rows(items):
+    """供应商中标明细（中标明细表已按序号排序）"""
+    return items[AWARD_COLUMNS].itertuples(index=False, name=None)
+
+
+def report_sheets(analysis_result, vendor_stats):
+    """报告的各工作表"""
+    sheets = [Sheet('最低价分析', [str(col) for col in analysis_result.columns],
+                    analysis_result.itertuples(index=False, name=None))]
+    for vendor, items in vendor_stats.items():
+        sheets.append(Sheet(vendor, VENDOR_SHEET_COLUMNS, _vendor_rows(items)))
+    return sheets
+
+
+def iter_report(analysis_result, vendor_stats):
+    """逐块生成Excel报告内容"""
+    return iter_xlsx(report_sheets(analysis_result, vendor_stats))
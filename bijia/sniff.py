@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+表头嗅探
+只读取报价表的前几行，确定表头所在行和需要加载的列，正式加载时通过
+header=、usecols=、dtype= 跳过标题行并且不加载备注等无关列。
+"""
+
+import csv
+import io
+from typing import Dict, List, NamedTuple, Optional
+
+import pandas as pd
+
+from .normalize import header_labels, is_quantity_header, looks_like_header, map_header_roles
+
+# 嗅探时读取的行数
+SNIFF_ROWS = 20
+# 用于提取供应商名称的前几行
+VENDOR_ROWS = 10
+
+
+class HeaderSniff(NamedTuple):
+    """表头嗅探结果"""
+    header_row: int
+    usecols: Optional[List[int]]
+    dtype: Dict[str, type]
+    head_rows: List[list]
+
+    def vendor_rows(self):
+        """表头及其上方的标题行，用于提取供应商名称"""
+        return pd.DataFrame(self.head_rows[:VENDOR_ROWS])
+
+
+def plan_columns(cells):
+    """根据表头确定需要加载的列和物料、序号列的类型"""
+    roles = map_header_roles(cells)
+    labels = header_labels(cells)
+    quantity_positions = [pos for pos, label in enumerate(labels) if is_quantity_header(label)]
+
+    # 物料列和价格列按名称找到，且能按名称找到分项小计或数量列时，才能只加载这些列；
+    # 否则后续需要按位置和内容推断，仍加载全部列
+    usecols = None
+    if 'item' in roles and 'price' in roles and ('subtotal' in roles or quantity_positions):
+        keep = set(roles.values()) | set(quantity_positions)
+        # 没有序号列名时，默认第一列为序号列
+        keep.add(roles.get('serial', 0))
+        usecols = sorted(keep)
+
+    # 物料名称和序号按文本读取，省去类型推断
+    dtype = {}
+    for role in ('item', 'serial'):
+        if role in roles:
+            label = labels[roles[role]]
+            if isinstance(label, str) and labels.count(label) == 1:
+                dtype[label] = str
+    return usecols, dtype
+
+
+def sniff_header(rows):
+    """在前几行中找到同时包含物料列和价格列的表头行"""
+    for i, row in enumerate(rows):
+        if looks_like_header(row):
+            usecols, dtype = plan_columns(row)
+            return HeaderSniff(i, usecols, dtype, rows)
+    return None
+
+
+def read_csv_head(source, nrows=SNIFF_ROWS):
+    """读取CSV文件的前几行（不要求各行列数一致）"""
+    if isinstance(source, str):
+        with open(source, newline='', encoding='utf-8') as f:
+            return _csv_rows(f, nrows)
+    position = source.tell()
+    text = io.TextIOWrapper(source, encoding='utf-8', newline='')
+    try:
+        return _csv_rows(text, nrows)
+    finally:
+        text.detach()
+        source.seek(position)
+
+
+def _csv_rows(f, nrows):
+    rows = []
+    for row in csv.reader(f):
+        rows.append([cell if cell.strip() else None for cell in row])
+        if len(rows) >= nrows:
+            break
+    return rows
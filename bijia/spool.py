@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+"""
+上传文件暂存与内存预算
+上传的报价单在解析表单时即按块写入有总量上限的临时目录（见 UploadSpool.stream），之后原地转为暂存文件，
+不再复制第二份；解析时直接按路径读取
+（Excel 为 zip 文件，openpyxl 按需解压各部分；CSV 由 pandas 流式读取），
+请求内存不再随上传大小增长，解析进程池也只需传递文件路径。
+MemoryBudget 按文件大小估算分析所需内存，超过预算时拒绝新的分析。
+"""
+
+import os
+import tempfile
+import threading
+
+from .cache import private_dir
+from .log import logger
+
+# 按块复制上传文件
+CHUNK_SIZE = 1024 * 1024
+
+# 分析时内存占用与文件大小之比的粗略估计（xlsx 为压缩格式，展开后远大于文件本身）
+MEMORY_FACTORS = {'excel': 20, 'csv': 5}
+
+
+class SpoolFull(Exception):
+    """暂存目录已满"""
+
+
+class BudgetExceeded(Exception):
+    """内存预算不足"""
+
+    def __init__(self, message, never_fits=False):
+        super().__init__(message)
+        self.never_fits = never_fits  # 所需内存超过预算总额，即使空闲时也无法执行
+
+
+class SpoolStream:
+    """暂存目录中的上传文件流：写入的字节计入暂存目录的总量上限，超过时抛出 SpoolFull；
+    未被 UploadSpool.save 接管的文件在关闭时删除"""
+
+    def __init__(self, spool):
+        self.spool = spool
+        fd, self.path = tempfile.mkstemp(dir=spool.directory, prefix='upload-')
+        self._file = os.fdopen(fd, 'wb+')
+        self.adopted = False
+
+    def write(self, data):
+        try:
+            self.spool._reserve(self.path, len(data))
+        except SpoolFull:
+            self.close()
+            raise
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+        if not self.adopted:
+            self.spool.release([self.path])
+
+
+class UploadSpool:
+    """有总量上限的上传文件暂存目录（线程安全）
+
+    max_bytes 为暂存文件的总字节上限（包括排队等待分析的文件）。
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024, chunk_size=CHUNK_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self._files = {}  # 路径 -> 字节数
+        self._used = 0
+        self._lock = threading.Lock()
+        private_dir(directory)
+
+    @property
+    def used(self):
+        with self._lock:
+            return self._used
+
+    def stream(self):
+        """在暂存目录中新建上传文件流（用于解析表单时直接写入暂存目录）"""
+        return SpoolStream(self)
+
+    def save(self, stream, suffix=''):
+        """将上传的文件流按块写入暂存目录，返回文件路径；超过总量上限时抛出 SpoolFull
+
+        stream 为本暂存目录的 SpoolStream 时直接接管该文件（改名加上后缀），不再复制。
+        """
+        if isinstance(stream, SpoolStream) and stream.spool is self and not stream.adopted:
+            return self._adopt(stream, suffix)
+        fd, path = tempfile.mkstemp(dir=self.directory, prefix='upload-', suffix=suffix)
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: stream.read(self.chunk_size), b''):
+                    self._reserve(path, len(chunk))
+                    size += len(chunk)
+                    f.write(chunk)
+        except BaseException:
+            self.release([path])
+            raise
+        logger.debug("暂存上传文件：%s，%s 字节", path, size)
+        return path
+
+    def _adopt(self, stream, suffix):
+        stream.flush()
+        path = stream.path + suffix
+        os.replace(stream.path, path)
+        with self._lock:
+            self._files[path] = self._files.pop(stream.path, 0)
+        stream.adopted = True
+        stream.close()
+        logger.debug("暂存上传文件：%s，%s 字节", path, self._files.get(path, 0))
+        return path
+
+    def _reserve(self, path, nbytes):
+        with self._lock:
+            if self._used + nbytes > self.max_bytes:
+                raise SpoolFull('上传文件的临时存储空间不足，请稍后再试')
+            self._files[path] = self._files.get(path, 0) + nbytes
+            self._used += nbytes
+
+    def release(self, paths):
+        """删除暂存文件并释放占用的空间"""
+        for path in paths:
+            with self._lock:
+                self._used -= self._files.pop(path, 0)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def largest_upload(budget_bytes):
+    """内存预算能容纳的最大单次上传（字节），按内存占用最大的文件类型（xlsx）计算"""
+    return budget_bytes // max(MEMORY_FACTORS.values())
+
+
+def estimate_memory(sources):
+    """按文件大小估算分析所需的内存（字节），sources 为 (文件路径, 文件名, 文件类型) 列表"""
+    total = 0
+    for path, _, kind in sources:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            continue
+        total += size * MEMORY_FACTORS.get(kind or 'excel', MEMORY_FACTORS['excel'])
+    return total
+
+
+class Reservation:
+    """一次内存预留，可作为上下文管理器使用；release 可重复调用"""
+
+    def __init__(self, budget, nbytes):
+        self._budget = budget
+        self.nbytes = nbytes
+
+    def release(self):
+        budget, self._budget = self._budget, None
+        if budget is not None:
+            budget._release(self.nbytes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class MemoryBudget:
+    """分析任务的内存预算（线程安全），max_bytes 为同时进行的分析可预留的内存总量"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._used = 0
+        self._lock = threading.Lock()
+
+    @property
+    def used(self):
+        with self._lock:
+            return self._used
+
+    def reserve(self, nbytes):
+        """预留内存，超过预算时抛出 BudgetExceeded"""
+        if nbytes > self.max_bytes:
+            raise BudgetExceeded(
+                f'报价单过大，预计需要 {nbytes // (1024 * 1024)}MB 内存，超过上限 {self.max_bytes // (1024 * 1024)}MB',
+                never_fits=True,
+            )
+        with self._lock:
+            if self._used + nbytes > self.max_bytes:
+                raise BudgetExceeded('服务器正在处理的分析过多，请稍后再试')
+            self._used += nbytes
+        logger.debug("预留内存：%s 字节，已预留 %s 字节", nbytes, self._used)
+        return Reservation(self, nbytes)
+
+    def _release(self, nbytes):
+        with self._lock:
+            self._used -= nbytes
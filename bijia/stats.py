@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+"""
+供应商中标统计
+由已按对应序号排序的最低价分析结果一次 groupby 得到各供应商的中标明细表，
+明细沿用结果表的顺序（见 compare.serial_order），无需再逐行转换或按序号重新排序。
+"""
+
+import numpy as np
+import pandas as pd
+
+# 中标明细表的列
+AWARD_COLUMNS = ['序号', '物料名称', '单项报价', '数量', '分项小计']
+
+
+def award_frame(analysis_result):
+    """最低价分析结果中每一行对应的中标信息，列为'供应商'和 AWARD_COLUMNS"""
+    price = analysis_result['最低价']
+    subtotal = analysis_result['分项小计']
+    if '数量' in analysis_result.columns:
+        quantity = analysis_result['数量']
+    else:
+        # 没有数量列时通过分项小计和价格计算，无法计算时数量为1
+        valid = (subtotal > 0) & (price > 0)
+        quantity = pd.Series(np.where(valid, subtotal / price.where(valid, 1), 1), index=analysis_result.index)
+
+    return pd.DataFrame({
+        '供应商': analysis_result['供应商'].to_numpy(),
+        '序号': analysis_result['序号'].to_numpy(),
+        '物料名称': analysis_result['物料名称'].to_numpy(),
+        '单项报价': price.to_numpy(),
+        '数量': quantity.to_numpy(),
+        '分项小计': subtotal.to_numpy(),
+    })
+
+
+def build_vendor_stats(analysis_result):
+    """统计每个供应商的中标情况
+
+    返回 {供应商: 中标明细表}，供应商按首次中标的顺序，明细表的列为 AWARD_COLUMNS、按对应序号排序，
+    索引为该物料在结果表中的行号（即序号排名，按序号排序时直接使用）。
+    """
+    awards = award_frame(analysis_result)
+    return {vendor: items.drop(columns='供应商') for vendor, items in awards.groupby('供应商', sort=False)}
+
+
+def vendor_totals(vendor_stats):
+    """各供应商的中标物料数量和分项小计合计，返回以供应商为索引的表"""
+    return pd.DataFrame(
+        [(len(items), items['分项小计'].sum()) for items in vendor_stats.values()],
+        index=pd.Index(list(vendor_stats), name='供应商'),
+        columns=['中标数量', '分项小计合计'],
+    )
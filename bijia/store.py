@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+
+"""
+分析结果存储
+每次分析的结果按分析ID保存，代替模块级全局变量，多个用户、多线程并发时互不覆盖。
+内存中按LRU保存，超过条数或内存上限时淘汰最久未使用的结果，超过有效期的结果自动过期。
+配置落盘目录后结果同时写入磁盘，从内存淘汰后仍可读取，多进程部署时各进程共享该目录。
+每个分析结果还可以附带生成好的导出文件（如Excel报告），导出文件逐块写入磁盘（落盘目录，未配置时为
+只允许当前用户访问的临时目录），内存中只保存文件路径，与分析结果一起过期；
+以及可增量更新的比价模型（见 incremental.py），用于在此结果的基础上增删、替换供应商。
+"""
+
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+
+from .cache import private_dir
+from .log import logger
+
+# 分析ID、导出文件名称的格式（同时防止落盘路径穿越）
+_ANALYSIS_ID = re.compile(r'^[0-9a-f]{32}$')
+_ARTIFACT_NAME = re.compile(r'^[a-z0-9_]+$')
+# 比价模型落盘时使用的名称（与导出文件一样随分析结果删除）
+_STATE = 'state'
+
+
+def new_analysis_id():
+    """生成新的分析ID"""
+    return uuid.uuid4().hex
+
+
+def estimate_size(analysis):
+    """估算分析结果占用的内存（字节）"""
+    size = 0
+    if analysis.analysis_result is not None:
+        size += int(analysis.analysis_result.memory_usage(index=True, deep=True).sum())
+    if analysis.vendor_stats:
+        size += sum(int(items.memory_usage(index=True, deep=True).sum()) for items in analysis.vendor_stats.values())
+    return size
+
+
+class _Entry:
+    """内存中的一条分析结果"""
+
+    __slots__ = ('analysis', 'size', 'saved_at', 'artifacts', 'state')
+
+    def __init__(self, analysis, size, saved_at, state=None):
+        self.analysis = analysis
+        self.size = size
+        self.saved_at = saved_at
+        self.artifacts = {}  # 名称 -> 导出文件路径
+        self.state = state  # 比价模型
+
+
+class AnalysisStore:
+    """按分析ID保存分析结果（线程安全）
+
+    max_entries、max_bytes 为内存中保存的条数和字节上限，ttl 为有效期（秒），
+    spill_dir 为可选的落盘目录。
+    """
+
+    def __init__(self, max_entries=128, max_bytes=256 * 1024 * 1024, ttl=3600, spill_dir=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.spill_dir = spill_dir
+        self._entries = OrderedDict()  # 分析ID -> _Entry
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._artifact_dir = None
+        if spill_dir:
+            # 落盘文件为 pickle，目录只允许当前用户访问
+            private_dir(spill_dir)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def put(self, analysis, analysis_id=None, state=None):
+        """保存分析结果（state 为可选的比价模型），返回分析ID"""
+        analysis_id = analysis_id or new_analysis_id()
+        size = estimate_size(analysis)
+        if state is not None:
+            size += state.memory_usage()
+        now = time.time()
+        if self.spill_dir:
+            self._spill(analysis_id, analysis)
+            if state is not None:
+                self._write_file(self._artifact_path(analysis_id, _STATE), pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            self._discard(analysis_id)
+            self._entries[analysis_id] = _Entry(analysis, size, now, state)
+            self._bytes += size
+            self._evict(now)
+        if self.spill_dir:
+            self._purge_spilled(now)
+        logger.debug("保存分析结果：%s，约 %s 字节", analysis_id, size)
+        return analysis_id
+
+    def get(self, analysis_id):
+        """读取分析结果，不存在或已过期时返回 None"""
+        entry = self._entry(analysis_id)
+        return entry.analysis if entry is not None else None
+
+    def saved_at(self, analysis_id):
+        """分析结果的保存时间（时间戳），不存在或已过期时返回 None"""
+        entry = self._entry(analysis_id)
+        return entry.saved_at if entry is not None else None
+
+    def get_state(self, analysis_id):
+        """读取分析结果附带的比价模型，不存在时返回 None"""
+        entry = self._entry(analysis_id)
+        if entry is None:
+            return None
+        if entry.state is None and self.spill_dir:
+            try:
+                with open(self._artifact_path(analysis_id, _STATE), 'rb') as f:
+                    state = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                return None
+            with self._lock:
+                if self._entries.get(analysis_id) is entry and entry.state is None:
+                    entry.state = state
+                    size = state.memory_usage()
+                    entry.size += size
+                    self._bytes += size
+                    self._evict(time.time())
+            return state
+        return entry.state
+
+    def get_artifact(self, analysis_id, name):
+        """分析结果附带的导出文件的路径，不存在时返回 None
+
+        文件可能随分析结果过期被删除，读取时需处理 OSError（已打开的文件不受影响）。
+        """
+        entry = self._entry(analysis_id)
+        if entry is None or not _ARTIFACT_NAME.match(name) or name == _STATE:
+            return None
+        path = entry.artifacts.get(name)
+        if path is None and self.spill_dir:
+            # 其他进程生成的导出文件
+            path = self._artifact_path(analysis_id, name)
+            if not os.path.exists(path):
+                return None
+            self._attach(analysis_id, entry, name, path)
+        return path
+
+    def artifact_writer(self, analysis_id, name):
+        """逐块写入分析结果附带的导出文件，返回 ArtifactWriter；分析结果已过期或无法写入时返回 None"""
+        entry = self._entry(analysis_id)
+        if entry is None or not _ARTIFACT_NAME.match(name) or name == _STATE:
+            return None
+        try:
+            return ArtifactWriter(self, analysis_id, entry, name)
+        except OSError as e:
+            logger.warning("无法写入导出文件：%s", e)
+            return None
+
+    def put_artifact(self, analysis_id, name, data):
+        """保存分析结果附带的导出文件，分析结果已过期或无法写入时返回 False"""
+        writer = self.artifact_writer(analysis_id, name)
+        if writer is None:
+            return False
+        with writer:
+            writer.write(data)
+            return writer.commit()
+
+    def _artifact_root(self):
+        """导出文件所在的目录：落盘目录，未配置时为本实例的临时目录（实例回收时删除）"""
+        if self.spill_dir:
+            return self.spill_dir
+        with self._lock:
+            if self._artifact_dir is None:
+                self._artifact_dir = tempfile.mkdtemp(prefix='bijia-artifacts-')  # 权限为 0700
+                weakref.finalize(self, shutil.rmtree, self._artifact_dir, ignore_errors=True)
+            return self._artifact_dir
+
+    def _attach(self, analysis_id, entry, name, path):
+        """登记导出文件；分析结果已被淘汰时删除本进程独有的文件"""
+        with self._lock:
+            if self._entries.get(analysis_id) is entry:
+                entry.artifacts[name] = path
+                return True
+        if not self.spill_dir:
+            self._remove_file(path)
+        return False
+
+    def _entry(self, analysis_id):
+        if not analysis_id or not _ANALYSIS_ID.match(analysis_id):
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(analysis_id)
+            if entry is not None:
+                if now - entry.saved_at <= self.ttl:
+                    self._entries.move_to_end(analysis_id)
+                    return entry
+                self._discard(analysis_id)
+        return self._load_spilled(analysis_id, now)
+
+    def delete(self, analysis_id):
+        """删除分析结果"""
+        if not analysis_id or not _ANALYSIS_ID.match(analysis_id):
+            return
+        with self._lock:
+            self._discard(analysis_id)
+        if self.spill_dir:
+            self._remove_spilled(analysis_id)
+
+    def purge_expired(self):
+        """清理过期的结果（包括落盘文件）"""
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+        if self.spill_dir:
+            self._purge_spilled(now)
+
+    def _discard(self, analysis_id):
+        entry = self._entries.pop(analysis_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+            self._drop_artifacts(entry)
+
+    def _drop_artifacts(self, entry):
+        """未配置落盘目录时，导出文件随内存中的分析结果一起删除（落盘目录中的文件按有效期清理）"""
+        if not self.spill_dir:
+            for path in entry.artifacts.values():
+                self._remove_file(path)
+
+    def _evict(self, now):
+        """淘汰过期的结果，再按LRU淘汰超出条数或内存上限的结果（至少保留最新一条）"""
+        for analysis_id in [key for key, entry in self._entries.items() if now - entry.saved_at > self.ttl]:
+            self._discard(analysis_id)
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            analysis_id, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self._drop_artifacts(entry)
+            logger.debug("内存中淘汰分析结果：%s", analysis_id)
+
+    def _purge_spilled(self, now):
+        """删除过期的落盘文件；导出文件随所属的分析结果一起删除"""
+        names = os.listdir(self.spill_dir)
+        expired = set()
+        for name in names:
+            if name.endswith('.pkl') and self._expired_file(os.path.join(self.spill_dir, name), now):
+                expired.add(name[:-len('.pkl')])
+                self._remove_file(os.path.join(self.spill_dir, name))
+        live = {name[:-len('.pkl')] for name in names if name.endswith('.pkl')} - expired
+        for name in names:
+            if name.endswith('.bin') and name.split('.', 1)[0] not in live:
+                self._remove_file(os.path.join(self.spill_dir, name))
+
+    def _remove_spilled(self, analysis_id):
+        self._remove_file(self._spill_path(analysis_id))
+        for name in os.listdir(self.spill_dir):
+            if name.startswith(f'{analysis_id}.') and name.endswith('.bin'):
+                self._remove_file(os.path.join(self.spill_dir, name))
+
+    def _spill_path(self, analysis_id):
+        return os.path.join(self.spill_dir, f'{analysis_id}.pkl')
+
+    def _artifact_path(self, analysis_id, name):
+        return os.path.join(self._artifact_root(), f'{analysis_id}.{name}.bin')
+
+    def _spill(self, analysis_id, analysis):
+        self._write_file(self._spill_path(analysis_id), pickle.dumps(analysis, pickle.HIGHEST_PROTOCOL))
+
+    def _write_file(self, path, data):
+        """写入落盘目录（先写临时文件再替换，其他进程不会读到写了一半的文件）"""
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.spill_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("分析结果落盘失败：%s", e)
+
+    def _load_spilled(self, analysis_id, now):
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(analysis_id)
+        if self._expired_file(path, now):
+            self._remove_spilled(analysis_id)
+            return None
+        try:
+            saved_at = os.path.getmtime(path)
+            with open(path, 'rb') as f:
+                analysis = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        # 重新放入内存（保留原保存时间，有效期不因读取而延长）
+        entry = _Entry(analysis, estimate_size(analysis), saved_at)
+        with self._lock:
+            self._discard(analysis_id)
+            self._entries[analysis_id] = entry
+            self._bytes += entry.size
+            self._evict(now)
+        return entry
+
+    def _expired_file(self, path, now):
+        try:
+            return now - os.path.getmtime(path) > self.ttl
+        except OSError:
+            return True
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class ArtifactWriter:
+    """导出文件的写入器：逐块写入同目录下的临时文件，commit() 时替换为正式文件并登记到分析结果
+
+    作为上下文管理器使用，未 commit 就退出时（如下载中断）删除临时文件。
+    """
+
+    def __init__(self, store, analysis_id, entry, name):
+        self._store = store
+        self._analysis_id = analysis_id
+        self._entry = entry
+        self._name = name
+        fd, self._tmp_path = tempfile.mkstemp(dir=store._artifact_root(), suffix='.tmp')
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk):
+        self._file.write(chunk)
+
+    def commit(self):
+        """保存写入的内容，分析结果已过期或无法保存时返回 False"""
+        try:
+            self._file.close()
+            path = self._store._artifact_path(self._analysis_id, self._name)
+            os.replace(self._tmp_path, path)
+        except OSError as e:
+            logger.warning("保存导出文件失败：%s", e)
+            return False
+        self._tmp_path = None
+        return self._store._attach(self._analysis_id, self._entry, self._name, path)
+
+    def close(self):
+        self._file.close()
+        if self._tmp_path is not None:
+            self._store._remove_file(self._tmp_path)
+            self._tmp_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
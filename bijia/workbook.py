@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+"""
+Excel工作簿读取
+工作簿只打开一次（openpyxl只读模式），先按行流式读取各工作表的前几行找到
+报价表所在的工作表和表头行，再只加载这一个工作表中需要的列。
+"""
+
+import pandas as pd
+
+from .log import logger
+from .sniff import SNIFF_ROWS, sniff_header
+
+
+def read_head_rows(xl, sheet_name, nrows=SNIFF_ROWS):
+    """读取工作表的前几行，不加载整个工作表"""
+    if xl.engine == 'openpyxl':
+        worksheet = xl.book[sheet_name]
+        return [list(row) for row in worksheet.iter_rows(max_row=nrows, values_only=True)]
+    # 其他引擎（如xlrd读取.xls）没有流式接口，退回到pandas读取
+    head = xl.parse(sheet_name, header=None, nrows=nrows)
+    return [[None if pd.isna(cell) else cell for cell in row] for row in head.values.tolist()]
+
+
+def find_quote_sheet(xl, nrows=SNIFF_ROWS):
+    """找到前几行中包含物料列和价格列表头的第一个工作表，返回 (工作表名, 嗅探结果)"""
+    for sheet_name in xl.sheet_names:
+        sniff = sniff_header(read_head_rows(xl, sheet_name, nrows))
+        if sniff is not None:
+            return sheet_name, sniff
+    return None, None
+
+
+def iter_candidate_sheets(xl):
+    """按优先级依次给出候选工作表及其嗅探结果：先是找到表头的工作表，再是其余工作表"""
+    found, sniff = find_quote_sheet(xl)
+    if found is not None:
+        logger.debug("在工作表 %s 第 %s 行找到表头", found, sniff.header_row + 1)
+        yield found, sniff
+    for sheet_name in xl.sheet_names:
+        if sheet_name != found:
+            yield sheet_name, None
+
+
+def load_sheet(xl, sheet_name, sniff=None):
+    """加载工作表；有嗅探结果时跳过标题行，只加载需要的列"""
+    if sniff is None:
+        return xl.parse(sheet_name)
+    return xl.parse(sheet_name, header=sniff.header_row, usecols=sniff.usecols, dtype=sniff.dtype)
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+"""
+流式Excel写入
+逐行生成工作表XML并写入zip流，每积累一定字节就交给调用方（如HTTP响应）发送，
+内存占用与行数无关，也不产生任何临时文件。
+字符串使用内联字符串（inlineStr），无需在内存中维护共享字符串表。
+"""
+
+import math
+import re
+import zipfile
+from typing import Iterable, List, NamedTuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# 缓冲区超过该字节数时输出一次
+CHUNK_SIZE = 64 * 1024
+
+# XML 1.0 不允许的控制字符
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# 工作表名称中不允许的字符
+_ILLEGAL_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+
+class Sheet(NamedTuple):
+    """待写入的工作表：名称、表头和逐行产生的数据"""
+    name: str
+    columns: List[str]
+    rows: Iterable[tuple]
+
+
+class _StreamBuffer:
+    """只追加、不可定位的输出缓冲区，zipfile 据此以流式模式写入"""
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _cell(ref, value, style=0):
+    """单个单元格的XML，空值、NaN、inf 返回空字符串（与 pandas 导出时一致）"""
+    style_attr = f' s="{style}"' if style else ''
+    if isinstance(value, str):
+        text = _ILLEGAL_XML_CHARS.sub('', value)
+        return f'<c r="{ref}" t="inlineStr"{style_attr}><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+    if isinstance(value, (float, np.floating)):
+        if not math.isfinite(value):
+            return ''
+        return f'<c r="{ref}"{style_attr}><v>{float(value)!r}</v></c>'
+    if isinstance(value, (bool, np.bool_)):
+        return f'<c r="{ref}" t="b"{style_attr}><v>{int(value)}</v></c>'
+    if isinstance(value, (int, np.integer)):
+        return f'<c r="{ref}"{style_attr}><v>{int(value)}</v></c>'
+    if value is None or pd.isna(value):
+        return ''
+    return _cell(ref, str(value), style)
+
+
+def _row(row_number, values, letters, style=0):
+    cells = ''.join(_cell(f'{letters[i]}{row_number}', value, style) for i, value in enumerate(values))
+    return f'<row r="{row_number}">{cells}</row>'
+
+
+def sheet_title(name, used):
+    """合法且不重复的工作表名称（最长31个字符）"""
+    title = _ILLEGAL_SHEET_CHARS.sub('_', str(name))[:31] or 'Sheet'
+    candidate = title
+    n = 1
+    while candidate.lower() in used:
+        suffix = f'_{n}'
+        candidate = title[:31 - len(suffix)] + suffix
+        n += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}'
+    '</Types>'
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+# 默认样式和表头样式（加粗、细边框，与 pandas 导出的表头一致）
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="2"><border><left/><right/><top/><bottom/><diagonal/></border>'
+    '<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/></border>'
+    '</borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" '
+    'applyAlignment="1"><alignment horizontal="center" vertical="top"/></xf></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def _workbook_xml(titles):
+    sheets = ''.join(
+        f'<sheet name="{escape(title, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+        for i, title in enumerate(titles, 1)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets>{sheets}</sheets></workbook>'
+    )
+
+
+def _workbook_rels(count):
+    rels = ''.join(
+        f'<Relationship Id="rId{i}" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        f'Target="worksheets/sheet{i}.xml"/>'
+        for i in range(1, count + 1)
+    )
+    styles = (
+        f'<Relationship Id="rId{count + 1}" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'{rels}{styles}</Relationships>'
+    )
+
+
+def iter_xlsx(sheets, chunk_size=CHUNK_SIZE):
+    """逐块生成xlsx文件内容
+
+    sheets 为 Sheet 列表（工作表数量需事先确定，各表的数据行可以是生成器）。
+    """
+    sheets = list(sheets)
+    used = set()
+    titles = [sheet_title(sheet.name, used) for sheet in sheets]
+    overrides = ''.join(
+        f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for i in range(1, len(sheets) + 1)
+    )
+
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', _CONTENT_TYPES.replace('{sheets}', overrides))
+        zf.writestr('_rels/.rels', _ROOT_RELS)
+        zf.writestr('xl/workbook.xml', _workbook_xml(titles))
+        zf.writestr('xl/_rels/workbook.xml.rels', _workbook_rels(len(sheets)))
+        zf.writestr('xl/styles.xml', _STYLES)
+
+        for i, sheet in enumerate(sheets, 1):
+            letters = [_column_letter(j) for j in range(len(sheet.columns))]
+            with zf.open(f'xl/worksheets/sheet{i}.xml', 'w') as f:
+                f.write(_SHEET_HEAD.encode('utf-8'))
+                f.write(_row(1, sheet.columns, letters, style=1).encode('utf-8'))
+                for row_number, values in enumerate(sheet.rows, 2):
+                    if len(values) > len(letters):
+                        letters.extend(_column_letter(j) for j in range(len(letters), len(values)))
+                    f.write(_row(row_number, values, letters).encode('utf-8'))
+                    if buffer.size >= chunk_size:
+                        yield buffer.drain()
+                f.write(_SHEET_TAIL.encode('utf-8'))
+            if buffer.size >= chunk_size:
+                yield buffer.drain()
+    yield buffer.drain()
+
+
+def write_xlsx(sheets, fileobj):
+    """将xlsx写入文件对象"""
+    for chunk in iter_xlsx(sheets):
+        fileobj.write(chunk)
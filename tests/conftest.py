@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 测试中导入 web_app 时不使用用户目录下的解析缓存
+os.environ.setdefault('PARSE_CACHE_MB', '0')
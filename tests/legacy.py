@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+"""
+比对结果的参考实现
+原 analyze_prices_from_uploads 中逐物料、逐行的循环，以及模拟报价数据的生成，
+供测试（tests/test_compare.py）校验 bijia.compare_prices 的输出，性能测试（benchmarks/）也使用。
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def make_quotes(n_items, n_vendors, seed=0):
+    """生成模拟的标准化报价数据（与 process_dataframe 的输出结构一致）"""
+    rng = np.random.default_rng(seed)
+    catalog = [f'物料{i}' for i in range(n_items)]
+    serials = [str(i + 1) if i % 50 else f'A{i}' for i in range(n_items)]
+    data = {}
+    for v in range(n_vendors):
+        # 每个供应商只报其中约90%的物料
+        picked = np.sort(rng.choice(n_items, size=int(n_items * 0.9), replace=False))
+        price = np.round(rng.uniform(1, 100, size=len(picked)), 1)
+        quantity = rng.integers(1, 50, size=len(picked)).astype(float)
+        df = pd.DataFrame({
+            '序号': [serials[i] for i in picked],
+            '品名': [catalog[i] for i in picked],
+            '物料': [catalog[i].lower() for i in picked],
+            '原始物料名称': [catalog[i] for i in picked],
+            '价格': price,
+        })
+        if v % 3 == 0:
+            # 有分项小计列、通过需求量列识别数量
+            df.insert(2, '需求量', quantity)
+            df['分项小计'] = price * quantity
+        elif v % 3 == 1:
+            # 计算得到的数量列
+            df['数量'] = quantity
+            df['分项小计'] = price * quantity
+        else:
+            # 只有分项小计
+            df['分项小计'] = price * quantity
+        data[f'供应商{v}'] = df
+    return data
+
+
+def legacy_compare(data):
+    """原 analyze_prices_from_uploads 中的逐物料循环（去掉调试输出）"""
+    all_items = set()
+    for vendor, df in data.items():
+        all_items.update(df['物料'].tolist())
+
+    analysis_data = []
+    all_vendors = list(data.keys())
+    for item in all_items:
+        min_price = float('inf')
+        min_vendor = ""
+        min_serial = ""
+        min_subtotal = 0
+        min_quantity = 1
+        min_item_name = item
+        vendor_prices = {vendor: None for vendor in all_vendors}
+        for vendor, df in data.items():
+            item_data = df[df['物料'] == item]
+            if not item_data.empty:
+                price = item_data['价格'].iloc[0]
+                vendor_prices[vendor] = price
+                if price < min_price:
+                    min_price = price
+                    min_vendor = vendor
+                    min_serial = item_data['序号'].iloc[0]
+                    min_subtotal = item_data['分项小计'].iloc[0]
+                    min_item_name = item_data.get('原始物料名称', item_data['物料']).iloc[0]
+                    if '数量' in item_data.columns:
+                        try:
+                            min_quantity = float(item_data['数量'].iloc[0])
+                        except Exception:
+                            pass
+                    if min_quantity == 1:
+                        for col in item_data.columns:
+                            if col in ['序号', '价格', '分项小计']:
+                                continue
+                            if any(keyword in str(col).lower() for keyword in ['qty', 'num', 'amount', 'count', 'quantity', '需求量', '数量', '需 求量', '需求']):
+                                try:
+                                    min_quantity = float(item_data[col].iloc[0])
+                                    break
+                                except Exception:
+                                    pass
+                    if min_quantity == 1 and min_subtotal > 0 and min_price > 0:
+                        min_quantity = min_subtotal / min_price
+                    if min_quantity <= 0:
+                        min_quantity = 1
+        if min_vendor:
+            row = {
+                '序号': min_serial,
+                '物料名称': min_item_name,
+                '最低价': min_price,
+                '供应商': min_vendor,
+                '数量': min_quantity,
+                '分项小计': min_subtotal
+            }
+            for vendor in all_vendors:
+                row[f'报价_{vendor}'] = vendor_prices[vendor]
+            analysis_data.append(row)
+
+    analysis_result = pd.DataFrame(analysis_data)
+
+    def get_sortable_value(serial):
+        if isinstance(serial, (int, float)):
+            return (0, serial)
+        try:
+            return (0, int(serial))
+        except ValueError:
+            try:
+                return (0, float(serial))
+            except ValueError:
+                return (1, str(serial))
+
+    analysis_result['排序键'] = analysis_result['序号'].apply(get_sortable_value)
+    analysis_result = analysis_result.sort_values(by='排序键').reset_index(drop=True)
+    return analysis_result.drop('排序键', axis=1)
+
+
+def legacy_vendor_stats(analysis_result):
+    """原 analyze_prices_from_uploads 中逐行统计供应商中标情况的循环"""
+    vendor_stats = {}
+    for _, row in analysis_result.iterrows():
+        vendor = row['供应商']
+        quantity = 1
+        if '数量' in row:
+            quantity = row['数量']
+        elif row['分项小计'] > 0 and row['最低价'] > 0:
+            quantity = row['分项小计'] / row['最低价']
+        vendor_stats.setdefault(vendor, []).append({
+            '序号': row['序号'],
+            '物料名称': row['物料名称'],
+            '单项报价': row['最低价'],
+            '数量': quantity,
+            '分项小计': row['分项小计'],
+        })
+    return {vendor: pd.DataFrame(items) for vendor, items in vendor_stats.items()}
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+import stat
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bijia import compact_quote_frame
+from bijia.cache import AnalysisCache, ParseCache, private_dir
+from bijia.incremental import QuoteComparison
+from bijia.models import Analysis, ParsedQuote
+
+
+def parsed_quote():
+    frame = pd.DataFrame({
+        '序号': [1, 'A1', 2.5, None],
+        '物料': ['a4纸', '胶水', '订书机', 'a4纸'],
+        '原始物料名称': ['A4纸', '胶水', '订书机', 'A4纸'],
+        '价格': [20.0, 3.0, 15.0, 19.0],
+        '分项小计': [200.0, None, 30.0, 0.0],
+        '数量': [10, 1, 2, 1],
+    })
+    return ParsedQuote('甲.xlsx', '甲', compact_quote_frame(frame))
+
+
+def test_parse_cache_round_trip_and_reload(tmp_path):
+    directory = str(tmp_path / 'cache')
+    cache = ParseCache(directory)
+    quote = parsed_quote()
+    key = cache.key('hash', quote.filename, 'excel')
+    assert cache.get(key) is None
+    cache.put(key, quote)
+
+    # 另一个进程（新的实例）读取同一目录
+    loaded = ParseCache(directory).get(key)
+    assert loaded.filename == quote.filename and loaded.vendor == quote.vendor
+    pd.testing.assert_frame_equal(loaded.frame, quote.frame)
+    assert loaded.frame['序号'].cat.categories.tolist() == quote.frame['序号'].cat.categories.tolist()
+    assert cache.key('hash', '乙.xlsx', 'excel') != key
+
+
+def test_object_columns_round_trip(tmp_path):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    frame = pd.DataFrame({'名称': ['a', None, 'c'], '备注': [1, 'x', None], '价格': [1.0, np.nan, 3.0]})
+    cache.put('k', ParsedQuote('a.csv', 'a', frame))
+    loaded = cache.get('k').frame
+    assert loaded['名称'].tolist() == ['a', None, 'c']
+    assert loaded['备注'].tolist() == [1, 'x', None]
+    pd.testing.assert_series_equal(loaded['价格'], frame['价格'])
+
+
+def test_unreadable_entries_are_dropped(tmp_path):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    path = os.path.join(cache.directory, 'k.npz')
+    # 缓存文件不以 pickle 读取：植入的 pickle 文件被当作损坏的缓存删除
+    with open(path, 'wb') as f:
+        pickle.dump(parsed_quote(), f)
+    assert cache.get('k') is None
+    assert not os.path.exists(path)
+
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    cache.put('old', parsed_quote())
+    size = os.path.getsize(os.path.join(cache.directory, 'old.npz'))
+    os.utime(os.path.join(cache.directory, 'old.npz'), (1, 1))
+    cache.max_bytes = size * 3 // 2
+    cache.put('new', parsed_quote())
+    assert cache.get('old') is None
+    assert cache.get('new') is not None
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='POSIX 权限')
+def test_private_dir(tmp_path, monkeypatch):
+    directory = str(tmp_path / 'shared')
+    os.makedirs(directory)
+    os.chmod(directory, 0o777)
+    private_dir(directory)
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+    monkeypatch.setattr(os, 'getuid', lambda: os.stat(directory).st_uid + 1)
+    with pytest.raises(PermissionError):
+        ParseCache(directory)
+
+
+def test_analysis_cache_returns_copies():
+    frame = pd.DataFrame({'序号': [1, 2], '物料': ['大米', '面粉'], '原始物料名称': ['大米', '面粉'],
+                          '价格': [5.0, 4.0], '分项小计': [None, None]})
+    comparison = QuoteComparison.from_frames({'甲': frame, '乙': frame.assign(价格=[6.0, 3.0])})
+    analysis = comparison.analysis(['乙：第3行价格无效'])
+    cache = AnalysisCache()
+    cache.put('key', (comparison, analysis))
+    # 保存后修改调用方的结果不影响缓存
+    analysis.analysis_result.loc[0, '最低价'] = 0
+    analysis.errors.clear()
+
+    cached_comparison, cached = cache.get('key')
+    assert cached_comparison is comparison
+    assert cached.analysis_result['最低价'].tolist() == [5.0, 3.0]
+    assert cached.errors == ['乙：第3行价格无效']
+    cached.analysis_result.drop(index=0, inplace=True)
+    next(iter(cached.vendor_stats.values()))['单项报价'] = -1
+    cached.errors.append('x')
+
+    _, again = cache.get('key')
+    assert again.analysis_result['最低价'].tolist() == [5.0, 3.0]
+    assert all((items['单项报价'] > 0).all() for items in again.vendor_stats.values())
+    assert again.errors == ['乙：第3行价格无效']
+
+    cache.put('plain', Analysis(None, None, []))
+    assert cache.get('plain') == Analysis(None, None, [])
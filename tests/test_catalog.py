@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+
+from bijia.catalog import ItemCatalog
+from bijia.models import ParsedQuote
+from bijia.normalize import normalize_item_name
+
+
+def make_quote(names, vendor='甲'):
+    return ParsedQuote(f'{vendor}.xlsx', vendor, pd.DataFrame({
+        '序号': range(1, len(names) + 1),
+        '物料': [normalize_item_name(name) for name in names],
+        '原始物料名称': names,
+        '价格': [1.0] * len(names),
+        '分项小计': [None] * len(names),
+    }))
+
+
+def keys(quote):
+    return list(quote.frame['物料'].astype(str))
+
+
+def test_resolve_raw_name_before_normalized_name(tmp_path):
+    catalog = ItemCatalog(str(tmp_path / 'catalog.db'))
+    paper = catalog.add_item('A4复印纸', aliases=['A4纸（70g）'])
+    rice = catalog.add_item('大米')
+    # “A4纸(70g)”与“A4纸（70g）”标准化后相同，但原样登记为大米的别名：按原始名称命中大米；
+    # 未登记的写法按标准化后的名称命中先登记的别名
+    catalog.add_alias('A4纸(70g)', rice)
+
+    quote = catalog.resolve_quote(make_quote(['A4纸（70g）', 'A4纸(70g)', ' 大米 ', 'a4纸70G']))
+    assert keys(quote) == ['a4复印纸', '大米', '大米', 'a4复印纸']
+    assert catalog.item(paper)['aliases'] == ['A4复印纸', 'A4纸（70g）']
+    catalog.close()
+
+
+def test_unknown_names_are_queued_once(tmp_path):
+    catalog = ItemCatalog(str(tmp_path / 'catalog.db'))
+    catalog.add_item('大米')
+    for _ in range(3):
+        quote = catalog.resolve_quote(make_quote(['大米', '面粉 ', '面粉', '食用油']))
+    assert keys(quote) == ['大米', '面粉', '面粉', '食用油']
+    total, names = catalog.review_queue()
+    assert total == 2
+    assert {(entry['alias'], entry['example']) for entry in names} == {('面粉', '面粉 '), ('食用油', '食用油')}
+
+    assert catalog.approve('面粉') > 0
+    assert catalog.review_queue()[0] == 1
+    assert keys(catalog.resolve_quote(make_quote(['面粉']))) == ['面粉']
+    assert catalog.review_queue()[0] == 1
+    catalog.close()
+
+
+def test_other_connections_see_changes(tmp_path):
+    path = str(tmp_path / 'catalog.db')
+    first, second = ItemCatalog(path), ItemCatalog(path)
+    item_id = first.add_item('食用油', aliases=['花生油'])
+    assert keys(second.resolve_quote(make_quote(['花生油']))) == ['食用油']
+    assert second.item(item_id)['name'] == '食用油'
+    first.close()
+    second.close()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bijia import build_vendor_stats, compare_prices
+from bijia.compare import row_sort_keys, serial_order, sort_by_serial
+from legacy import legacy_compare, legacy_vendor_stats, make_quotes
+
+
+def quotes(rows, **columns):
+    """rows 为 (序号, 物料名称, 价格, 分项小计)"""
+    serial, names, price, subtotal = zip(*rows)
+    df = pd.DataFrame({'序号': serial, '物料': [name.lower() for name in names], '原始物料名称': names,
+                       '价格': price, '分项小计': subtotal})
+    for name, values in columns.items():
+        df[name] = values
+    return df
+
+
+def fixture_quotes():
+    return {
+        # 有数量列
+        '甲': quotes([(1, 'A4纸', 20.0, 200.0), (2, '订书机', 15.0, 30.0), ('A1', '胶水', 3.0, 0.0),
+                     (3, '笔记本', 8.0, 80.0)], 数量=[10, 2, 1, 10]),
+        # 同价时取靠前的供应商；重复的物料只取第一条
+        '乙': quotes([(1, 'A4纸', 20.0, 400.0), (2, '订书机', 12.0, 36.0), (2, '订书机', 1.0, 1.0),
+                     (4, '回形针', 2.0, 10.0)]),
+        # 通过需求量列识别数量；沿用前一个最低价供应商的数量
+        '丙': quotes([(3, '笔记本', 7.5, 0.0), ('A1', '胶水', 2.5, 12.5), (10, '白板笔', 4.0, 48.0)],
+                    需求量=[1, 5, 12]),
+        '丁': quotes([(4, '回形针', 1.5, 0.0), (10, '白板笔', 4.0, 40.0), ('B2', '文件夹', 6.0, 30.0)]),
+    }
+
+
+@pytest.mark.parametrize('data', [
+    fixture_quotes(),
+    make_quotes(300, 7, seed=1),
+    make_quotes(120, 3, seed=2),
+], ids=['fixture', 'random-7', 'random-3'])
+def test_compare_prices_matches_legacy_loop(data):
+    result = compare_prices(data)
+    expected = legacy_compare(data)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+    stats = build_vendor_stats(result)
+    expected_stats = legacy_vendor_stats(expected)
+    assert list(stats) == list(expected_stats)
+    for vendor, items in stats.items():
+        pd.testing.assert_frame_equal(items.reset_index(drop=True), expected_stats[vendor], check_dtype=False)
+
+
+def test_compare_prices_without_quotes():
+    assert compare_prices({}).empty
+
+
+def test_serial_order_mixed_int_and_text():
+    serial = pd.Series([10, '2', 'A1', 1, 'nan', 'B', 2.5, '10', None], dtype=object)
+    # 数字序号（含数字文本）在前按数值排序，其余（含文本 'nan' 和空值）按字符串排序
+    assert serial[serial_order(serial)].tolist() == [1, '2', 2.5, 10, '10', 'A1', 'B', None, 'nan']
+    assert sort_by_serial(pd.DataFrame({'序号': serial}))['序号'].tolist() == [1, '2', 2.5, 10, '10', 'A1', 'B', None, 'nan']
+
+
+def test_serial_order_ties():
+    # 序号相同时按 ties 依次排序，仍相同时保持原顺序
+    assert serial_order([1, 1, 1], (np.array([2, 1, 2]),)).tolist() == [1, 0, 2]
+    assert serial_order(['a', 'a', '1', 1], (np.array([1, 1, 0, 0]), np.array([5, 3, 2, 1]))).tolist() == [3, 2, 1, 0]
+    assert serial_order(['nan', 'nan', 'nan']).tolist() == [0, 1, 2]
+
+
+def test_row_sort_keys_match_serial_order():
+    serial = pd.Series([10, '2', 'A1', 1, 'nan', 'B', 2.5, '10', None, 2], dtype=object)
+    vendor = np.array([0, 1, 0, 1, 0, 1, 0, 1, 0, 0])
+    row = np.arange(len(serial))[::-1]
+    keys = row_sort_keys(serial, vendor, row)
+    assert np.argsort(keys, kind='stable').tolist() == serial_order(serial, (vendor, row)).tolist()
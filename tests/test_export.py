@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import io
+import json
+
+import pytest
+
+import web_app
+from bijia.incremental import QuoteComparison
+from bijia.query import MAX_PER_PAGE
+from test_history import quotes
+
+
+@pytest.fixture
+def client():
+    return web_app.app.test_client()
+
+
+@pytest.fixture
+def analysis_id():
+    comparison = QuoteComparison.from_frames({
+        '甲': quotes({'大米': 5, '面粉': 4, '白糖': 6, '食用油': 60, '鸡蛋': 0.8}),
+        '乙': quotes({'大米': 6, '面粉': 3, '白糖': 7, '食用油': 55}),
+        '丙': quotes({'大米': 4, '白糖': 6.5}),
+    })
+    analysis_id, errors = web_app.store_analysis(comparison, comparison.analysis())
+    assert not errors
+    return analysis_id
+
+
+def test_csv_export(client, analysis_id):
+    response = client.get(f'/export/{analysis_id}/prices.csv')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=prices.csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [(row['物料名称'], row['最低价'], row['供应商']) for row in rows] == [
+        ('大米', '4.0', '丙'), ('面粉', '3.0', '乙'), ('白糖', '6.0', '甲'), ('食用油', '55.0', '乙'), ('鸡蛋', '0.8', '甲')]
+    # 没有报价的供应商为空值
+    assert rows[1]['报价_丙'] == ''
+
+
+def test_ndjson_export(client, analysis_id):
+    response = client.get(f'/export/{analysis_id}/awards.ndjson')
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert {(record['供应商'], record['中标品名'], record['单项报价']) for record in records} == {
+        ('丙', '大米', 4.0), ('乙', '面粉', 3.0), ('乙', '食用油', 55.0), ('甲', '白糖', 6.0), ('甲', '鸡蛋', 0.8)}
+    # NaN 导出为 null
+    assert all(record['分项小计'] is None for record in records)
+
+
+def test_parquet_without_pyarrow_is_501(client, analysis_id, monkeypatch):
+    monkeypatch.setattr(web_app, 'parquet_available', lambda: False)
+    assert client.get(f'/export/{analysis_id}/prices.parquet').status_code == 501
+
+
+def test_unknown_export(client, analysis_id):
+    assert client.get(f'/export/{analysis_id}/prices.xml').status_code == 404
+    assert client.get(f'/export/{analysis_id}/vendors.csv').status_code == 404
+    assert client.get('/export/missing/prices.csv').status_code == 404
+
+
+def page(client, analysis_id, table='prices', **args):
+    response = client.get(f'/api/analyses/{analysis_id}/{table}', query_string=args)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def items(result, column='物料名称'):
+    return [row[column] for row in result['rows']]
+
+
+def test_page_bounds(client, analysis_id):
+    first = page(client, analysis_id, per_page=2)
+    assert (first['total'], first['page'], first['per_page'], first['pages']) == (5, 1, 2, 3)
+    assert items(first) == ['大米', '面粉']
+    assert items(page(client, analysis_id, page=3, per_page=2)) == ['鸡蛋']
+    # 超出最后一页时返回空页
+    beyond = page(client, analysis_id, page=4, per_page=2)
+    assert beyond['rows'] == [] and beyond['total'] == 5
+    # 无效的页码和每页行数使用默认值，每页行数不超过上限
+    for invalid in ('0', '-1', 'x'):
+        assert page(client, analysis_id, page=invalid, per_page=2)['page'] == 1
+        assert page(client, analysis_id, per_page=invalid)['per_page'] == 50
+    assert page(client, analysis_id, per_page=MAX_PER_PAGE + 1)['per_page'] == MAX_PER_PAGE
+
+
+def test_sort_and_filters(client, analysis_id):
+    assert items(page(client, analysis_id, sort='最低价', order='desc')) == ['食用油', '白糖', '大米', '面粉', '鸡蛋']
+    assert items(page(client, analysis_id, sort='序号', order='desc')) == ['鸡蛋', '食用油', '白糖', '面粉', '大米']
+    # 不存在的列名不排序，保持原顺序
+    for invalid in ('不存在', '', '__class__'):
+        assert items(page(client, analysis_id, sort=invalid)) == ['大米', '面粉', '白糖', '食用油', '鸡蛋']
+
+    assert items(page(client, analysis_id, vendor='乙')) == ['面粉', '食用油']
+    assert items(page(client, analysis_id, item='油')) == ['食用油']
+    awards = page(client, analysis_id, 'awards', vendor='甲', sort='对应序号', order='desc')
+    assert items(awards, '中标品名') == ['鸡蛋', '白糖']
+
+    assert client.get(f'/api/analyses/{analysis_id}/vendors').status_code == 404
+    assert client.get('/api/analyses/missing/prices').status_code == 404
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import pytest
+
+from bijia.history import PriceHistory
+from bijia.incremental import QuoteComparison
+
+
+def quotes(prices):
+    names = list(prices)
+    return pd.DataFrame({'序号': range(1, len(names) + 1), '物料': names, '原始物料名称': names,
+                         '价格': [float(price) for price in prices.values()], '分项小计': [None] * len(names)})
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = PriceHistory(str(tmp_path / 'history.db'))
+    yield history
+    history.close()
+
+
+def rates(history, item=None):
+    return {rate['vendor']: (rate['tenders'], rate['quoted'], rate['won']) for rate in history.win_rates(item)}
+
+
+def test_sibling_revisions_and_resubmit_count_once(history):
+    tender = QuoteComparison.from_frames({
+        '甲': quotes({'大米': 5, '面粉': 4}),
+        '乙': quotes({'大米': 6, '面粉': 3}),
+        '丙': quotes({'大米': 7}),
+    })
+    assert history.record('a', tender, recorded_at=1) == 5
+    # 由同一结果分出的两个修改：后记录的一个取代该次招标的其他结果
+    replaced = tender.replace('乙', quotes({'大米': 4}))
+    removed = tender.remove('丙')
+    assert history.record('b', replaced, tender, recorded_at=2) > 0
+    assert history.record('c', removed, tender, recorded_at=3) == 4
+    # 重新提交同一组报价单（如命中分析结果缓存）不重复记录
+    assert history.record('d', tender, recorded_at=4) == 0
+
+    assert rates(history) == {'甲': (1, 2, 1), '乙': (1, 2, 1)}
+    assert rates(history, '大米') == {'甲': (1, 1, 1), '乙': (1, 1, 0)}
+    assert history.stats()['runs'] == 3
+    assert history.stats()['current_runs'] == 1
+    assert [price['analysis_id'] for price in history.trend('面粉')] == ['c', 'c']
+
+
+def test_revision_back_to_recorded_content(history):
+    tender = QuoteComparison.from_frames({'甲': quotes({'大米': 5}), '乙': quotes({'大米': 6})})
+    added = tender.add('丙', quotes({'大米': 4}))
+    history.record('a', tender, recorded_at=1)
+    history.record('b', added, tender, recorded_at=2)
+    assert rates(history) == {'丙': (1, 1, 1), '甲': (1, 1, 0), '乙': (1, 1, 0)}
+
+    # 删除刚加入的供应商后与最初的结果相同：不重复记录，最初的结果重新计入
+    assert history.record('c', added.remove('丙'), added, recorded_at=3) == 0
+    assert rates(history) == {'甲': (1, 1, 1), '乙': (1, 1, 0)}
+
+
+def test_separate_tenders_accumulate(history):
+    for month, price in enumerate([5, 4, 6]):
+        tender = QuoteComparison.from_frames({'甲': quotes({'大米': price}), '乙': quotes({'大米': 5})})
+        history.record(f'm{month}', tender, recorded_at=month)
+    assert rates(history) == {'甲': (3, 3, 2), '乙': (3, 3, 1)}
+    assert [change['delta'] for change in history.deltas('大米', '甲')] == [-1.0, 2.0]
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bijia import build_vendor_stats, compact_quote_frame, compare_prices
+from bijia.incremental import QuoteComparison
+
+SERIALS = [1, 2, 2, 2.5, 10, 'A-1', 'B', None, 'long-serial']
+
+
+def random_quotes(rng, rows):
+    data = []
+    for _ in range(rows):
+        name = f'物料{rng.randrange(15)}'
+        quantity = rng.choice([1, 2, None])
+        price = rng.choice([1.0, 2.0, 2.0, 3.5])
+        data.append((rng.choice(SERIALS), name.lower(), name, price, quantity, price * quantity if quantity else None))
+    return compact_quote_frame(pd.DataFrame(data, columns=['序号', '物料', '原始物料名称', '价格', '数量', '分项小计']))
+
+
+def assert_matches_full_recompute(model, data):
+    expected = compare_prices(data)
+    pd.testing.assert_frame_equal(model.analysis_result, expected)
+    expected_stats = build_vendor_stats(expected) if len(expected) else {}
+    assert list(model.vendor_stats) == list(expected_stats)
+    for vendor, items in expected_stats.items():
+        pd.testing.assert_frame_equal(model.vendor_stats[vendor], items)
+    pd.testing.assert_frame_equal(model.runner_up(), expected_runner_up(expected, list(data)))
+
+
+def expected_runner_up(result, vendors):
+    """逐行去掉中选供应商的报价后取最低价（同价时取靠前的供应商）"""
+    rows = []
+    for row in result.to_dict('records'):
+        best = (np.nan, np.nan)
+        for vendor in vendors:
+            price = row[f'报价_{vendor}']
+            if vendor != row['供应商'] and not pd.isna(price) and not price >= best[0]:
+                best = (price, vendor)
+        rows.append(best)
+    return pd.DataFrame(rows, columns=['次低价', '次低供应商']).astype({'次低价': float, '次低供应商': object})
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_updates_match_full_recompute(seed):
+    rng = random.Random(seed)
+    vendors = [f'供应商{i}' for i in range(6)]
+    data = {vendor: random_quotes(rng, 12) for vendor in vendors[:2]}
+    model = QuoteComparison.from_frames(data)
+    assert_matches_full_recompute(model, data)
+
+    for _ in range(60):
+        operation = rng.choice(['add', 'replace', 'remove'])
+        if operation == 'add' and len(data) < len(vendors):
+            vendor = rng.choice([vendor for vendor in vendors if vendor not in data])
+            data[vendor] = random_quotes(rng, rng.randrange(12))
+            model = model.add(vendor, data[vendor])
+        elif operation == 'replace':
+            vendor = rng.choice(list(data))
+            data[vendor] = random_quotes(rng, rng.randrange(12))
+            model = model.replace(vendor, data[vendor])
+        elif operation == 'remove' and len(data) > 1:
+            vendor = rng.choice(list(data))
+            del data[vendor]
+            model = model.remove(vendor)
+        assert_matches_full_recompute(model, data)
+
+
+def test_updates_leave_the_previous_model_unchanged():
+    rng = random.Random(0)
+    data = {'甲': random_quotes(rng, 10), '乙': random_quotes(rng, 10)}
+    model = QuoteComparison.from_frames(data)
+    before = model.analysis_result.copy()
+    model.replace('甲', random_quotes(rng, 10)).remove('乙')
+    pd.testing.assert_frame_equal(model.analysis_result, before)
+    assert_matches_full_recompute(model, data)
+
+
+def test_update_errors():
+    rng = random.Random(0)
+    model = QuoteComparison.from_frames({'甲': random_quotes(rng, 5)})
+    with pytest.raises(ValueError):
+        model.add('甲', random_quotes(rng, 5))
+    with pytest.raises(KeyError):
+        model.replace('乙', random_quotes(rng, 5))
+    with pytest.raises(ValueError):
+        model.remove('甲')
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import io
+import time
+
+import pytest
+
+import web_app
+from bijia.progress import FILE_FAILED, FILE_PARSED
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(web_app.app.config, 'PARSE_WORKERS', 1)
+    return web_app.app.test_client()
+
+
+def quote_csv(prices):
+    rows = ['序号,品名,单价,数量'] + [f'{i},{item},{price},10' for i, (item, price) in enumerate(prices.items(), 1)]
+    return io.BytesIO(('\n'.join(rows) + '\n').encode('utf-8'))
+
+
+def submit(client, files):
+    # 文件名经 secure_filename 处理后只保留 ASCII 字符，测试中使用英文文件名（供应商名称取自文件名）
+    response = client.post('/jobs', data={'files': files}, content_type='multipart/form-data')
+    assert response.status_code == 202
+    body = response.get_json()
+    assert response.headers['Location'].endswith(body['status_url'])
+    return body['status_url']
+
+
+def wait(client, status_url, timeout=30):
+    """轮询任务状态直到任务结束"""
+    deadline = time.time() + timeout
+    while True:
+        response = client.get(status_url)
+        assert response.status_code == 200
+        status = response.get_json()
+        if status['status'] in ('done', 'failed'):
+            return status
+        assert time.time() < deadline, status
+        time.sleep(0.02)
+
+
+def test_job_runs_in_the_background(client):
+    status_url = submit(client, [
+        (quote_csv({'大米': 5, '面粉': 4}), 'jia.csv'),
+        (quote_csv({'大米': 6, '面粉': 3}), 'yi.csv'),
+        (quote_csv({'大米': 4}), 'bing.csv'),
+    ])
+    status = wait(client, status_url)
+    assert status['status'] == 'done' and status['errors'] == []
+    assert [f['filename'] for f in status['files']] == ['jia.csv', 'yi.csv', 'bing.csv']
+    assert {f['status'] for f in status['files']} == {FILE_PARSED}
+    assert status['files_done'] == status['files_total'] == 3
+    assert status['stages']
+
+    # 完成后附带结果页面和导出地址
+    analysis_id = status['analysis_id']
+    assert status['result_url'] == f'/analyses/{analysis_id}'
+    summary = client.get(f'/api/analyses/{analysis_id}').get_json()
+    assert summary['awards'] == {'bing': 1, 'yi': 1}
+    assert client.get(status['export_url']).status_code == 200
+
+
+def test_failed_file_fails_the_job(client):
+    status_url = submit(client, [
+        (quote_csv({'大米': 5}), 'jia.csv'),
+        (io.BytesIO('说明\n报价见附件\n'.encode('utf-8')), 'yi.csv'),
+        (quote_csv({'大米': 4}), 'bing.csv'),
+    ])
+    status = wait(client, status_url)
+    assert status['status'] == 'failed'
+    assert status['analysis_id'] is None and 'result_url' not in status
+    assert [f['status'] for f in status['files']] == [FILE_PARSED, FILE_FAILED, FILE_PARSED]
+    failed = status['files'][1]
+    assert 'yi.csv' in failed['error']
+    assert status['errors'] == [failed['error']]
+
+
+def test_unknown_job(client):
+    assert client.get('/jobs/missing').status_code == 404
+    response = client.post('/jobs', data={'files': [(quote_csv({'大米': 5}), 'jia.csv')]},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == '请至少上传3份报价单'
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+from bijia.log import (RequestIdFilter, configure_logging, lazy, logger, reset_request_id,
+                       set_request_id)
+
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), logger.level
+    yield
+    root.handlers[:] = handlers
+    logger.setLevel(level)
+
+
+def test_level_gating_and_lazy_arguments(caplog, restore_logging):
+    calls = []
+
+    def preview():
+        calls.append(1)
+        return '前5行'
+
+    configure_logging('WARNING')
+    logger.info("预览：%s", lazy(preview))
+    logger.debug("预览：%s", lazy(preview))
+    # 低于日志级别时不格式化消息，也不计算参数
+    assert calls == []
+    assert caplog.records == []
+
+    configure_logging('debug')
+    logger.debug("预览：%s", lazy(preview))
+    assert calls  # 每个输出日志的 handler 各格式化一次
+    assert [record.getMessage() for record in caplog.records] == ['预览：前5行']
+
+
+def test_configure_logging_adds_one_handler(restore_logging):
+    root = logging.getLogger()
+    configure_logging()
+    configure_logging()
+    handlers = [h for h in root.handlers if any(isinstance(f, RequestIdFilter) for f in h.filters)]
+    assert len(handlers) == 1
+    assert logger.level == logging.INFO
+
+    record = logging.LogRecord('bijia', logging.INFO, __file__, 1, '消息', None, None)
+    token = set_request_id('abc123')
+    try:
+        handlers[0].filter(record)
+    finally:
+        reset_request_id(token)
+    assert record.request_id == 'abc123'
+
+
+def test_importing_web_app_leaves_logging_alone():
+    code = 'import logging, web_app; print(len(logging.getLogger().handlers), web_app.logger.level)'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            env=dict(os.environ, PARSE_CACHE_MB='0'), cwd=root).stdout
+    assert output.split() == ['0', '0']
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+
+from bijia.matching import align_items, match_key
+
+
+def test_match_key_rewrites_units_after_numbers():
+    assert match_key('A4 纸70克') == match_key('A4纸 70g') == 'a4纸70g'
+    assert match_key('矿泉水 500 毫升') == '矿泉水500ml'
+
+
+def test_match_key_keeps_unit_characters_inside_names():
+    assert match_key('大米') == '大米'
+    assert match_key('巧克力 100克') == '巧克力100g'
+    assert match_key('升降桌 1.2米') == '升降桌12m'
+
+
+def test_align_items_merges_unit_spellings():
+    def quotes(names):
+        return pd.DataFrame({'序号': range(1, len(names) + 1), '物料': names, '原始物料名称': names,
+                             '价格': [1.0] * len(names), '分项小计': [None] * len(names)})
+
+    aligned, index = align_items({'甲': quotes(['大米 5千克', '巧克力']), '乙': quotes(['大米5kg', '巧g力'])}, 0.8)
+    assert list(aligned['乙']['物料'].astype(str)) == ['大米 5千克', '巧g力']
+    assert len(index) == 3
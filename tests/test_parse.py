@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+import io
+
+import openpyxl
+import pandas as pd
+
+import bijia.parse as parse_module
+from bijia import read_quote
+from bijia.sniff import plan_columns, sniff_header
+from bijia.workbook import read_head_rows
+
+
+def workbook(*sheets):
+    """由 (工作表名, 各行) 生成 xlsx 文件对象"""
+    book = openpyxl.Workbook()
+    book.remove(book.active)
+    for title, rows in sheets:
+        sheet = book.create_sheet(title)
+        for row in rows:
+            sheet.append(row)
+    buffer = io.BytesIO()
+    book.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def parse(filename, *sheets):
+    quote, error = read_quote(workbook(*sheets), filename)
+    assert error is None
+    return quote
+
+
+def test_title_rows_above_header():
+    quote = parse('报价.xlsx', ('Sheet1', [
+        ['某某学校食堂采购报价单'],
+        ['供货供应商：瓦房店市君创百货贸易商店 采购时间：2024年3月'],
+        [],
+        ['序号', '品名', '单项报价', '数量', '分项小计'],
+        [1, '大米', 5.5, 10, 55],
+        [2, '食用油(5L)', 60, 2, 120],
+    ]))
+    assert quote.vendor == '瓦房店市君创百货贸易商店'
+    frame = quote.frame
+    assert frame['物料'].tolist() == ['大米', '食用油5l']
+    assert frame['原始物料名称'].tolist() == ['大米', '食用油(5L)']
+    assert frame['价格'].tolist() == [5.5, 60]
+    assert frame['序号'].tolist() == ['1', '2']
+    assert frame['分项小计'].tolist() == [55, 120]
+
+
+def test_quote_on_second_sheet():
+    quote = parse('乙公司.xlsx', ('说明', [
+        ['请在第二个工作表中填写报价'],
+        ['报价有效期：30天'],
+    ]), ('报价', [
+        ['序号', '名称', '单价', '数量'],
+        [1, '鸡蛋', 0.8, 300],
+        [2, '白糖', 6, 5],
+    ]))
+    # 内容中没有供应商名称时使用文件名
+    assert quote.vendor == '乙公司'
+    assert quote.frame['物料'].tolist() == ['鸡蛋', '白糖']
+    assert quote.frame['分项小计'].tolist() == [240, 30]
+
+
+def test_unnamed_quantity_column():
+    # 数量列没有列名（Unnamed: 3），按内容画像识别；备注列不参与计算
+    quote = parse('丙公司.xlsx', ('Sheet1', [
+        ['序号', '品名', '单价', None, '备注'],
+        [1, '土豆', 2.0, 50, '产地直供'],
+        [2, '洋葱', 3.0, 20, None],
+        [3, '青椒', 4.5, 8, '当日送达'],
+    ]))
+    frame = quote.frame
+    assert frame['数量'].tolist() == [50, 20, 8]
+    assert frame['分项小计'].tolist() == [100, 60, 36]
+
+
+
+def test_only_the_quote_sheet_is_loaded(monkeypatch):
+    opened, loaded = [], []
+    excel_file = pd.ExcelFile
+    load_sheet = parse_module.load_sheet
+
+    def open_once(*args, **kwargs):
+        opened.append(args)
+        return excel_file(*args, **kwargs)
+
+    def record(xl, sheet_name, sniff=None):
+        loaded.append(sheet_name)
+        return load_sheet(xl, sheet_name, sniff)
+
+    monkeypatch.setattr(pd, 'ExcelFile', open_once)
+    monkeypatch.setattr(parse_module, 'load_sheet', record)
+    quote = parse('戊公司.xlsx', ('封面', [['报价单'], ['日期：2024年3月']]), ('附件', [['附件一']] * 30), ('明细', [
+        ['序号', '品名', '单项报价', '分项小计'],
+        [1, '面粉', 4.0, 40],
+    ]))
+    # 工作簿只打开一次，只加载第三个工作表（表头所在的工作表）
+    assert len(opened) == 1
+    assert loaded == ['明细']
+    assert quote.frame['物料'].tolist() == ['面粉']
+
+
+def test_no_sheet_has_the_required_columns():
+    source = workbook(('封面', [['报价单'], ['日期：2024年3月']]), ('备注', [['备注'], ['无']]))
+    quote, error = read_quote(source, '己公司.xlsx')
+    assert quote is None
+    assert '己公司.xlsx' in error and '缺少必要的列' in error
+
+
+def test_header_after_blank_rows():
+    rows = [
+        [],
+        [],
+        ['序号', '品名', '单项报价', '分项小计', '备注'],
+        [1, '牛奶', 3.5, 35, '冷链'],
+        ['2-1', '酸奶', 4, 20, None],
+    ]
+    with pd.ExcelFile(workbook(('Sheet1', rows))) as xl:
+        sniff = sniff_header(read_head_rows(xl, 'Sheet1'))
+    assert sniff.header_row == 2
+    assert sniff.usecols == [0, 1, 2, 3]  # 备注列不加载
+    assert sniff.dtype == {'品名': str, '序号': str}
+
+    frame = parse('庚公司.xlsx', ('Sheet1', rows)).frame
+    assert frame['序号'].tolist() == ['1', '2-1']
+    assert frame['物料'].tolist() == ['牛奶', '酸奶']
+    assert frame['分项小计'].tolist() == [35, 20]
+    assert '备注' not in frame.columns
+
+
+def test_vendor_title_row_above_header():
+    rows = [
+        ['供应商：辛记粮油店'],
+        ['序号', '品名', '单价', '数量'],
+        [1, '面条', 3, 10],
+    ]
+    sniff = sniff_header(rows)
+    assert sniff.header_row == 1
+    assert sniff.vendor_rows().iloc[0, 0] == '供应商：辛记粮油店'
+
+    quote = parse('报价单.xlsx', ('Sheet1', rows))
+    assert quote.vendor == '辛记粮油店'
+    assert quote.frame['分项小计'].tolist() == [30]
+
+
+def test_duplicate_header_names():
+    rows = [
+        ['序号', '品名', '单价', '单价', '品名', '数量'],
+        [1, '盐', 2, 9, '备用', 4],
+        [2, '醋', 5, 9, '备用', 2],
+    ]
+    usecols, dtype = plan_columns(rows[0])
+    # 重复的列名按 pandas 的规则追加 .1，只加载第一个单价列和品名列
+    assert usecols == [0, 1, 2, 5]
+    assert dtype == {'品名': str, '序号': str}
+
+    quote = parse('壬公司.xlsx', ('Sheet1', rows))
+    frame = quote.frame
+    assert frame['物料'].tolist() == ['盐', '醋']
+    assert frame['价格'].tolist() == [2, 5]
+    assert frame['分项小计'].tolist() == [8, 10]
+
+
+def test_csv_header_after_title_rows(tmp_path):
+    path = tmp_path / '癸公司.csv'
+    path.write_text('\n'.join([
+        '供货供应商：癸记蔬菜批发,,',
+        ',,',
+        '序号,品名,单价,数量',
+        '1,白菜,1.5,20',
+        '2,萝卜,1.2,10',
+    ]) + '\n', encoding='utf-8')
+    quote, error = read_quote(str(path), path.name)
+    assert error is None
+    assert quote.vendor == '癸记蔬菜批发'
+    assert quote.frame['物料'].tolist() == ['白菜', '萝卜']
+    assert quote.frame['分项小计'].tolist() == [30, 12]
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+
+from bijia import compact_quote_frame, process_dataframe
+from bijia.profile import rank_quantity_columns
+
+
+def ranked_columns(df, price_col='单价', exclude=('序号', '品名')):
+    return [profile.column for _, profile in rank_quantity_columns(df, price_col, exclude)]
+
+
+def test_fifth_column_is_not_forced():
+    # 第5列是文本（品牌）或价格列时不作为数量列，改用内容像数量的无列名列
+    df = pd.DataFrame({
+        '序号': [1, 2, 3],
+        '品名': ['大米', '面粉', '白糖'],
+        '单价': [5.5, 4.0, 6.2],
+        'Unnamed: 3': [10, 25, 4],
+        '品牌': ['五常', '金龙鱼', '太古'],
+    })
+    assert ranked_columns(df) == ['Unnamed: 3']
+
+    df = df.rename(columns={'品牌': '市场单价'}).assign(市场单价=[6.0, 4.5, 7.0])
+    assert ranked_columns(df) == ['Unnamed: 3']
+
+
+def test_two_quantity_like_columns():
+    # 整数列优先于带小数的列，模板位置（第5列）只是加分
+    df = pd.DataFrame({
+        '序号': [1, 2, 3],
+        '品名': ['大米', '面粉', '白糖'],
+        '单价': [5.5, 4.0, 6.2],
+        'Unnamed: 3': [10, 25, 4],
+        'Unnamed: 4': [0.5, 1.25, 2.5],
+    })
+    assert ranked_columns(df) == ['Unnamed: 3', 'Unnamed: 4']
+
+    # 两列都是整数时，第5列的模板加分超过距离价格列较远的扣分
+    df['Unnamed: 4'] = [2, 3, 1]
+    assert ranked_columns(df) == ['Unnamed: 4', 'Unnamed: 3']
+
+
+def test_subtotal_and_price_fallback():
+    # 有分项小计列时不推断数量列；其余列也没有像数量的列，数量由分项小计 / 单价得到
+    df = pd.DataFrame({
+        '序号': [1, 2],
+        '品名': ['大米', '面粉'],
+        '单价': [5.0, 4.0],
+        '备注': ['袋装', '散装'],
+        '小计': [50.0, 12.0],
+    })
+    assert ranked_columns(df, exclude=('序号', '品名', '小计')) == []
+
+    quote, error = process_dataframe(df, '甲.xlsx', '甲')
+    assert error is None
+    assert '数量' not in quote.frame.columns
+    assert compact_quote_frame(quote.frame)['行数量'].tolist() == [10.0, 3.0]
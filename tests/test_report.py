@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import io
+import math
+
+import openpyxl
+
+import web_app
+from bijia import build_vendor_stats, compare_prices
+from bijia.models import Analysis
+from bijia.report import VENDOR_SHEET_COLUMNS, iter_report
+from test_compare import fixture_quotes
+
+
+def cell_value(value):
+    """报告中空值、NaN 写为空单元格"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def sheet_rows(sheet):
+    return [list(row) for row in sheet.iter_rows(values_only=True)]
+
+
+def assert_report_matches(data, analysis_result, vendor_stats):
+    workbook = openpyxl.load_workbook(io.BytesIO(data))
+    assert workbook.sheetnames == ['最低价分析', *vendor_stats]
+
+    rows = sheet_rows(workbook['最低价分析'])
+    assert rows[0] == list(analysis_result.columns)
+    assert rows[1:] == [[cell_value(value) for value in row] for row in analysis_result.itertuples(index=False)]
+    assert all(cell.font.b for cell in workbook['最低价分析'][1])
+
+    for vendor, items in vendor_stats.items():
+        rows = sheet_rows(workbook[vendor])
+        assert rows[0] == VENDOR_SHEET_COLUMNS
+        assert rows[1:] == [[cell_value(value) for value in row] for row in items.itertuples(index=False)]
+
+
+def test_report_round_trips_through_openpyxl():
+    analysis_result = compare_prices(fixture_quotes())
+    vendor_stats = build_vendor_stats(analysis_result)
+    assert_report_matches(b''.join(iter_report(analysis_result, vendor_stats)), analysis_result, vendor_stats)
+
+
+def test_report_sheet_titles_are_valid_and_unique():
+    analysis_result = compare_prices(fixture_quotes())
+    awards = build_vendor_stats(analysis_result)
+    items = next(iter(awards.values()))
+    vendor_stats = {'供应商/甲:*?': items, '供应商_甲___': items, 'x' * 40: items}
+    workbook = openpyxl.load_workbook(io.BytesIO(b''.join(iter_report(analysis_result, vendor_stats))))
+    assert workbook.sheetnames == ['最低价分析', '供应商_甲___', '供应商_甲____1', 'x' * 31]
+
+
+def test_export_endpoint_serves_the_report():
+    analysis_result = compare_prices(fixture_quotes())
+    vendor_stats = build_vendor_stats(analysis_result)
+    analysis_id = web_app.analyses.put(Analysis(analysis_result, vendor_stats, []))
+    client = web_app.app.test_client()
+
+    response = client.get(f'/export/{analysis_id}')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    assert_report_matches(response.data, analysis_result, vendor_stats)
+    assert client.get(f'/export/{analysis_id}').data == response.data
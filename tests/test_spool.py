@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import stat
+
+import pytest
+
+import web_app
+from bijia.spool import (MEMORY_FACTORS, BudgetExceeded, MemoryBudget, SpoolFull, UploadSpool,
+                         estimate_memory, largest_upload)
+
+QUOTE_CSV = '序号,品名,单价,数量\n1,大米,5.5,10\n'.encode('utf-8')
+
+
+def test_spool_quota_and_release(tmp_path):
+    spool = UploadSpool(str(tmp_path / 'spool'), max_bytes=10, chunk_size=4)
+    assert stat.S_IMODE(os.stat(spool.directory).st_mode) == 0o700
+
+    path = spool.save(io.BytesIO(b'12345678'), suffix='.csv')
+    assert path.endswith('.csv') and spool.used == 8
+    with pytest.raises(SpoolFull):
+        spool.save(io.BytesIO(b'123'))
+    # 写入失败的文件不占用空间，也不留在目录中
+    assert spool.used == 8
+    assert os.listdir(spool.directory) == [os.path.basename(path)]
+
+    spool.release([path])
+    assert spool.used == 0 and os.listdir(spool.directory) == []
+
+
+def test_spool_stream_is_adopted_in_place(tmp_path):
+    spool = UploadSpool(str(tmp_path / 'spool'), max_bytes=10)
+    stream = spool.stream()
+    stream.write(b'1234')
+    path = spool.save(stream, suffix='.xlsx')
+    assert stream.adopted and spool.used == 4
+    with open(path, 'rb') as f:
+        assert f.read() == b'1234'
+
+    # 未被接管的文件流超出上限时删除文件
+    stream = spool.stream()
+    with pytest.raises(SpoolFull):
+        stream.write(b'1234567')
+    assert not os.path.exists(stream.path)
+    assert spool.used == 4
+
+
+def test_spool_refuses_a_directory_of_another_user(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, 'getuid', lambda: os.stat(tmp_path).st_uid + 1)
+    with pytest.raises(PermissionError):
+        UploadSpool(str(tmp_path / 'spool'))
+
+
+def test_memory_budget(tmp_path):
+    budget = MemoryBudget(100)
+    with budget.reserve(60) as reservation:
+        assert budget.used == 60
+        with pytest.raises(BudgetExceeded) as busy:
+            budget.reserve(50)
+        assert not busy.value.never_fits
+        reservation.release()
+        reservation.release()
+        assert budget.used == 0
+    with pytest.raises(BudgetExceeded) as too_large:
+        budget.reserve(101)
+    assert too_large.value.never_fits
+    assert budget.used == 0
+
+    path = tmp_path / 'a.xlsx'
+    path.write_bytes(b'x' * 10)
+    assert estimate_memory([(str(path), 'a.xlsx', 'excel'), (str(path), 'a.csv', 'csv'),
+                            (str(tmp_path / 'missing'), 'b.xlsx', 'excel')]) == 10 * 20 + 10 * 5
+
+
+def test_default_upload_limit_fits_the_budget():
+    # 默认的上传上限内的 xlsx 上传不会因内存预算而被拒绝
+    budget = web_app.app.config['MEMORY_BUDGET_MB'] * 1024 * 1024
+    assert largest_upload(budget) * MEMORY_FACTORS['excel'] <= budget
+    if not os.environ.get('MAX_UPLOAD_MB'):
+        assert web_app.app.config['MAX_UPLOAD_MB'] == largest_upload(web_app.app.config['MEMORY_BUDGET_MB'])
+
+
+@pytest.fixture
+def client():
+    return web_app.app.test_client()
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    spool = UploadSpool(str(tmp_path / 'spool'))
+    monkeypatch.setattr(web_app, 'upload_spool', spool)
+    return spool
+
+
+def post_quotes(client, url, size=1):
+    files = [(io.BytesIO(QUOTE_CSV * size), f'{name}.csv') for name in '甲乙丙']
+    return client.post(url, data={'files': files}, content_type='multipart/form-data')
+
+
+def error_message(response):
+    return response.get_json()['error'] if response.is_json else response.get_data(as_text=True)
+
+
+@pytest.mark.parametrize('url', ['/jobs', '/'])
+def test_upload_larger_than_the_budget_is_413(client, spool, monkeypatch, url):
+    budget = MemoryBudget(len(QUOTE_CSV) * MEMORY_FACTORS['csv'] * 2)
+    monkeypatch.setattr(web_app, 'memory_budget', budget)
+    response = post_quotes(client, url)
+    assert response.status_code == 413
+    assert '报价单过大' in error_message(response)
+    assert spool.used == 0 and budget.used == 0
+
+
+@pytest.mark.parametrize('url', ['/jobs', '/'])
+def test_busy_budget_is_503(client, spool, monkeypatch, url):
+    budget = MemoryBudget(1024 * 1024)
+    monkeypatch.setattr(web_app, 'memory_budget', budget)
+    with budget.reserve(budget.max_bytes - 1):
+        response = post_quotes(client, url)
+    assert response.status_code == 503
+    assert '请稍后再试' in error_message(response)
+    assert spool.used == 0 and budget.used == 0
+
+
+def test_full_spool_is_503(client, tmp_path, monkeypatch):
+    spool = UploadSpool(str(tmp_path / 'spool'), max_bytes=len(QUOTE_CSV) * 2)
+    monkeypatch.setattr(web_app, 'upload_spool', spool)
+    response = post_quotes(client, '/jobs')
+    assert response.status_code == 503
+    assert '临时存储空间不足' in response.get_json()['error']
+    assert spool.used == 0 and os.listdir(spool.directory) == []
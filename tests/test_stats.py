@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+
+from bijia import build_vendor_stats, compare_prices
+from bijia.stats import vendor_totals
+from legacy import legacy_vendor_stats
+from test_compare import quotes
+
+
+def analysis_result():
+    # 已按对应序号排序的结果表，没有数量列；文本序号 'nan' 不是空值
+    return pd.DataFrame({
+        '序号': [1, '2', 2, 'nan', 'nan'],
+        '物料名称': ['大米', '面粉', '白糖', '盐', '醋'],
+        '最低价': [5.0, 4.0, 0.0, 2.0, 3.0],
+        '供应商': ['乙', '甲', '乙', '丙', '甲'],
+        '分项小计': [50.0, 0.0, 10.0, 8.0, None],
+    })
+
+
+def test_vendor_stats_without_quantity_column():
+    stats = build_vendor_stats(analysis_result())
+    # 供应商按首次中标的顺序，明细沿用结果表的顺序，索引为结果表中的行号
+    assert list(stats) == ['乙', '甲', '丙']
+    assert {vendor: items.index.tolist() for vendor, items in stats.items()} == {'乙': [0, 2], '甲': [1, 4], '丙': [3]}
+    # 数量为分项小计 / 单项报价，任一不大于0或为空时为1
+    assert {vendor: items['数量'].tolist() for vendor, items in stats.items()} == {
+        '乙': [10.0, 1.0], '甲': [1.0, 1.0], '丙': [4.0]}
+    assert stats['甲']['序号'].tolist() == ['2', 'nan']
+    assert stats['丙']['序号'].tolist() == ['nan']
+
+    expected = legacy_vendor_stats(analysis_result())
+    for vendor, items in stats.items():
+        pd.testing.assert_frame_equal(items.reset_index(drop=True), expected[vendor], check_dtype=False)
+
+
+def test_vendor_stats_with_ties_and_mixed_serials():
+    result = compare_prices({
+        '甲': quotes([('nan', '盐', 2.0, 0.0), (2, '面粉', 4.0, 40.0), ('A', '醋', 3.0, 6.0)]),
+        '乙': quotes([('2', '白糖', 6.0, 12.0), ('nan', '酱油', 5.0, 5.0), (2, '面粉', 4.0, 80.0)]),
+    })
+    assert result['物料名称'].tolist() == ['面粉', '白糖', '醋', '盐', '酱油']
+    stats = build_vendor_stats(result)
+    # 同价时取靠前的供应商，序号相同的物料按首次出现的供应商和行排序
+    assert {vendor: items['物料名称'].tolist() for vendor, items in stats.items()} == {
+        '甲': ['面粉', '醋', '盐'], '乙': ['白糖', '酱油']}
+    assert stats['甲']['数量'].tolist() == [10.0, 2.0, 1.0]
+    totals = vendor_totals(stats)
+    assert totals.to_dict('index') == {
+        '甲': {'中标数量': 3, '分项小计合计': 46.0}, '乙': {'中标数量': 2, '分项小计合计': 17.0}}
+
+
+def test_vendor_stats_of_an_empty_result():
+    assert build_vendor_stats(analysis_result().iloc[:0]) == {}
+    assert vendor_totals({}).empty
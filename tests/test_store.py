@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+import pandas as pd
+
+from bijia.incremental import QuoteComparison
+from bijia.store import AnalysisStore
+from test_compare import fixture_quotes
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def comparison():
+    return QuoteComparison.from_frames(fixture_quotes())
+
+
+def test_store_keeps_results_by_id():
+    store = AnalysisStore()
+    first = comparison()
+    first_id = store.put(first.analysis(), state=first)
+    second_id = store.put(first.remove('丁').analysis())
+    assert first_id != second_id
+    assert store.get(first_id).analysis_result is first.analysis_result
+    assert store.get_state(first_id) is first
+    assert store.get_state(second_id) is None
+    assert store.get('not-an-id') is None
+    store.delete(first_id)
+    assert store.get(first_id) is None
+
+
+def test_evicted_results_reload_from_spill_dir(tmp_path):
+    spill_dir = str(tmp_path / 'spill')
+    store = AnalysisStore(max_entries=1, spill_dir=spill_dir)
+    model = comparison()
+    analysis_id = store.put(model.analysis(), state=model)
+    assert store.put_artifact(analysis_id, 'xlsx', b'report')
+    store.put(model.remove('丁').analysis())
+    assert len(store) == 1
+
+    # 从落盘文件读回（包括导出文件和比价模型），其他进程共享同一目录时同样可读
+    for reader in (store, AnalysisStore(spill_dir=spill_dir)):
+        analysis = reader.get(analysis_id)
+        pd.testing.assert_frame_equal(analysis.analysis_result, model.analysis_result)
+        assert list(analysis.vendor_stats) == list(model.vendor_stats)
+        assert read_file(reader.get_artifact(analysis_id, 'xlsx')) == b'report'
+        state = reader.get_state(analysis_id)
+        pd.testing.assert_frame_equal(state.replace('乙', fixture_quotes()['甲']).analysis_result,
+                                      model.replace('乙', fixture_quotes()['甲']).analysis_result)
+
+
+def test_expired_spilled_results_are_removed(tmp_path):
+    spill_dir = str(tmp_path / 'spill')
+    store = AnalysisStore(ttl=60, spill_dir=spill_dir)
+    model = comparison()
+    analysis_id = store.put(model.analysis(), state=model)
+    store.put_artifact(analysis_id, 'xlsx', b'report')
+    expired = time.time() - 120
+    for name in os.listdir(spill_dir):
+        os.utime(os.path.join(spill_dir, name), (expired, expired))
+
+    reader = AnalysisStore(ttl=60, spill_dir=spill_dir)
+    assert reader.get(analysis_id) is None
+    assert os.listdir(spill_dir) == []
+
+
+def test_artifacts_are_written_to_disk_and_removed_with_the_result():
+    store = AnalysisStore(max_entries=1)
+    model = comparison()
+    analysis_id = store.put(model.analysis())
+    with store.artifact_writer(analysis_id, 'xlsx') as writer:
+        for chunk in (b'part1', b'part2'):
+            writer.write(chunk)
+        assert writer.commit()
+    path = store.get_artifact(analysis_id, 'xlsx')
+    assert read_file(path) == b'part1part2'
+    directory = os.path.dirname(path)
+    assert oct(os.stat(directory).st_mode & 0o777) == oct(0o700)
+
+    # 写入中断时不留下临时文件，也不登记导出文件
+    with store.artifact_writer(analysis_id, 'csv') as writer:
+        writer.write(b'partial')
+    assert store.get_artifact(analysis_id, 'csv') is None
+    assert os.listdir(directory) == [os.path.basename(path)]
+
+    # 分析结果被淘汰时导出文件一起删除
+    store.put(model.analysis())
+    assert not os.path.exists(path)
+    assert store.artifact_writer('not-an-id', 'xlsx') is None
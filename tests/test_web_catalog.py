@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import web_app
+from bijia.catalog import ItemCatalog
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    catalog = ItemCatalog(str(tmp_path / 'catalog.db'))
+    monkeypatch.setattr(web_app, 'item_catalog', catalog)
+    yield catalog
+    catalog.close()
+
+
+@pytest.fixture
+def client():
+    return web_app.app.test_client()
+
+
+def test_catalog_endpoints_without_catalog(client, monkeypatch):
+    monkeypatch.setattr(web_app, 'item_catalog', None)
+    assert client.get('/api/catalog/review').status_code == 404
+
+
+def test_review_queue_and_approve(client, catalog):
+    catalog.enqueue(['面粉', '食用油'], ['面粉 ', '食用油'], '甲')
+    body = client.get('/api/catalog/review?per_page=1').get_json()
+    assert body['total'] == 2 and len(body['names']) == 1
+
+    response = client.post('/api/catalog/review/面粉')
+    assert response.status_code == 201
+    item = response.get_json()
+    assert item['name'] == '面粉'
+
+    response = client.post('/api/catalog/review/食用油', json={'item_id': str(item['id'])})
+    assert response.status_code == 201
+    assert response.get_json()['aliases'] == ['面粉', '食用油']
+    assert client.get('/api/catalog/review').get_json()['total'] == 0
+
+
+def test_approve_rejects_invalid_item_id(client, catalog):
+    catalog.enqueue(['面粉'], ['面粉'])
+    response = client.post('/api/catalog/review/面粉', json={'item_id': 'abc'})
+    assert response.status_code == 400
+    assert client.post('/api/catalog/review/面粉', json={'item_id': 999}).status_code == 404
+    assert client.get('/api/catalog/review').get_json()['total'] == 1
+
+
+def test_dismiss_and_add_item(client, catalog):
+    catalog.enqueue(['面粉'], ['面粉'])
+    assert client.delete('/api/catalog/review/面粉').status_code == 204
+    assert client.delete('/api/catalog/review/面粉').status_code == 404
+
+    assert client.post('/api/catalog/items', json={}).status_code == 400
+    response = client.post('/api/catalog/items', json={'name': '大米', 'aliases': ['东北大米']})
+    assert response.status_code == 201
+    item_id = response.get_json()['id']
+    assert client.post('/api/catalog/items', json={'name': '东北大米'}).status_code == 409
+    assert client.get(f'/api/catalog/items/{item_id}').get_json()['aliases'] == ['东北大米', '大米']
+    assert client.get('/api/catalog/items/999').status_code == 404
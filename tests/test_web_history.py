@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import web_app
+from bijia.history import PriceHistory
+from bijia.incremental import QuoteComparison
+from test_history import quotes
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    history = PriceHistory(str(tmp_path / 'history.db'))
+    monkeypatch.setattr(web_app, 'price_history', history)
+    yield history
+    history.close()
+
+
+@pytest.fixture
+def client():
+    return web_app.app.test_client()
+
+
+def test_history_endpoints_without_history(client, monkeypatch):
+    monkeypatch.setattr(web_app, 'price_history', None)
+    assert client.get('/api/history').status_code == 404
+    assert client.get('/api/history/win-rates').status_code == 404
+
+
+def test_revisions_through_the_api_replace_the_tender(client, history):
+    comparison = QuoteComparison.from_frames({
+        '甲': quotes({'大米': 5, '面粉': 4}),
+        '乙': quotes({'大米': 6, '面粉': 3}),
+        '丙': quotes({'大米': 4}),
+    })
+    analysis_id, errors = web_app.store_analysis(comparison, comparison.analysis())
+    assert not errors
+    # 同一结果的两个修改和一次重新提交
+    assert client.delete(f'/api/analyses/{analysis_id}/vendors/丙').status_code == 201
+    response = client.delete(f'/api/analyses/{analysis_id}/vendors/甲')
+    assert response.status_code == 201
+    web_app.store_analysis(comparison, comparison.analysis())
+
+    assert client.get('/api/history').get_json() == {
+        'runs': 3, 'current_runs': 1, 'items': 2, 'vendors': 3, 'quotes': 12}
+    rates = client.get('/api/history/win-rates').get_json()['vendors']
+    assert [(rate['vendor'], rate['tenders'], rate['quoted'], rate['won']) for rate in rates] == [
+        ('丙', 1, 1, 1), ('乙', 1, 2, 1)]
+
+    trend = client.get('/api/history/items/大米/trend').get_json()['prices']
+    assert {(price['vendor'], price['price'], price['won']) for price in trend} == {('乙', 6.0, False), ('丙', 4.0, True)}
+    assert {price['analysis_id'] for price in trend} == {response.get_json()['analysis_id']}
+
+
+def test_history_queries(client, history):
+    for month, price in enumerate([5, 4, 6]):
+        tender = QuoteComparison.from_frames({'甲': quotes({'大米': price}), '乙': quotes({'大米': 5})})
+        history.record(f'm{month}', tender, recorded_at=1767225600 + month * 30 * 86400)
+
+    assert client.get('/api/history/items?q=大').get_json() == {'items': [{'item': '大米', 'name': '大米'}]}
+    changes = client.get('/api/history/items/大米/deltas?vendor=甲').get_json()['changes']
+    assert [(change['previous_analysis_id'], change['analysis_id'], change['delta']) for change in changes] == [
+        ('m0', 'm1', -1.0), ('m1', 'm2', 2.0)]
+    assert len(client.get('/api/history/items/大米/trend?tenders=2').get_json()['prices']) == 4
+    assert client.get('/api/history/items/小米/trend').status_code == 404
+    assert client.get('/api/history/items/大米/trend?vendor=丁').status_code == 404
+
+    rates = client.get('/api/history/win-rates?since=2026-01-15').get_json()['vendors']
+    assert [(rate['vendor'], rate['quoted'], rate['won']) for rate in rates] == [('乙', 2, 1), ('甲', 2, 1)]
+    assert client.get('/api/history/win-rates?since=yesterday').status_code == 400
+    assert client.get('/api/history/win-rates?item=小米').status_code == 404
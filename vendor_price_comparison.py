@@ -10,12 +10,16 @@
 4. 展示结果并导出分析报告
 """
 
+import multiprocessing
 import os
 import pandas as pd
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import numpy as np
 
+from bijia import analyze_files
+from bijia.log import configure_logging
+
 class VendorPriceComparison:
     def __init__(self):
         self.root = tk.Tk()
@@ -134,143 +138,22 @@ class VendorPriceComparison:
             else:
                 messagebox.showinfo("提示", f"已上传 {len(self.files)} 份报价单，请至少上传3份")
     
-    def parse_file(self, file_path):
-        """解析报价单文件"""
-        try:
-            filename = os.path.basename(file_path)
-            vendor_name = filename.split('.')[0]  # 用文件名作为供应商名称
-            
-            # 尝试读取Excel文件的所有工作表
-            if file_path.endswith('.csv'):
-                # CSV文件直接读取
-                df = pd.read_csv(file_path)
-                result, error = self.process_dataframe(df, filename)
-                if error:
-                    messagebox.showerror("错误", error)
-                    return None
-                return vendor_name, result
-            else:
-                # Excel文件，尝试读取所有工作表
-                try:
-                    # 首先尝试读取第一个工作表
-                    df = pd.read_excel(file_path)
-                    result, error = self.process_dataframe(df, filename)
-                    if not error:
-                        return vendor_name, result
-                    
-                    # 如果第一个工作表失败，尝试读取所有工作表
-                    xl = pd.ExcelFile(file_path)
-                    for sheet_name in xl.sheet_names:
-                        df = pd.read_excel(xl, sheet_name)
-                        result, error = self.process_dataframe(df, filename)
-                        if not error:
-                            return vendor_name, result
-                    
-                    # 所有工作表都失败
-                    messagebox.showerror("错误", f"文件 {filename} 的所有工作表都缺少必要的列：品名/名称 或 单项报价/价格")
-                    return None
-                except Exception as e:
-                    messagebox.showerror("错误", f"读取Excel文件 {file_path} 时出错：{str(e)}")
-                    return None
-        except Exception as e:
-            messagebox.showerror("错误", f"解析文件 {file_path} 时出错：{str(e)}")
-            return None
-    
-    def process_dataframe(self, df, filename):
-        """处理数据框，查找必要的列"""
-        # 标准化列名（去除空格、特殊字符，转换为小写）
-        normalized_columns = {}
-        for col in df.columns:
-            # 标准化列名：去除空格、特殊字符，转换为小写
-            normalized_col = ''.join(e for e in str(col) if e.isalnum() or e == '_').lower()
-            normalized_columns[normalized_col] = col
-        
-        # 查找物料列（支持多种可能的列名）
-        item_col = None
-        item_col_options = ['品名', '名称', '物料', '货品', '商品']
-        for option in item_col_options:
-            normalized_option = ''.join(e for e in option if e.isalnum() or e == '_').lower()
-            if normalized_option in normalized_columns:
-                item_col = normalized_columns[normalized_option]
-                break
-        
-        # 查找价格列（支持多种可能的列名）
-        price_col = None
-        price_col_options = ['单项报价', '报价', '价格', '单价', '单位价格']
-        for option in price_col_options:
-            normalized_option = ''.join(e for e in option if e.isalnum() or e == '_').lower()
-            if normalized_option in normalized_columns:
-                price_col = normalized_columns[normalized_option]
-                break
-        
-        # 检查是否找到必要的列
-        if not item_col or not price_col:
-            return None, f"文件 {filename} 缺少必要的列：品名/名称 或 单项报价/价格"
-        
-        # 清理数据
-        df = df.dropna(subset=[item_col, price_col])
-        df['物料'] = df[item_col].astype(str).str.strip()  # 重命名为'物料'，与后续代码保持一致
-        df['价格'] = pd.to_numeric(df[price_col], errors='coerce')  # 重命名为'价格'，与后续代码保持一致
-        df = df.dropna(subset=['价格'])
-        
-        return df, None
-    
     def analyze_prices(self):
         """分析价格，找出最低价"""
         if len(self.files) < 3:
             messagebox.showwarning("警告", "请至少上传3份报价单")
             return
         
-        # 解析所有文件
-        self.data = {}
-        for file_path in self.files:
-            result = self.parse_file(file_path)
-            if result:
-                vendor_name, df = result
-                self.data[vendor_name] = df
-        
-        if not self.data:
+        # 并行解析所有文件并分析
+        analysis_result, vendor_stats, errors = analyze_files(self.files)
+        if errors:
+            messagebox.showerror("错误", "\n".join(errors))
+        if analysis_result is None:
             messagebox.showerror("错误", "没有成功解析的报价单")
             return
         
-        # 收集所有物料
-        all_items = set()
-        for vendor, df in self.data.items():
-            all_items.update(df['物料'].tolist())
-        
-        # 分析每个物料的最低价
-        analysis_data = []
-        for item in all_items:
-            min_price = float('inf')
-            min_vendor = ""
-            
-            for vendor, df in self.data.items():
-                item_prices = df[df['物料'] == item]['价格']
-                if not item_prices.empty:
-                    price = item_prices.iloc[0]
-                    if price < min_price:
-                        min_price = price
-                        min_vendor = vendor
-            
-            if min_vendor:
-                analysis_data.append({
-                    '物料名称': item,
-                    '最低价': min_price,
-                    '供应商': min_vendor
-                })
-        
-        # 生成分析结果
-        self.analysis_result = pd.DataFrame(analysis_data)
-        
-        # 统计每个供应商的中标情况
-        self.vendor_stats = {}
-        for _, row in self.analysis_result.iterrows():
-            vendor = row['供应商']
-            item = row['物料名称']
-            
-            if vendor not in self.vendor_stats:
-                self.vendor_stats[vendor] = []
-            self.vendor_stats[vendor].append(item)
+        self.analysis_result = analysis_result
+        self.vendor_stats = vendor_stats
         
         # 显示结果
         self.display_results()
@@ -300,7 +183,7 @@ class VendorPriceComparison:
                 self.vendor_tree.insert("", tk.END, values=(
                     vendor,
                     len(items),
-                    ", ".join(items)
+                    ", ".join(items['物料名称'].astype(str))
                 ))
     
     def export_report(self):
@@ -329,7 +212,7 @@ class VendorPriceComparison:
                         vendor_stats_data.append({
                             '供应商': vendor,
                             '中标数量': len(items),
-                            '中标物料': ", ".join(items)
+                            '中标物料': ", ".join(items['物料名称'].astype(str))
                         })
                     vendor_stats_df = pd.DataFrame(vendor_stats_data)
                     vendor_stats_df.to_excel(writer, sheet_name='供应商中标统计', index=False)
@@ -364,5 +247,8 @@ class VendorPriceComparison:
         self.root.mainloop()
 
 if __name__ == "__main__":
+    # 解析报价单使用进程池；打包为可执行文件（如 PyInstaller）后，子进程需要由此进入而不是再打开一个窗口
+    multiprocessing.freeze_support()
+    configure_logging()
     app = VendorPriceComparison()
     app.run()